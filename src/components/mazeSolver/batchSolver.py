@@ -0,0 +1,208 @@
+"""
+Giải hàng loạt các level Maze song song và ghi báo cáo máy-đọc-được (JSON Lines hoặc CSV).
+
+Cách dùng:
+    python batchSolver.py public/quests "src/components/mazeSolver/*.json" --workers 8 --timeout 30 --format csv -o report.csv
+
+Mỗi dòng báo cáo được ghi ngay khi level tương ứng giải xong (không đợi toàn bộ lô).
+"""
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from gameSolver import GameWorld, SearchStats, count_blocks, solve_level, synthesize_program
+from solutionCache import SolutionCache, level_cache_key
+
+REPORT_FIELDS: List[str] = [
+    'file', 'quest_id', 'status', 'actions', 'blocks', 'nodes_expanded', 'wall_time_ms', 'peak_memory_kb',
+    'cache_hit', 'error'
+]
+
+
+# Số lần mở rộng nút giữa hai lần kiểm tra hạn chót của `--timeout` (qua `SearchStats.progress_callback`).
+TIMEOUT_CHECK_INTERVAL = 256
+
+# Cache lời giải của tiến trình hiện tại: tạo một lần cho mỗi worker (bộ khởi tạo của pool), không phải mỗi level.
+_worker_cache: Optional[SolutionCache] = None
+
+
+class LevelTimeout(Exception):
+    """Level vượt quá thời gian cho phép."""
+
+
+def collect_quest_files(patterns: List[str]) -> List[str]:
+    """Mở rộng danh sách thư mục / glob / file thành danh sách file JSON (đã sắp xếp, không trùng)."""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.update(glob.glob(os.path.join(pattern, '*.json')))
+        else:
+            files.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+    return sorted(files)
+
+
+def _raise_timeout(signum, frame):
+    raise LevelTimeout()
+
+
+def _init_worker(cache_dir: Optional[str]) -> None:
+    """Bộ khởi tạo của tiến trình worker: mở cache lời giải dùng chung cho mọi level mà worker này giải."""
+    global _worker_cache
+    _worker_cache = SolutionCache(cache_dir) if cache_dir else None
+
+
+def _process_cache(cache_dir: Optional[str]) -> Optional[SolutionCache]:
+    """Cache của tiến trình hiện tại cho `cache_dir` (mở ở lần dùng đầu nếu chưa có bộ khởi tạo)."""
+    if cache_dir and (_worker_cache is None or _worker_cache.directory != cache_dir):
+        _init_worker(cache_dir)
+    return _worker_cache if cache_dir else None
+
+
+def solve_quest_file(task: Tuple[str, Optional[float], bool, Optional[str]]) -> Dict[str, Any]:
+    """Giải một file level trong tiến trình worker và trả về một dòng báo cáo."""
+    path, timeout, track_memory, cache_dir = task
+    row: Dict[str, Any] = {field: None for field in REPORT_FIELDS}
+    row['file'] = path
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            level_data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        row.update(status='error', error=str(e))
+        return row
+
+    row['quest_id'] = level_data.get('id')
+    config = level_data.get('gameConfig', {})
+    # Chỉ hỗ trợ Maze dạng khối 3D (có 'players'); định dạng lưới 2D cũ và các game khác bị bỏ qua.
+    if level_data.get('gameType') != 'maze' or 'players' not in config:
+        row['status'] = 'skipped'
+        return row
+
+    cache = _process_cache(cache_dir)
+    cache_key = level_cache_key(level_data) if cache else None
+    if cache:
+        started = time.perf_counter()
+        entry = cache.get(cache_key)
+        if entry is not None:
+            actions = entry['actions']
+            row.update(status='solved' if actions is not None else 'unsolvable', cache_hit=True,
+                       actions=len(actions) if actions is not None else None, blocks=entry['blocks'],
+                       wall_time_ms=round((time.perf_counter() - started) * 1000, 3))
+            return row
+        row['cache_hit'] = False
+
+    # Hạn chót được kiểm tra trong vòng tìm kiếm và ở các bước tiền xử lý/tổng hợp (chạy được trên mọi nền tảng và
+    # mọi luồng); SIGALRM, khi dùng được, còn ngắt cả những đoạn không có điểm kiểm tra.
+    deadline = time.perf_counter() + timeout if timeout else None
+
+    def check_deadline(_stats: SearchStats) -> None:
+        if time.perf_counter() > deadline:
+            raise LevelTimeout()
+
+    use_alarm = bool(timeout) and hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    if track_memory:
+        tracemalloc.start()
+    stats = SearchStats(progress_callback=check_deadline if deadline is not None else None,
+                        progress_interval=TIMEOUT_CHECK_INTERVAL)
+    started = time.perf_counter()
+    try:
+        actions = solve_level(GameWorld(level_data), stats=stats)
+        program = synthesize_program(actions, stats) if actions is not None else None
+        blocks = count_blocks(program, stats) if program is not None else None
+        if actions is None:
+            row['status'] = 'unsolvable'
+        else:
+            row.update(status='solved', actions=len(actions), blocks=blocks)
+        if cache:
+            cache.put(cache_key, {'actions': actions, 'program': program, 'blocks': blocks})
+    except LevelTimeout:
+        row['status'] = 'timeout'
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        row['wall_time_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        row['nodes_expanded'] = stats.nodes_expanded
+        if track_memory:
+            row['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+    return row
+
+
+def solve_batch(files: List[str], workers: int, timeout: Optional[float] = None,
+                track_memory: bool = True, cache_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Giải song song bằng pool tiến trình, trả về từng dòng báo cáo theo thứ tự hoàn thành."""
+    tasks = [(path, timeout, track_memory, cache_dir) for path in files]
+    if workers <= 1:
+        for task in tasks:
+            yield solve_quest_file(task)
+        return
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        yield from pool.imap_unordered(solve_quest_file, tasks, chunksize=1)
+
+
+class ReportWriter:
+    """Ghi báo cáo dạng luồng: mỗi dòng được flush ngay sau khi ghi."""
+    def __init__(self, stream, fmt: str):
+        self.stream, self.fmt = stream, fmt
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=REPORT_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, row: Dict[str, Any]) -> None:
+        if self.fmt == 'csv':
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Giải hàng loạt level Maze song song và xuất báo cáo.")
+    parser.add_argument('inputs', nargs='+', help="Thư mục, glob (vd. 'public/quests/*.json') hoặc file JSON")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="Số tiến trình worker")
+    parser.add_argument('--timeout', type=float, default=None, help="Giới hạn thời gian cho mỗi level (giây)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl', help="Định dạng báo cáo")
+    parser.add_argument('-o', '--output', default='-', help="File báo cáo ('-' là stdout)")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Không đo bộ nhớ đỉnh (tracemalloc làm chậm tìm kiếm, tắt đi để đo thời gian chính xác hơn)")
+    parser.add_argument('--cache-dir', default=None, help="Thư mục cache lời giải dùng chung giữa các worker")
+    args = parser.parse_args(argv)
+
+    files = collect_quest_files(args.inputs)
+    if not files:
+        print("LỖI: Không tìm thấy file JSON nào khớp với đầu vào.", file=sys.stderr)
+        return 1
+
+    stream = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    summary: Dict[str, int] = {}
+    started = time.perf_counter()
+    try:
+        writer = ReportWriter(stream, args.format)
+        for row in solve_batch(files, args.workers, args.timeout, not args.no_memory, args.cache_dir):
+            writer.write(row)
+            summary[row['status']] = summary.get(row['status'], 0) + 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    elapsed = time.perf_counter() - started
+    details = ", ".join(f"{status}: {count}" for status, count in sorted(summary.items()))
+    print(f"Đã xử lý {len(files)} file trong {elapsed:.2f}s ({details})", file=sys.stderr)
+    return 1 if summary.get('error') or summary.get('timeout') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Bộ benchmark mở rộng quy mô cho maze solver (chỉ dùng thư viện chuẩn).
+
+Chạy các chuỗi kịch bản sinh bởi `levelGenerator` (kích thước lưới, độ cao, mật độ tường, số vật phẩm,
+công tắc, cổng dịch chuyển), đo thời gian `solve_level` / `synthesize_program`, số nút và bộ nhớ đỉnh,
+rồi so sánh với baseline đã lưu. Cổng chính là các chỉ số tất định (độ dài lời giải, số khối, số nút mở rộng),
+giống nhau trên mọi máy. Thời gian được chuẩn hóa theo một khối lượng việc hiệu chuẩn không dùng solver đo ngay
+trong cùng lần chạy (`*_rel` = ms / calibration_ms), nên baseline ghi trên máy khác vẫn so sánh được; vì vẫn có
+nhiễu, thời gian chậm đi chỉ được cảnh báo trừ khi có `--strict-timing`. Thoát với mã khác 0 khi có kịch bản bị
+xấu đi.
+
+Cách dùng:
+    python benchmark.py                      # so sánh với benchmark_baseline.json
+    python benchmark.py --update-baseline    # ghi lại baseline
+    python benchmark.py --filter grid --repeat 5 --threshold 0.3 --strict-timing
+    python benchmark.py --hierarchical           # so sánh A* với bộ giải phân cấp khi số vật phẩm tăng
+    python benchmark.py --parallel 1,2,4 -o curve.json  # đường tăng tốc của HDA* theo số worker (cần máy nhiều lõi)
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from gameSolver import (GameWorld, SearchStats, count_blocks, solve_level, solve_level_hierarchical,
+                        solve_level_iter, synthesize_program)
+from levelGenerator import generate_level
+from parallelSolver import _available_cpus, _solve_hda
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# Chỉ số tất định: 'actions' phải giữ nguyên, các chỉ số còn lại không được tăng.
+DETERMINISTIC_METRICS = ('actions', 'blocks', 'nodes_expanded')
+# Thời gian so sánh theo giá trị tương đối với lần hiệu chuẩn cùng lần chạy; có thêm ngưỡng tuyệt đối (quy đổi
+# theo hiệu chuẩn hiện tại) để tránh nhiễu ở level nhỏ.
+TIME_METRICS = ('solve_ms', 'synthesize_ms')
+MIN_TIME_DELTA_MS = 2.0
+# Chỉ số gần tất định (tracemalloc phụ thuộc phiên bản Python), so với ngưỡng tương đối.
+COUNT_METRICS = ('peak_memory_kb',)
+
+
+def _scenario(name: str, seed: int = 1, **params: Any) -> Dict[str, Any]:
+    level_params = {'width': 16, 'depth': 16, 'height_variation': 2, 'wall_density': 0.15,
+                    'num_collectibles': 3, 'num_switches': 0, 'num_portals': 0}
+    level_params.update(params)
+    return {'name': name, 'seed': seed, 'params': level_params}
+
+
+SCENARIOS: List[Dict[str, Any]] = (
+    [_scenario(f'grid-{n}x{n}', width=n, depth=n) for n in (8, 16, 24, 32, 48)]
+    + [_scenario(f'collectibles-{k}', num_collectibles=k) for k in (1, 3, 5, 7, 9)]
+    + [_scenario(f'walls-{int(p * 100)}', wall_density=p) for p in (0.0, 0.15, 0.3)]
+    + [_scenario(f'height-{h}', height_variation=h) for h in (0, 2, 4)]
+    + [_scenario(f'switches-{s}', width=12, depth=12, num_collectibles=2, num_switches=s) for s in (0, 2, 4)]
+    + [_scenario(f'portals-{p}', num_portals=p) for p in (0, 1, 2)]
+)
+
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Thời gian (ms, nhỏ nhất qua `repeat` lần) của một khối lượng việc Python cố định không gọi tới solver (băm,
+    dict, heap như vòng lặp A*): thước đo tốc độ của máy/trình thông dịch trong lần chạy này.
+    """
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        heap: List = []
+        seen: Dict[int, int] = {}
+        for i in range(40000):
+            key = (i * 7919) % 50021
+            if key not in seen:
+                seen[key] = i
+                heapq.heappush(heap, (key & 1023, i))
+        while heap:
+            heapq.heappop(heap)
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def with_relative_times(row: Dict[str, Any], calibration_ms: float) -> Dict[str, Any]:
+    """Thêm `<chỉ số>_rel` = thời gian / `calibration_ms` cho mỗi chỉ số thời gian."""
+    for metric in TIME_METRICS:
+        if row.get(metric) is not None:
+            row[f'{metric[:-3]}_rel'] = round(row[metric] / calibration_ms, 4)
+    return row
+
+
+def run_scenario(scenario: Dict[str, Any], repeat: int = 3) -> Dict[str, Any]:
+    """Chạy một kịch bản: thời gian lấy min qua `repeat` lần, bộ nhớ đỉnh đo ở một lần chạy riêng có tracemalloc."""
+    level = generate_level(scenario['seed'], **scenario['params'])
+    result: Dict[str, Any] = {}
+    solve_times, synth_times = [], []
+    for _ in range(max(1, repeat)):
+        stats = SearchStats()
+        started = time.perf_counter()
+        world = GameWorld(level)
+        compiled = time.perf_counter()
+        actions = solve_level(world, stats=stats)
+        solved = time.perf_counter()
+        program = synthesize_program(actions) if actions is not None else None
+        solve_times.append((solved - started, compiled - started))
+        synth_times.append(time.perf_counter() - solved)
+    best_solve, best_compile = min(solve_times)
+    result.update(
+        actions=len(actions) if actions is not None else None,
+        blocks=count_blocks(program) if program is not None else None,
+        nodes_expanded=stats.nodes_expanded,
+        compile_ms=round(best_compile * 1000, 3),
+        solve_ms=round(best_solve * 1000, 3),
+        synthesize_ms=round(min(synth_times) * 1000, 3),
+    )
+
+    tracemalloc.start()
+    try:
+        actions = solve_level(GameWorld(level))
+        if actions is not None:
+            synthesize_program(actions)
+        result['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def compare_hierarchical(ks=(2, 4, 6, 8, 10, 12, 14, 16, 18, 20), size: int = 24, astar_budget_ms: float = 20000,
+                         seed: int = 1) -> List[Dict[str, Any]]:
+    """A* so với `solve_level_hierarchical` trên cùng một lưới khi số vật phẩm k tăng; A* bị dừng sau `astar_budget_ms`."""
+    rows = []
+    for k in ks:
+        level = generate_level(seed, width=size, depth=size, height_variation=2, num_collectibles=k)
+        started = time.perf_counter()
+        astar_length, astar_nodes = None, None
+        for event in solve_level_iter(GameWorld(level), report_every=500):
+            astar_nodes = event.nodes_expanded
+            if event.done:
+                astar_length = len(event.actions) if event.actions is not None else None
+                break
+            if (time.perf_counter() - started) * 1000 > astar_budget_ms:
+                break
+        astar_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        result = solve_level_hierarchical(GameWorld(level))
+        rows.append({
+            'k': k,
+            'astar_ms': round(astar_ms, 1) if astar_length is not None else None,
+            'astar_nodes': astar_nodes,
+            'astar_actions': astar_length,
+            'hierarchical_ms': round((time.perf_counter() - started) * 1000, 1),
+            'hierarchical_actions': len(result.actions) if result.actions is not None else None,
+            'optimal': result.optimal,
+        })
+    return rows
+
+
+# Các level của đường tăng tốc HDA*: (cạnh lưới, số vật phẩm), từ dưới ngưỡng `PARALLEL_MIN_EXPANSIONS` tới trên.
+PARALLEL_LEVELS = ((16, 3), (48, 8), (64, 10), (32, 14))
+
+
+def _timed_solve(level: Dict[str, Any], solve) -> Dict[str, Any]:
+    stats = SearchStats()
+    world = GameWorld(level)
+    world.get_distance_heuristic()
+    started = time.perf_counter()
+    actions = solve(world, stats)
+    return {'ms': round((time.perf_counter() - started) * 1000, 1), 'nodes_expanded': stats.nodes_expanded,
+            'actions': len(actions) if actions is not None else None}
+
+
+def compare_parallel(workers=(1, 2, 4, 8), levels=PARALLEL_LEVELS, seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    Đường tăng tốc theo số worker trên các level tổng hợp lớn dần: A* tuần tự, `solve_level(workers=N)` (có giới
+    hạn CPU và ngưỡng kích thước) và HDA* thuần với đúng N tiến trình. Heuristic được dựng trước, ngoài phần đo.
+    """
+    rows = []
+    for size, num_collectibles in levels:
+        level = generate_level(seed, width=size, depth=size, height_variation=2, num_collectibles=num_collectibles)
+        serial = _timed_solve(level, lambda world, stats: solve_level(world, stats=stats))
+        for n in workers:
+            auto = _timed_solve(level, lambda world, stats: solve_level(world, stats=stats, workers=n))
+            hda = _timed_solve(level, lambda world, stats: _solve_hda(world, n, stats, None, True))
+            rows.append({'size': size, 'collectibles': num_collectibles, 'workers': n, 'serial_ms': serial['ms'],
+                         'serial_nodes': serial['nodes_expanded'], 'auto_ms': auto['ms'], 'hda_ms': hda['ms'],
+                         'hda_nodes': hda['nodes_expanded'], 'speedup': round(serial['ms'] / auto['ms'], 2),
+                         'hda_speedup': round(serial['ms'] / hda['ms'], 2),
+                         'optimal': serial['actions'] == auto['actions'] == hda['actions']})
+    return rows
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Trả về danh sách mô tả các chỉ số bị xấu đi so với baseline: chỉ số tất định thay đổi theo hướng xấu (không cần
+    ngưỡng) và bộ nhớ đỉnh tăng quá `threshold`.
+    """
+    regressions = []
+    for metric in DETERMINISTIC_METRICS:
+        old, new = baseline.get(metric), current.get(metric)
+        if old is None and new is None:
+            continue
+        if metric == 'actions' and old != new or metric != 'actions' and (new is None or old is not None and new > old):
+            regressions.append(f"{metric} {old} -> {new}")
+    for metric in COUNT_METRICS:
+        old, new = baseline.get(metric), current.get(metric)
+        if old is not None and new is not None and new > old * (1 + threshold):
+            regressions.append(f"{metric} {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def compare_timing(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+                   calibration_ms: float) -> List[str]:
+    """
+    Các thời gian chuẩn hóa (`*_rel`) tăng quá `threshold` và quá `MIN_TIME_DELTA_MS` (quy đổi theo hiệu chuẩn của
+    lần chạy này). Thời gian tuyệt đối của baseline (ghi trên máy khác) không được so sánh.
+    """
+    slower = []
+    for metric in TIME_METRICS:
+        rel = f'{metric[:-3]}_rel'
+        old, new = baseline.get(rel), current.get(rel)
+        if old is None or new is None:
+            continue
+        if new > old * (1 + threshold) and (new - old) * calibration_ms > MIN_TIME_DELTA_MS:
+            slower.append(f"{rel} {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return slower
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark mở rộng quy mô cho maze solver.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="File baseline JSON")
+    parser.add_argument('--update-baseline', action='store_true', help="Ghi kết quả lần chạy này làm baseline mới")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Ngưỡng xấu đi tương đối của thời gian chuẩn hóa và bộ nhớ (0.25 = 25%%)")
+    parser.add_argument('--strict-timing', action='store_true',
+                        help="Coi thời gian chuẩn hóa chậm đi là lỗi (mặc định chỉ cảnh báo, vì thời gian có nhiễu)")
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần chạy để lấy thời gian nhỏ nhất")
+    parser.add_argument('--filter', default=None, help="Chỉ chạy các kịch bản có tên chứa chuỗi này")
+    parser.add_argument('-o', '--output', default=None, help="Ghi kết quả chi tiết ra file JSON")
+    parser.add_argument('--hierarchical', action='store_true',
+                        help="Chỉ so sánh A* với bộ giải phân cấp theo số vật phẩm (không dùng baseline)")
+    parser.add_argument('--parallel', default=None, metavar='N,N,...',
+                        help="Chỉ đo đường tăng tốc của HDA* theo các số worker này (hàng 0 là A* tuần tự)")
+    args = parser.parse_args(argv)
+
+    if args.parallel:
+        workers = tuple(int(n) for n in args.parallel.split(','))
+        if max(workers) > _available_cpus():
+            print(f"CẢNH BÁO: chỉ có {_available_cpus()} CPU; các hàng có nhiều worker hơn không đo được tăng tốc thật",
+                  file=sys.stderr)
+        rows = compare_parallel(workers)
+        print(f"CPU: {_available_cpus()}")
+        print(f"{'level':>8}{'workers':>8}{'serial ms':>11}{'auto ms':>10}{'HDA* ms':>10}{'speedup':>9}"
+              f"{'HDA* x':>8}{'nodes':>8}{'HDA* nodes':>12}  optimal")
+        for row in rows:
+            print(f"{row['size']:>5}/{row['collectibles']:<2}{row['workers']:>8}{row['serial_ms']:>11.1f}"
+                  f"{row['auto_ms']:>10.1f}{row['hda_ms']:>10.1f}{row['speedup']:>9.2f}{row['hda_speedup']:>8.2f}"
+                  f"{row['serial_nodes']:>8}{row['hda_nodes']:>12}  {row['optimal']}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'cpus': _available_cpus(), 'rows': rows}, f, indent=2)
+        return 0
+
+    if args.hierarchical:
+        print(f"{'k':>3}{'A* ms':>11}{'A* nodes':>10}{'A* len':>8}{'hier ms':>10}{'hier len':>10}  optimal")
+        for row in compare_hierarchical():
+            astar_ms = f"{row['astar_ms']:.1f}" if row['astar_ms'] is not None else 'timeout'
+            print(f"{row['k']:>3}{astar_ms:>11}{row['astar_nodes']:>10}{str(row['astar_actions']):>8}"
+                  f"{row['hierarchical_ms']:>10.1f}{str(row['hierarchical_actions']):>10}  {row['optimal']}")
+        return 0
+
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('scenarios', {})
+
+    results: Dict[str, Any] = {}
+    failed: Dict[str, List[str]] = {}
+    # Hiệu chuẩn xen kẽ với các kịch bản rồi lấy giá trị nhỏ nhất, giống cách lấy thời gian của kịch bản.
+    calibrations = [calibrate()]
+    for scenario in SCENARIOS:
+        if args.filter and args.filter not in scenario['name']:
+            continue
+        results[scenario['name']] = run_scenario(scenario, args.repeat)
+        calibrations.append(calibrate(2))
+    calibration_ms = min(calibrations)
+
+    print(f"Hiệu chuẩn: {calibration_ms:.2f} ms")
+    print(f"{'scenario':<18}{'actions':>8}{'blocks':>8}{'nodes':>9}{'solve ms':>11}{'solve rel':>10}{'synth ms':>10}"
+          f"{'peak KB':>10}  status")
+    for name, row in results.items():
+        with_relative_times(row, calibration_ms)
+        status = 'new'
+        if name in baseline:
+            regressions = compare(row, baseline[name], args.threshold)
+            slower = compare_timing(row, baseline[name], args.threshold, calibration_ms)
+            if args.strict_timing:
+                regressions, slower = regressions + slower, []
+            status = 'REGRESSED: ' + '; '.join(regressions) if regressions else 'ok'
+            if slower:
+                status += ' (chậm hơn: ' + '; '.join(slower) + ')'
+            if regressions:
+                failed[name] = regressions
+        print(f"{name:<18}{str(row['actions']):>8}{str(row['blocks']):>8}{row['nodes_expanded']:>9}"
+              f"{row['solve_ms']:>11.2f}{row['solve_rel']:>10.4f}{row['synthesize_ms']:>10.2f}"
+              f"{row['peak_memory_kb']:>10.1f}  {status}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'calibration_ms': calibration_ms, 'scenarios': results}, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'calibration_ms': calibration_ms, 'scenarios': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Đã ghi baseline vào '{args.baseline}'.")
+        return 0
+    if failed:
+        print(f"LỖI: {len(failed)} kịch bản bị xấu đi so với baseline.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
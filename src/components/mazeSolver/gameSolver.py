@@ -1,16 +1,31 @@
+import heapq
+import itertools
 import json
 import sys
+import time
 import traceback
-from typing import Set, Dict, List, Tuple, Any, Optional
-from collections import Counter
+from array import array
+from contextlib import contextmanager
+from typing import Set, Dict, List, Tuple, Any, Optional, Iterator, Callable
+from collections import Counter, deque
 
 # --- SECTION 1: TYPE DEFINITIONS (Định nghĩa kiểu dữ liệu) ---
 Action = str
 Position = Dict[str, int]
 PlayerStart = Dict[str, int]
 
+# Tăng giá trị này mỗi khi thay đổi làm kết quả của solver/synthesizer khác đi (vô hiệu hóa cache lời giải).
+SOLVER_VERSION = "4"
+
 
 # --- SECTION 2: GAME WORLD MODEL (Mô hình hóa thế giới game) ---
+DIRECTIONS = [(0, 0, -1), (1, 0, 0), (0, 0, 1), (-1, 0, 0)]
+# Các hành động di chuyển có trong bảng chuyển trạng thái biên dịch sẵn (theo đúng thứ tự chỉ số).
+MOVE_ACTIONS: Tuple[Action, ...] = ('moveForward', 'jump')
+# Mã ô trong lưới dày đặc `GameWorld.grid`.
+TILE_EMPTY, TILE_GROUND, TILE_WALL, TILE_OTHER = 0, 1, 2, 3
+NO_CELL = -1
+
 class GameWorld:
     """Đọc và hiểu file JSON, xây dựng một bản đồ thế giới chi tiết với các thuộc tính model."""
     WALKABLE_GROUNDS: Set[str] = {
@@ -48,28 +63,246 @@ class GameWorld:
                     i['targetPosition'] = target_portal['position']
                     self.portals[pos_key] = i
 
+        # Khung bao của level, dùng để đóng gói (x, y, z, hướng) thành một số nguyên nhỏ.
+        points = [b['position'] for b in config.get('blocks', [])] + [self.start_info, self.finish_pos] + \
+            [p['position'] for p in self.portals.values()] + [p['targetPosition'] for p in self.portals.values()]
+        self.origin: Tuple[int, int, int] = (
+            min(p['x'] for p in points), min(p['y'] for p in points), min(p['z'] for p in points)
+        )
+        # Trục y được nới thêm 2 ô để chứa vị trí đứng trên khối cao nhất và cú nhảy lên trên nó.
+        self.size: Tuple[int, int, int] = (
+            max(p['x'] for p in points) - self.origin[0] + 1,
+            max(p['y'] for p in points) - self.origin[1] + 3,
+            max(p['z'] for p in points) - self.origin[2] + 1,
+        )
+
+        # Gán chỉ số bit cho vật phẩm và công tắc ngay khi tải level (khóa theo chỉ số ô).
+        self.collectible_bits: Dict[int, int] = {}
+        for c in self.collectibles.values():
+            self.collectible_bits[self.cell_index(c['position']['x'], c['position']['y'], c['position']['z'])] = 1 << len(self.collectible_bits)
+        self.all_collected_mask: int = (1 << len(self.collectible_bits)) - 1
+        self.switch_bits: Dict[int, int] = {}
+        self.initial_switch_mask: int = 0
+        for s in self.switches.values():
+            bit = 1 << len(self.switch_bits)
+            self.switch_bits[self.cell_index(s['position']['x'], s['position']['y'], s['position']['z'])] = bit
+            if s.get('initialState') == 'on':
+                self.initial_switch_mask |= bit
+        self.relevant_switch_mask: int = self._analyze_switch_relevance()
+
+        # Cổng dịch chuyển (theo MazeEngine): bước ngang vào ô cổng đưa người chơi tới ô cổng đích ngay trong cùng
+        # hành động, không tốn thêm bước. `portal_targets`: ô cổng -> ô đích; `arrival_directions`: ô đích -> hướng
+        # sau dịch chuyển (chỉ khi cổng đích có `exitDirection`, nếu không người chơi giữ nguyên hướng).
+        self.portal_targets: Dict[int, int] = {}
+        self.arrival_directions: Dict[int, int] = {}
+        portals_by_id = {i['id']: i for i in all_interactibles if i['type'] == 'portal'}
+        for portal in self.portals.values():
+            source, target = portal['position'], portal['targetPosition']
+            target_cell = self.cell_index(target['x'], target['y'], target['z'])
+            self.portal_targets[self.cell_index(source['x'], source['y'], source['z'])] = target_cell
+            exit_direction = portals_by_id[portal['targetId']].get('exitDirection')
+            if exit_direction is not None:
+                self.arrival_directions[target_cell] = exit_direction
+
+        self._compile(config.get('blocks', []))
+        self._distance_heuristic: Optional['DistanceHeuristic'] = None
+
+    def _compile(self, blocks: List[Dict]) -> None:
+        """
+        Biên dịch level một lần thành lưới dày đặc `grid` (mã ô theo chỉ số ô) và bảng
+        `transitions`: chỉ số `(cell * 4 + direction) * len(MOVE_ACTIONS) + action` -> ô đích hoặc `NO_CELL`.
+        Bảng đã bao gồm luật rơi xuống một bậc của moveForward, luật nhảy lên một bậc của jump và cổng dịch chuyển
+        (ô đích là ô cổng đích); hướng sau bước đi lấy qua `arrival_direction`.
+        """
+        size_x, size_y, size_z = self.size
+        num_cells = size_x * size_y * size_z
+        self.grid = array('b', bytes(num_cells))
+        for block in blocks:
+            self.grid[self.cell_index(block['position']['x'], block['position']['y'], block['position']['z'])] = \
+                GameWorld._tile_code(block['modelKey'])
+
+        # Người chơi chỉ có thể đứng ở ô xuất phát hoặc ngay trên một khối nền, nên chỉ cần biên dịch các ô đó.
+        start = self.start_info
+        self._standable_set: Set[int] = {self.cell_index(start['x'], start['y'], start['z'])} | {
+            self.cell_index(b['position']['x'], b['position']['y'] + 1, b['position']['z'])
+            for b in blocks if b['modelKey'] in GameWorld.WALKABLE_GROUNDS
+        }
+        self.standable_cells: List[int] = sorted(self._standable_set)
+        stride = 4 * len(MOVE_ACTIONS)
+        self.transitions = array('i', [NO_CELL]) * (num_cells * stride)
+        for cell in self.standable_cells:
+            self.transitions[cell * stride:(cell + 1) * stride] = array('i', self._cell_transitions(cell))
+
+    def _analyze_switch_relevance(self) -> int:
+        """
+        Phân tích tĩnh: bitmask các công tắc mà luật game thực sự đọc tới. Bảng `transitions` được biên dịch không
+        phụ thuộc công tắc, điều kiện thắng chỉ xét vị trí + vật phẩm, và trường `toggles` của công tắc chưa được luật
+        nào đọc (kể cả MazeEngine), nên hiện không công tắc nào liên quan; trạng thái của chúng được bỏ khỏi khóa tìm
+        kiếm (nhất quán với `hintTable` và `incrementalSolver`) và hành động 'toggleSwitch' bị cắt khi sinh trạng
+        thái. Luật mới có đọc công tắc (ví dụ cửa do công tắc điều khiển) phải bật bit tương ứng ở đây.
+        """
+        return 0
+
+    def arrival_direction(self, dest: int, direction: int) -> int:
+        """Hướng của người chơi sau khi bước tới ô `dest` với hướng `direction` (cổng đích có thể đặt lại hướng)."""
+        return self.arrival_directions.get(dest, direction)
+
+    @staticmethod
+    def _tile_code(model_key: str) -> int:
+        if model_key in GameWorld.WALKABLE_GROUNDS:
+            return TILE_GROUND
+        if model_key in GameWorld.SOLID_WALLS:
+            return TILE_WALL
+        return TILE_OTHER
+
+    def _cell_transitions(self, cell: int) -> List[int]:
+        """Ô đích của từng (hướng, hành động di chuyển) xuất phát từ `cell`, theo thứ tự của bảng `transitions`."""
+        x, y, z = self.cell_position(cell)
+        result: List[int] = []
+        for dx, _, dz in DIRECTIONS:
+            nx, nz = x + dx, z + dz
+            forward = jump = NO_CELL
+            # moveForward: ô đích không phải tường và có nền đi được bên dưới, hoặc rơi xuống một bậc.
+            if self.tile_at(nx, y, nz) != TILE_WALL:
+                if self.tile_at(nx, y - 1, nz) == TILE_GROUND:
+                    forward = self.cell_index(nx, y, nz)
+                elif self.tile_at(nx, y - 2, nz) == TILE_GROUND:
+                    forward = self.cell_index(nx, y - 1, nz)
+            # jump: lên một bậc, ô đích không phải tường và có nền đi được bên dưới.
+            if self.tile_at(nx, y + 1, nz) != TILE_WALL and self.tile_at(nx, y, nz) == TILE_GROUND:
+                jump = self.cell_index(nx, y + 1, nz)
+            # Bước vào ô cổng dịch chuyển thì hạ cánh luôn tại ô cổng đích (việc dịch chuyển không tái kích hoạt).
+            result.extend((self.portal_targets.get(forward, forward), self.portal_targets.get(jump, jump)))
+        return result
+
+    def _compile_cell(self, cell: int) -> List[Tuple[int, int, int]]:
+        """Biên dịch (lại) các chuyển trạng thái của một ô; trả về các (pose, hành động, ô đích cũ) đã đổi."""
+        num_actions = len(MOVE_ACTIONS)
+        targets = self._cell_transitions(cell) if cell in self._standable_set else [NO_CELL] * (4 * num_actions)
+        changes = []
+        for offset, dest in enumerate(targets):
+            index = cell * 4 * num_actions + offset
+            if self.transitions[index] != dest:
+                changes.append((cell * 4 + offset // num_actions, offset % num_actions, self.transitions[index]))
+                self.transitions[index] = dest
+        return changes
+
+    def set_block(self, x: int, y: int, z: int, model_key: Optional[str]) -> List[Tuple[int, int, int]]:
+        """
+        Sửa level tại chỗ: đặt khối `model_key` tại (x, y, z), hoặc xóa khối khi `model_key` là None, rồi chỉ
+        biên dịch lại các ô có chuyển trạng thái phụ thuộc vào ô này. Trả về các (pose, hành động, ô đích cũ)
+        đã thay đổi. Ném ValueError nếu vị trí nằm ngoài khung bao (cần dựng lại GameWorld).
+        """
+        ox, oy, oz = self.origin
+        if not (0 <= x - ox < self.size[0] and 0 <= y - oy and y + 2 - oy < self.size[1] and 0 <= z - oz < self.size[2]):
+            raise ValueError(f"Vị trí ({x}, {y}, {z}) nằm ngoài khung bao của level")
+        pos_key = f"{x}-{y}-{z}"
+        if model_key is None:
+            self.world_map.pop(pos_key, None)
+            tile = TILE_EMPTY
+        else:
+            self.world_map[pos_key] = model_key
+            tile = GameWorld._tile_code(model_key)
+        self.grid[self.cell_index(x, y, z)] = tile
+
+        above = self.cell_index(x, y + 1, z)
+        start = self.start_info
+        if tile == TILE_GROUND:
+            self._standable_set.add(above)
+        elif above != self.cell_index(start['x'], start['y'], start['z']):
+            self._standable_set.discard(above)
+        self.standable_cells = sorted(self._standable_set)
+
+        changes = self._compile_cell(above)
+        for dx, _, dz in DIRECTIONS:
+            for cy in (y - 1, y, y + 1, y + 2):
+                if 0 <= x + dx - ox < self.size[0] and 0 <= cy - oy < self.size[1] and 0 <= z + dz - oz < self.size[2]:
+                    cell = self.cell_index(x + dx, cy, z + dz)
+                    if cell in self._standable_set:
+                        changes.extend(self._compile_cell(cell))
+        return changes
+
+    def move_collectible(self, old_cell: int, new_cell: int) -> int:
+        """Chuyển vật phẩm ở `old_cell` sang `new_cell`, giữ nguyên chỉ số bit; trả về bit của vật phẩm."""
+        bit = self.collectible_bits[old_cell]
+        bits = dict(self.collectible_bits)
+        del bits[old_cell]
+        bits[new_cell] = bit
+        # Giữ thứ tự dict theo bit: DistanceHeuristic gán trường khoảng cách theo thứ tự này.
+        self.collectible_bits = dict(sorted(bits.items(), key=lambda item: item[1]))
+        old_key = "-".join(map(str, self.cell_position(old_cell)))
+        item = self.collectibles.pop(old_key)
+        x, y, z = self.cell_position(new_cell)
+        item['position'] = {'x': x, 'y': y, 'z': z}
+        self.collectibles[f"{x}-{y}-{z}"] = item
+        return bit
+
+    def get_distance_heuristic(self, stats: Optional['SearchStats'] = None) -> 'DistanceHeuristic':
+        """
+        Trả về heuristic trường khoảng cách của level, chỉ tính một lần rồi dùng lại. Lần dựng đầu gọi
+        `stats.checkpoint()` sau mỗi trường khoảng cách.
+        """
+        if self._distance_heuristic is None:
+            self._distance_heuristic = DistanceHeuristic(self, stats)
+        return self._distance_heuristic
+
+    def tile_at(self, x: int, y: int, z: int) -> int:
+        """Mã ô tại tọa độ bất kỳ; ngoài khung bao được coi là ô trống."""
+        if not (0 <= x - self.origin[0] < self.size[0] and 0 <= y - self.origin[1] < self.size[1]
+                and 0 <= z - self.origin[2] < self.size[2]):
+            return TILE_EMPTY
+        return self.grid[self.cell_index(x, y, z)]
+
+    def next_cell(self, cell: int, direction: int, action: Action) -> int:
+        """Tra bảng chuyển trạng thái: ô đích của một hành động di chuyển, hoặc `NO_CELL` nếu không hợp lệ."""
+        return self.transitions[(cell * 4 + direction) * len(MOVE_ACTIONS) + MOVE_ACTIONS.index(action)]
+
+    def cell_index(self, x: int, y: int, z: int) -> int:
+        """Đổi tọa độ (x, y, z) thành chỉ số ô trong khung bao của level."""
+        _, size_y, size_z = self.size
+        return ((x - self.origin[0]) * size_y + (y - self.origin[1])) * size_z + (z - self.origin[2])
+
+    def cell_position(self, cell: int) -> Tuple[int, int, int]:
+        """Phép ngược của `cell_index`."""
+        _, size_y, size_z = self.size
+        rest, z = divmod(cell, size_z)
+        x, y = divmod(rest, size_y)
+        return x + self.origin[0], y + self.origin[1], z + self.origin[2]
+
+    def pack_pose(self, x: int, y: int, z: int, direction: int) -> int:
+        """Đóng gói vị trí và hướng thành một số nguyên: `cell * 4 + direction`."""
+        return self.cell_index(x, y, z) * 4 + direction
+
+    def unpack_pose(self, pose: int) -> Tuple[int, int, int, int]:
+        cell, direction = divmod(pose, 4)
+        x, y, z = self.cell_position(cell)
+        return x, y, z, direction
+
 # --- SECTION 3: GAME STATE & PATH NODE (Trạng thái game và Nút tìm đường) ---
 class GameState:
-    """Đại diện cho một "bản chụp" của toàn bộ game tại một thời điểm."""
-    def __init__(self, start_info: PlayerStart, world: GameWorld):
-        self.x, self.y, self.z = start_info['x'], start_info['y'], start_info['z']
-        self.direction = start_info['direction']
-        self.collected_items: Set[str] = set()
-        self.switch_states: Dict[str, str] = {s['id']: s['initialState'] for s in world.switches.values()}
-
-    def clone(self) -> 'GameState':
-        new_state = GameState(self.__dict__, GameWorld({"gameConfig": {"players": [{"start": {}}], "finish": {}, "blocks": []}}))
-        new_state.collected_items = self.collected_items.copy()
-        new_state.switch_states = self.switch_states.copy()
-        return new_state
-
-    def get_key(self) -> str:
-        items = ",".join(sorted(list(self.collected_items)))
-        switches = ",".join(sorted([f"{k}:{v}" for k, v in self.switch_states.items()]))
-        return f"{self.x},{self.y},{self.z},{self.direction}|i:{items}|s:{switches}"
+    """
+    Đại diện cho một "bản chụp" của toàn bộ game tại một thời điểm, ở dạng nén:
+    `pose` là vị trí + hướng đã đóng gói, `collected` và `switches` là bitmask theo chỉ số gán lúc tải level.
+    """
+    __slots__ = ('pose', 'collected', 'switches')
+
+    def __init__(self, pose: int, collected: int = 0, switches: int = 0):
+        self.pose = pose
+        self.collected = collected
+        self.switches = switches
+
+    @classmethod
+    def initial(cls, world: GameWorld) -> 'GameState':
+        start = world.start_info
+        return cls(world.pack_pose(start['x'], start['y'], start['z'], start['direction']), 0, world.initial_switch_mask)
+
+    def get_key(self) -> Tuple[int, int, int]:
+        return (self.pose, self.collected, self.switches)
 
 class PathNode:
     """Nút chứa trạng thái và các thông tin chi phí cho thuật toán A*."""
+    __slots__ = ('state', 'parent', 'action', 'g_cost', 'h_cost')
+
     def __init__(self, state: GameState):
         self.state = state
         self.parent: Optional['PathNode'] = None
@@ -82,125 +315,1340 @@ class PathNode:
         return self.g_cost + self.h_cost
 
 # --- SECTION 4: A* SOLVER (Thuật toán A*) ---
-def solve_level(world: GameWorld) -> Optional[List[Action]]:
-    """Thực thi thuật toán A* để tìm lời giải tối ưu cho level."""
-    start_state = GameState(world.start_info, world)
-    start_node = PathNode(start_state)
-    open_list: List[PathNode] = []
-    visited: Set[str] = set()
-
-    def manhattan(p1: Position, p2: Position) -> int:
-        return abs(p1['x'] - p2['x']) + abs(p1['y'] - p2['y']) + abs(p1['z'] - p2['z'])
-
-    def heuristic(state: GameState) -> int:
-        h = 0
-        current_pos = {'x': state.x, 'y': state.y, 'z': state.z}
-        uncollected_ids = {c['id'] for c in world.collectibles.values()} - state.collected_items
-        uncollected_positions = [c['position'] for c in world.collectibles.values() if c['id'] in uncollected_ids]
-
-        if uncollected_positions:
-            closest_dist = min(manhattan(current_pos, pos) for pos in uncollected_positions)
-            h += closest_dist
-            if len(uncollected_positions) > 1:
-                h += max(manhattan(pos, world.finish_pos) for pos in uncollected_positions)
+SEARCH_ACTIONS: Tuple[Action, ...] = ('moveForward', 'turnLeft', 'turnRight', 'collect', 'jump', 'toggleSwitch')
+
+def get_successors(world: GameWorld, state: GameState) -> Iterator[Tuple[Action, GameState]]:
+    """Sinh các trạng thái kế tiếp chỉ bằng tra bảng `world.transitions`, không sao chép dict/set nào."""
+    cell, direction = state.pose >> 2, state.pose & 3
+    collected, switches = state.collected, state.switches
+    base = state.pose * len(MOVE_ACTIONS)
+    for action in SEARCH_ACTIONS:
+        if action == 'moveForward' or action == 'jump':
+            dest = world.transitions[base + (action == 'jump')]
+            if dest != NO_CELL:
+                yield action, GameState((dest << 2) | world.arrival_directions.get(dest, direction), collected, switches)
+        elif action == 'turnLeft':
+            yield action, GameState((cell << 2) | ((direction + 3) & 3), collected, switches)
+        elif action == 'turnRight':
+            yield action, GameState((cell << 2) | ((direction + 1) & 3), collected, switches)
+        elif action == 'collect':
+            bit = world.collectible_bits.get(cell, 0)
+            if bit and not collected & bit:
+                yield action, GameState(state.pose, collected | bit, switches)
+        elif action == 'toggleSwitch':
+            bit = world.switch_bits.get(cell, 0)
+            if bit:
+                yield action, GameState(state.pose, collected, switches ^ bit)
+
+_OPPOSITE_TURN: Dict[Action, Action] = {'turnLeft': 'turnRight', 'turnRight': 'turnLeft'}
+
+def search_successors(world: GameWorld, state: GameState, last_action: Optional[Action] = None,
+                      previous_action: Optional[Action] = None,
+                      stats: Optional['SearchStats'] = None) -> Iterator[Tuple[Action, GameState]]:
+    """
+    `get_successors` kèm các luật cắt tỉa theo hai hành động vừa thực hiện, an toàn cho tìm kiếm tối ưu (mọi hành
+    động tốn 1, trạng thái bị cắt luôn tới được bằng đường rẻ hơn):
+    - không quay ngược lượt quay vừa làm (turnLeft rồi turnRight và ngược lại);
+    - không quay cùng chiều lần thứ ba liên tiếp (3 x turnLeft tương đương 1 x turnRight);
+    - không bật/tắt công tắc không liên quan (`world.relevant_switch_mask`), không bật lại công tắc vừa bật.
+    """
+    for action, next_state in get_successors(world, state):
+        if action == 'turnLeft' or action == 'turnRight':
+            if last_action == _OPPOSITE_TURN[action] or last_action == previous_action == action:
+                if stats is not None:
+                    stats.successors_pruned += 1
+                continue
+        elif action == 'toggleSwitch':
+            if last_action == 'toggleSwitch' or not world.switch_bits[state.pose >> 2] & world.relevant_switch_mask:
+                if stats is not None:
+                    stats.successors_pruned += 1
+                continue
+        yield action, next_state
+
+def search_start(world: GameWorld, start: Optional[GameState] = None) -> GameState:
+    """Trạng thái bắt đầu tìm kiếm với các bit công tắc không liên quan đã bị xóa khỏi khóa."""
+    state = start or GameState.initial(world)
+    return GameState(state.pose, state.collected, state.switches & world.relevant_switch_mask)
+
+# Chi phí "vô cực" cho các ô không thể tới được trong trường khoảng cách.
+INF_COST = 1 << 30
+# Với số vật phẩm không quá ngưỡng này, heuristic giải TSP chính xác; lớn hơn thì dùng cận dưới MST.
+TSP_EXACT_LIMIT = 12
+HEURISTIC_MODES: Tuple[str, ...] = ('admissible', 'greedy')
+# 'astar': A* đầy đủ (nhanh, bộ nhớ không giới hạn); 'ida': IDA* với bộ nhớ bị chặn;
+# 'hierarchical': thứ tự ghé vật phẩm + nối đoạn đường (xem `solve_level_hierarchical`).
+SEARCH_ENGINES: Tuple[str, ...] = ('astar', 'ida', 'hierarchical')
+# Dung lượng mặc định (số trạng thái) của bảng chuyển vị khi không đặt giới hạn.
+DEFAULT_TT_CAPACITY = 1 << 20
+
+class SearchStats:
+    """
+    Số liệu đo đạc (tùy chọn) của một lần giải: truyền vào `solve_level`, `solve_level_anytime`,
+    `synthesize_program`, `count_blocks`. Khi không truyền (None), các vòng lặp nóng không tốn thêm chi phí nào.
+    `progress_callback(stats)` được gọi sau mỗi `progress_interval` lần mở rộng nút, và tại các `checkpoint()` của
+    những bước tiền xử lý dài (kiểm tra tới được, dựng heuristic, tổng hợp chương trình, dựng bảng gợi ý).
+    """
+    def __init__(self, progress_callback: Optional[Callable[['SearchStats'], None]] = None,
+                 progress_interval: int = 1000):
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        # Trạng thái kế tiếp bị loại vì đã được tìm thấy với g không tệ hơn.
+        self.duplicates_pruned = 0
+        # Trạng thái kế tiếp bị cắt bởi luật của `search_successors` (không quay ngược, không bật/tắt thừa).
+        self.successors_pruned = 0
+        # Số trạng thái bị ghi đè khỏi bảng chuyển vị vì hết dung lượng (chỉ engine 'ida').
+        self.nodes_forgotten = 0
+        self.peak_open_size = 0
+        self.peak_visited_size = 0
+        self.solution_depth: Optional[int] = None
+        # Số trạng thái chương trình đã duyệt (`synthesize_program_search`).
+        self.synthesis_states = 0
+        self.heuristic_calls = 0
+        self.heuristic_time = 0.0
+        self.phase_times: Dict[str, float] = {}
+        self.progress_callback = progress_callback
+        self.progress_interval = max(1, progress_interval)
+
+    def record_expansion(self, open_size: int, visited_size: int) -> None:
+        self.nodes_expanded += 1
+        if open_size > self.peak_open_size:
+            self.peak_open_size = open_size
+        if visited_size > self.peak_visited_size:
+            self.peak_visited_size = visited_size
+        if self.progress_callback is not None and self.nodes_expanded % self.progress_interval == 0:
+            self.progress_callback(self)
+
+    def checkpoint(self) -> None:
+        """Gọi `progress_callback` ngay (ngoài vòng mở rộng nút), để có thể hủy cả các bước tiền xử lý."""
+        if self.progress_callback is not None:
+            self.progress_callback(self)
+
+    def timed(self, heuristic: Callable[['GameState'], int]) -> Callable[['GameState'], int]:
+        """Bọc hàm heuristic để đo tổng thời gian đánh giá."""
+        def timed_heuristic(state: 'GameState') -> int:
+            started = time.perf_counter()
+            value = heuristic(state)
+            self.heuristic_time += time.perf_counter() - started
+            self.heuristic_calls += 1
+            return value
+        return timed_heuristic
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Cộng dồn thời gian chạy của một giai đoạn ('solve', 'synthesize', 'count', ...)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def effective_branching_factor(self) -> Optional[float]:
+        """
+        Hệ số phân nhánh hiệu dụng b*: nghiệm của N + 1 = 1 + b + b^2 + ... + b^d với N nút được sinh và d là độ sâu lời giải.
+        Không có lời giải thì trả về tỉ lệ sinh/mở rộng.
+        """
+        if not self.nodes_expanded:
+            return None
+        depth, total = self.solution_depth, self.nodes_generated + 1
+        if not depth:
+            return self.nodes_generated / self.nodes_expanded
+        low, high = 1.0, max(2.0, float(total))
+        for _ in range(60):
+            mid = (low + high) / 2
+            if sum(mid ** i for i in range(depth + 1)) < total:
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2
+
+    def to_dict(self) -> Dict[str, Any]:
+        ebf = self.effective_branching_factor
+        return {
+            'nodes_expanded': self.nodes_expanded,
+            'nodes_generated': self.nodes_generated,
+            'duplicates_pruned': self.duplicates_pruned,
+            'successors_pruned': self.successors_pruned,
+            'nodes_forgotten': self.nodes_forgotten,
+            'peak_open_size': self.peak_open_size,
+            'peak_visited_size': self.peak_visited_size,
+            'solution_depth': self.solution_depth,
+            'synthesis_states': self.synthesis_states,
+            'effective_branching_factor': round(ebf, 4) if ebf is not None else None,
+            'heuristic_calls': self.heuristic_calls,
+            'heuristic_time_ms': round(self.heuristic_time * 1000, 3),
+            'phase_times_ms': {name: round(t * 1000, 3) for name, t in self.phase_times.items()},
+        }
+
+class DistanceHeuristic:
+    """
+    Heuristic chấp nhận được (admissible) cho A*, tính sẵn một lần cho mỗi level.
+    Mỗi vật phẩm và đích có một trường khoảng cách thật (BFS ngược trên đồ thị đã biên dịch,
+    tính cả các lượt quay). Phần còn lại được chặn dưới bằng TSP chính xác hoặc MST trên các vật phẩm chưa nhặt,
+    ghi nhớ theo bitmask vật phẩm.
+    """
+    def __init__(self, world: GameWorld, stats: Optional[SearchStats] = None):
+        self.world = world
+        num_moves = len(MOVE_ACTIONS)
+        # Đồ thị ngược của các bước di chuyển: pose đích -> danh sách pose nguồn.
+        self._reverse_moves: Dict[int, List[int]] = {}
+        for cell in world.standable_cells:
+            for direction in range(4):
+                pose = cell * 4 + direction
+                for k in range(num_moves):
+                    dest = world.transitions[pose * num_moves + k]
+                    if dest != NO_CELL:
+                        self._reverse_moves.setdefault(dest * 4 + world.arrival_direction(dest, direction), []).append(pose)
+
+        finish = world.finish_pos
+        self.target_cells = list(world.collectible_bits) + [world.cell_index(finish['x'], finish['y'], finish['z'])]
+        self.fields: List[array] = []
+        for cell in self.target_cells:
+            if stats is not None:
+                stats.checkpoint()
+            self.fields.append(self._distance_field(cell))
+        self.finish_field = self.fields[-1]
+        self.exact_tsp = len(self.target_cells) - 1 <= TSP_EXACT_LIMIT
+        self.pair_costs: List[List[int]] = []
+        self._refresh_pair_costs()
+
+    def _refresh_pair_costs(self) -> None:
+        """Tính lại `pair_costs`; chỉ thay danh sách (và xóa bộ nhớ đệm TSP/MST) khi giá trị thật sự đổi."""
+        # Cận dưới khoảng cách giữa các mục tiêu (vật phẩm..., đích): min theo hướng xuất phát.
+        pair_costs = [
+            [min(field[cell * 4 + d] for d in range(4)) for field in self.fields] for cell in self.target_cells
+        ]
+        if pair_costs != self.pair_costs:
+            self.pair_costs = pair_costs
+            self._rest_memo: Dict[Tuple[int, int], int] = {}
+            self._mst_memo: Dict[int, int] = {}
+
+    def retarget(self, index: int, target_cell: int) -> None:
+        """Đổi ô mục tiêu thứ `index` (vật phẩm bị di chuyển) và tính lại riêng trường khoảng cách của nó."""
+        self.target_cells[index] = target_cell
+        self.fields[index] = self._distance_field(target_cell)
+        self.finish_field = self.fields[-1]
+        self._refresh_pair_costs()
+
+    def update_edges(self, changes: List[Tuple[int, int, int]]) -> Set[int]:
+        """
+        Cập nhật đồ thị ngược theo các chuyển trạng thái đã đổi (kết quả của `GameWorld.set_block`) rồi sửa
+        từng trường khoảng cách chỉ trong vùng bị ảnh hưởng. Trả về tập pose có thể đã đổi giá trị ở ít nhất một trường.
+        """
+        num_moves = len(MOVE_ACTIONS)
+        seeds = set()
+        for pose, k, old_dest in changes:
+            direction = pose & 3
+            if old_dest != NO_CELL:
+                sources = self._reverse_moves.get(old_dest * 4 + self.world.arrival_direction(old_dest, direction))
+                if sources and pose in sources:
+                    sources.remove(pose)
+            new_dest = self.world.transitions[pose * num_moves + k]
+            if new_dest != NO_CELL:
+                self._reverse_moves.setdefault(new_dest * 4 + self.world.arrival_direction(new_dest, direction), []).append(pose)
+            seeds.add(pose)
+        repaired: Set[int] = set()
+        for field, cell in zip(self.fields, self.target_cells):
+            repaired |= self._repair_field(field, cell, seeds)
+        self._refresh_pair_costs()
+        return repaired
+
+    def _repair_field(self, field: array, target_cell: int, seeds: Set[int]) -> Set[int]:
+        """
+        Sửa tăng dần một trường khoảng cách khi các cạnh ra của `seeds` thay đổi (LPA* với h = 0 trên đồ thị
+        ngược): chỉ các pose có khoảng cách thật sự đổi mới được đưa vào hàng đợi.
+        """
+        transitions, num_moves = self.world.transitions, len(MOVE_ACTIONS)
+        arrival = self.world.arrival_directions
+        reverse_moves = self._reverse_moves
+        rhs: Dict[int, int] = {}
+        heap: List[Tuple[int, int]] = []
+
+        def update(pose: int) -> None:
+            cell, direction = pose >> 2, pose & 3
+            if cell == target_cell:
+                value = 0
+            else:
+                best = min(field[(cell << 2) | ((direction + 1) & 3)], field[(cell << 2) | ((direction + 3) & 3)])
+                base = pose * num_moves
+                for k in range(num_moves):
+                    dest = transitions[base + k]
+                    if dest != NO_CELL and field[dest * 4 + arrival.get(dest, direction)] < best:
+                        best = field[dest * 4 + arrival.get(dest, direction)]
+                value = best + 1 if best < INF_COST else INF_COST
+            if value != field[pose]:
+                rhs[pose] = value
+                heapq.heappush(heap, (min(value, field[pose]), pose))
+            else:
+                rhs.pop(pose, None)
+
+        for pose in seeds:
+            update(pose)
+        processed: Set[int] = set()
+        while heap:
+            key, pose = heapq.heappop(heap)
+            value = rhs.get(pose)
+            if value is None or min(value, field[pose]) != key:
+                continue
+            processed.add(pose)
+            del rhs[pose]
+            if value < field[pose]:
+                field[pose] = value
+            else:
+                field[pose] = INF_COST
+                update(pose)
+            cell, direction = pose >> 2, pose & 3
+            update((cell << 2) | ((direction + 1) & 3))
+            update((cell << 2) | ((direction + 3) & 3))
+            for prev in reverse_moves.get(pose, ()):
+                update(prev)
+        return processed
+
+    def _distance_field(self, target_cell: int) -> array:
+        """BFS ngược từ mọi hướng tại `target_cell`: số hành động tối thiểu từ mỗi pose để đứng tại ô đó."""
+        field = array('i', [INF_COST]) * (len(self.world.grid) * 4)
+        queue = deque()
+        for direction in range(4):
+            field[target_cell * 4 + direction] = 0
+            queue.append(target_cell * 4 + direction)
+        while queue:
+            pose = queue.popleft()
+            next_cost = field[pose] + 1
+            cell, direction = pose >> 2, pose & 3
+            predecessors = [(cell << 2) | ((direction + 1) & 3), (cell << 2) | ((direction + 3) & 3)]
+            predecessors.extend(self._reverse_moves.get(pose, ()))
+            for prev in predecessors:
+                if field[prev] > next_cost:
+                    field[prev] = next_cost
+                    queue.append(prev)
+        return field
+
+    def _rest_cost(self, mask: int, last: int) -> int:
+        """Cận dưới chi phí đi từ vật phẩm `last`, ghé mọi vật phẩm trong `mask` rồi về đích."""
+        memo_key = (mask, last)
+        cached = self._rest_memo.get(memo_key)
+        if cached is not None:
+            return cached
+        if not mask:
+            result = self.pair_costs[last][-1]
+        elif self.exact_tsp:
+            result = INF_COST
+            bits = mask
+            while bits:
+                low = bits & -bits
+                j = low.bit_length() - 1
+                result = min(result, self.pair_costs[last][j] + self._rest_cost(mask ^ low, j))
+                bits ^= low
         else:
-            h += manhattan(current_pos, world.finish_pos)
-        h += len(uncollected_positions) * 10
-        return h
+            result = self._mst_cost(mask | (1 << last))
+        self._rest_memo[memo_key] = result
+        return result
+
+    def _mst_cost(self, mask: int) -> int:
+        """Trọng số cây khung nhỏ nhất (Prim) trên các vật phẩm trong `mask` cùng với đích."""
+        cached = self._mst_memo.get(mask)
+        if cached is not None:
+            return cached
+        finish_index = len(self.pair_costs) - 1
+        nodes = [i for i in range(finish_index) if mask >> i & 1] + [finish_index]
+        costs = self.pair_costs
+        best = {n: min(costs[finish_index][n], costs[n][finish_index]) for n in nodes[:-1]}
+        total = 0
+        while best:
+            n = min(best, key=best.get)
+            total += best.pop(n)
+            for other in best:
+                best[other] = min(best[other], costs[n][other], costs[other][n])
+        total = min(total, INF_COST)
+        self._mst_memo[mask] = total
+        return total
+
+    def evaluate(self, state: GameState) -> int:
+        """Giá trị heuristic của trạng thái; `INF_COST` nghĩa là không thể hoàn thành level từ đây."""
+        uncollected = self.world.all_collected_mask ^ state.collected
+        if not uncollected:
+            return self.finish_field[state.pose]
+        best, bits = INF_COST, uncollected
+        while bits:
+            low = bits & -bits
+            i = low.bit_length() - 1
+            best = min(best, self.fields[i][state.pose] + self._rest_cost(uncollected ^ low, i))
+            bits ^= low
+        # Mỗi vật phẩm còn lại tốn thêm đúng một hành động 'collect'.
+        return best + bin(uncollected).count('1') if best < INF_COST else INF_COST
+
+# --- Kiểm tra khả năng tới được (chạy trước A*, bỏ qua hướng và túi đồ) ---
+class ReachabilityReport:
+    """
+    Chẩn đoán của `check_reachability`. `feasible` False nghĩa là chắc chắn không có lời giải (điều ngược lại
+    không được đảm bảo). Mỗi mục của `unreachable_targets` có `kind` ('collectible' | 'finish'), `id`, `position`
+    và `reason`: 'unreachable' (không tới được từ vị trí xuất phát) hoặc 'dead_end' (tới được nhưng từ đó không về
+    được đích; chỉ xét khi bản thân đích tới được). `blocking_cells` là các khối chắn giữa vùng đi được và vùng quanh các mục tiêu đó.
+    """
+    __slots__ = ('feasible', 'reachable_cells', 'unreachable_targets', 'blocking_cells', 'elapsed_ms')
+
+    def __init__(self, feasible: bool, reachable_cells: int, unreachable_targets: List[Dict[str, Any]],
+                 blocking_cells: List[Dict[str, Any]], elapsed_ms: float):
+        self.feasible = feasible
+        self.reachable_cells = reachable_cells
+        self.unreachable_targets = unreachable_targets
+        self.blocking_cells = blocking_cells
+        self.elapsed_ms = elapsed_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'feasible': self.feasible,
+            'reachable_cells': self.reachable_cells,
+            'unreachable_targets': self.unreachable_targets,
+            'blocking_cells': self.blocking_cells,
+            'elapsed_ms': round(self.elapsed_ms, 3),
+        }
+
+def _flood_cells(world: GameWorld, sources: List[int], reverse: Optional[Dict[int, List[int]]] = None) -> Set[int]:
+    """Loang trên đồ thị ô đã biên dịch: đi xuôi theo `world.transitions`, hoặc đi ngược theo `reverse`."""
+    stride = 4 * len(MOVE_ACTIONS)
+    transitions = world.transitions
+    seen, queue = set(sources), deque(sources)
+    while queue:
+        cell = queue.popleft()
+        neighbours = transitions[cell * stride:(cell + 1) * stride] if reverse is None else reverse.get(cell, ())
+        for dest in neighbours:
+            if dest != NO_CELL and dest not in seen:
+                seen.add(dest)
+                queue.append(dest)
+    return seen
+
+def _reverse_cell_graph(world: GameWorld, cells) -> Dict[int, List[int]]:
+    stride = 4 * len(MOVE_ACTIONS)
+    reverse: Dict[int, List[int]] = {}
+    for cell in cells:
+        for dest in set(world.transitions[cell * stride:(cell + 1) * stride]):
+            if dest != NO_CELL:
+                reverse.setdefault(dest, []).append(cell)
+    return reverse
+
+def _blocking_cells(world: GameWorld, region: Set[int], target_side: Set[int]) -> List[Dict[str, Any]]:
+    """
+    Các khối làm tắc bước đi từ `region` về phía `target_side`: tường chắn ngang hoặc khối cao hơn một bậc
+    (không nhảy lên được), khi ngay trên cột đó hoặc cột phía sau nó có ô thuộc `target_side` ở độ cao lân cận.
+    """
+    num_moves = len(MOVE_ACTIONS)
+    columns: Dict[Tuple[int, int], List[int]] = {}
+    for cell in target_side:
+        x, y, z = world.cell_position(cell)
+        columns.setdefault((x, z), []).append(y)
+    found: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+    for cell in region:
+        x, y, z = world.cell_position(cell)
+        for direction, (dx, _, dz) in enumerate(DIRECTIONS):
+            base = (cell * 4 + direction) * num_moves
+            if any(world.transitions[base + k] != NO_CELL for k in range(num_moves)):
+                continue
+            behind = columns.get((x + dx, z + dz), []) + columns.get((x + 2 * dx, z + 2 * dz), [])
+            if not any(y - 1 <= h <= y + 2 for h in behind):
+                continue
+            for block_y in (y, y + 1):
+                model_key = world.world_map.get(f"{x + dx}-{block_y}-{z + dz}")
+                if model_key is not None:
+                    found[(x + dx, block_y, z + dz)] = {'x': x + dx, 'y': block_y, 'z': z + dz, 'modelKey': model_key}
+    return [found[pos] for pos in sorted(found)]
+
+def check_reachability(world: GameWorld, start: Optional[GameState] = None,
+                       stats: Optional[SearchStats] = None) -> ReachabilityReport:
+    """
+    Tiền kiểm rẻ trước A*: loang trên đồ thị ô (bỏ qua hướng, vật phẩm và công tắc, vốn không chặn đường)
+    để kiểm tra mọi vật phẩm chưa nhặt và đích đều tới được, và từ mỗi vật phẩm vẫn về được đích.
+    Chi phí O(số ô), nên level không giải được bị loại trong vài mili giây thay vì duyệt hết không gian trạng thái.
+    `stats.checkpoint()` được gọi trước mỗi lần loang.
+    """
+    checkpoint = stats.checkpoint if stats is not None else lambda: None
+    started = time.perf_counter()
+    start_state = start or GameState.initial(world)
+    finish = world.finish_pos
+    finish_cell = world.cell_index(finish['x'], finish['y'], finish['z'])
+    checkpoint()
+    forward = _flood_cells(world, [start_state.pose >> 2])
+    checkpoint()
+    to_finish = _flood_cells(world, [finish_cell], _reverse_cell_graph(world, forward))
+
+    targets = []
+    for item in world.collectibles.values():
+        pos = item['position']
+        cell = world.cell_index(pos['x'], pos['y'], pos['z'])
+        if not start_state.collected & world.collectible_bits.get(cell, 0):
+            targets.append(('collectible', item.get('id'), pos, cell))
+    targets.append(('finish', 'finish', finish, finish_cell))
+    report: List[Dict[str, Any]] = []
+    unreachable: List[int] = []
+    dead_ends: List[int] = []
+    for kind, target_id, pos, cell in targets:
+        if cell not in forward:
+            unreachable.append(cell)
+            reason = 'unreachable'
+        elif cell not in to_finish and finish_cell in forward:
+            dead_ends.append(cell)
+            reason = 'dead_end'
+        else:
+            continue
+        report.append({'kind': kind, 'id': target_id, 'position': {'x': pos['x'], 'y': pos['y'], 'z': pos['z']},
+                       'reason': reason})
+
+    blocking: List[Dict[str, Any]] = []
+    checkpoint()
+    if unreachable:
+        # Phía mục tiêu: các ô (trên toàn level) từ đó đi tới được một mục tiêu không tới được.
+        target_side = _flood_cells(world, unreachable, _reverse_cell_graph(world, world.standable_cells))
+        blocking.extend(_blocking_cells(world, forward, target_side))
+    if dead_ends:
+        checkpoint()
+        blocking.extend(_blocking_cells(world, _flood_cells(world, dead_ends), to_finish))
+    unique = {(b['x'], b['y'], b['z']): b for b in blocking}
+    return ReachabilityReport(not report, len(forward), report, [unique[pos] for pos in sorted(unique)],
+                              (time.perf_counter() - started) * 1000)
+
+def solve_level(world: GameWorld, heuristic_mode: str = 'admissible',
+                stats: Optional[SearchStats] = None, engine: str = 'astar',
+                max_nodes: Optional[int] = None, max_bytes: Optional[int] = None,
+                start: Optional[GameState] = None, prune: bool = True, workers: int = 1) -> Optional[List[Action]]:
+    """
+    Thực thi thuật toán A* để tìm lời giải cho level.
+    - 'admissible': A* với heuristic chấp nhận được, đảm bảo lời giải tối ưu.
+    - 'greedy': tìm kiếm tham lam theo heuristic, nhanh hơn nhưng không đảm bảo tối ưu.
+    Với `engine='ida'`, dùng IDA* có bộ nhớ bị chặn bởi `max_nodes` (số trạng thái) và/hoặc `max_bytes`;
+    số trạng thái bị quên được ghi vào `stats.nodes_forgotten`. Engine này luôn tối ưu nên chỉ nhận 'admissible'.
+    `engine='hierarchical'` gọi `solve_level_hierarchical` với cấu hình mặc định (cũng chỉ nhận 'admissible').
+    `start` cho phép giải tiếp từ một trạng thái bất kỳ (mặc định là trạng thái đầu của level).
+    Trước khi tìm kiếm luôn chạy `check_reachability`; level chắc chắn vô nghiệm trả về None ngay.
+    `prune=False` tắt các luật cắt tỉa của `search_successors` và giữ nguyên bit công tắc trong khóa (để so sánh).
+    `workers > 1` chạy A* song song phân tán theo băm trên nhiều tiến trình khi có đủ CPU và level đủ lớn (xem
+    `parallelSolver`), vẫn tối ưu.
+    """
+    if heuristic_mode not in HEURISTIC_MODES:
+        raise ValueError(f"heuristic_mode không hợp lệ: {heuristic_mode!r} (chọn một trong {HEURISTIC_MODES})")
+    if engine not in SEARCH_ENGINES:
+        raise ValueError(f"engine không hợp lệ: {engine!r} (chọn một trong {SEARCH_ENGINES})")
+    if engine != 'astar' and heuristic_mode != 'admissible':
+        raise ValueError(f"engine {engine!r} chỉ hỗ trợ heuristic_mode 'admissible'")
+    if workers > 1 and (engine != 'astar' or heuristic_mode != 'admissible'):
+        raise ValueError("workers > 1 chỉ hỗ trợ engine 'astar' với heuristic_mode 'admissible'")
+    if workers > 1:
+        from parallelSolver import solve_level_parallel  # Nhập muộn: parallelSolver phụ thuộc module này.
+        if stats is None:
+            return solve_level_parallel(world, workers, None, start, prune) \
+                if check_reachability(world, start).feasible else None
+        with stats.phase('solve'):
+            actions = solve_level_parallel(world, workers, stats, start, prune) \
+                if check_reachability(world, start, stats).feasible else None
+        stats.solution_depth = len(actions) if actions is not None else None
+        return actions
+    if stats is None:
+        if not check_reachability(world, start).feasible:
+            return None
+        if engine == 'ida':
+            return _solve_ida(world, None, max_nodes, max_bytes, start, prune)
+        if engine == 'hierarchical':
+            return solve_level_hierarchical(world, start=start).actions
+        return _solve_astar(world, heuristic_mode == 'greedy', None, start, prune)
+    with stats.phase('solve'):
+        if not check_reachability(world, start, stats).feasible:
+            actions = None
+        elif engine == 'ida':
+            actions = _solve_ida(world, stats, max_nodes, max_bytes, start, prune)
+        elif engine == 'hierarchical':
+            actions = solve_level_hierarchical(world, stats=stats, start=start).actions
+        else:
+            actions = _solve_astar(world, heuristic_mode == 'greedy', stats, start, prune)
+    stats.solution_depth = len(actions) if actions is not None else None
+    return actions
+
+def _solve_astar(world: GameWorld, greedy: bool, stats: Optional[SearchStats],
+                 start: Optional[GameState] = None, prune: bool = True) -> Optional[List[Action]]:
+    """Vòng lặp A* (hoặc tìm kiếm tham lam khi `greedy`) với hàng đợi ưu tiên nhị phân."""
+    for event in _astar_events(world, greedy, stats, start, None, prune):
+        pass
+    return event.actions
+
+class SearchProgress:
+    """
+    Sự kiện tiến độ của `solve_level_iter`. `best_f` là f nhỏ nhất trên biên (cận dưới của độ dài lời giải ở chế độ
+    'admissible'), `partial_path` là đường đi tới trạng thái có h nhỏ nhất đã gặp (gần đích nhất).
+    Sự kiện cuối cùng có `done=True`; khi đó `actions` là lời giải (None nếu không có).
+    """
+    __slots__ = ('nodes_expanded', 'nodes_generated', 'best_f', 'frontier_size', 'visited_size', 'best_h',
+                 'partial_path', 'elapsed_ms', 'done', 'actions')
+
+    def __init__(self, nodes_expanded: int, nodes_generated: int, best_f: int, frontier_size: int, visited_size: int,
+                 best_h: int, partial_path: List[Action], elapsed_ms: float, done: bool = False,
+                 actions: Optional[List[Action]] = None):
+        self.nodes_expanded, self.nodes_generated = nodes_expanded, nodes_generated
+        self.best_f, self.frontier_size, self.visited_size = best_f, frontier_size, visited_size
+        self.best_h, self.partial_path, self.elapsed_ms = best_h, partial_path, elapsed_ms
+        self.done, self.actions = done, actions
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def solve_level_iter(world: GameWorld, heuristic_mode: str = 'admissible', report_every: int = 1000,
+                     stats: Optional[SearchStats] = None, start: Optional[GameState] = None) -> Iterator[SearchProgress]:
+    """
+    Phiên bản luồng (generator) của `solve_level` với engine A*: cứ mỗi `report_every` lần mở rộng nút lại trả về
+    một SearchProgress rồi tạm dừng cho tới khi người gọi lấy sự kiện tiếp theo. Không gọi `next()` là tạm dừng,
+    gọi lại là tiếp tục, bỏ generator (hoặc `close()`) là hủy; nhờ vậy có thể xen kẽ nhiều lần giải trong một luồng:
+
+        searches = [solve_level_iter(w, report_every=500) for w in worlds]
+        while searches:
+            for search in list(searches):
+                event = next(search)
+                if event.done:
+                    searches.remove(search)
+    """
+    if heuristic_mode not in HEURISTIC_MODES:
+        raise ValueError(f"heuristic_mode không hợp lệ: {heuristic_mode!r} (chọn một trong {HEURISTIC_MODES})")
+    return _astar_events(world, heuristic_mode == 'greedy', stats, start, max(1, report_every), True)
 
+def _path_to(node: Optional[PathNode]) -> List[Action]:
+    path: List[Action] = []
+    while node and node.action:
+        path.append(node.action)
+        node = node.parent
+    path.reverse()
+    return path
+
+def _astar_events(world: GameWorld, greedy: bool, stats: Optional[SearchStats], start: Optional[GameState],
+                  report_every: Optional[int], prune: bool = True) -> Iterator[SearchProgress]:
+    """Thân A* dạng generator; chỉ trả về sự kiện tiến độ khi có `report_every`, sự kiện cuối luôn được trả về."""
+    started = time.perf_counter()
+    heuristic = world.get_distance_heuristic(stats).evaluate
+    if stats is not None:
+        heuristic = stats.timed(heuristic)
+    start_state = search_start(world, start) if prune else start or GameState.initial(world)
+    start_node = PathNode(start_state)
     start_node.h_cost = heuristic(start_state)
-    open_list.append(start_node)
+    if start_node.h_cost >= INF_COST:
+        yield SearchProgress(0, 0, INF_COST, 0, 1, INF_COST, [], (time.perf_counter() - started) * 1000, True, None)
+        return
+    # Hàng đợi ưu tiên: (f, h, thứ tự chèn, node) hoặc (h, g, ...) ở chế độ tham lam.
+    # Thứ tự chèn giúp phá hòa một cách tất định.
+    open_list: List[Tuple[int, int, int, PathNode]] = []
+    counter = itertools.count()
+    best_g: Dict[Tuple[int, int, int], int] = {start_state.get_key(): 0}
+    finish_cell = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    heapq.heappush(open_list, (start_node.f_cost, start_node.h_cost, next(counter), start_node))
+    expanded = generated = 0
+    closest = start_node
+
+    def progress(f_cost: int, done: bool = False, actions: Optional[List[Action]] = None) -> SearchProgress:
+        return SearchProgress(expanded, generated, f_cost, len(open_list), len(best_g), closest.h_cost,
+                              _path_to(closest), (time.perf_counter() - started) * 1000, done, actions)
 
     while open_list:
-        open_list.sort(key=lambda node: node.f_cost)
-        current_node = open_list.pop(0)
-        state_key = current_node.state.get_key()
-        if state_key in visited:
+        current_node = heapq.heappop(open_list)[3]
+        state = current_node.state
+        # Xóa lười: bỏ qua các bản ghi đã lỗi thời (trạng thái đã được tìm thấy với g tốt hơn).
+        if current_node.g_cost > best_g[state.get_key()]:
             continue
-        visited.add(state_key)
+        expanded += 1
+        if stats is not None:
+            stats.record_expansion(len(open_list), len(best_g))
+        if report_every is not None and expanded % report_every == 0:
+            yield progress(current_node.f_cost)
 
-        state = current_node.state
-        is_at_finish = state.x == world.finish_pos['x'] and state.y == world.finish_pos['y'] and state.z == world.finish_pos['z']
-        all_collected = len(state.collected_items) == len(world.collectibles)
-        
-        if is_at_finish and all_collected:
-            path: List[Action] = []
-            curr = current_node
-            while curr and curr.action:
-                path.insert(0, curr.action)
-                curr = curr.parent
-            return path
-
-        DIRECTIONS = [(0, 0, -1), (1, 0, 0), (0, 0, 1), (-1, 0, 0)]
-        for action in ['moveForward', 'turnLeft', 'turnRight', 'collect', 'jump', 'toggleSwitch']:
-            next_state = state.clone()
-            is_valid_move = False
-            current_pos_key = f"{state.x}-{state.y}-{state.z}"
-
-            if action in ['moveForward', 'jump']:
-                dx, _, dz = DIRECTIONS[state.direction]
-                dy = 1 if action == 'jump' else 0
-                next_x, next_y, next_z = state.x + dx, state.y + dy, state.z + dz
-                
-                dest_key = f"{next_x}-{next_y}-{next_z}"
-                ground_key = f"{next_x}-{next_y-1}-{next_z}"
-                model_at_dest = world.world_map.get(dest_key)
-                model_at_ground = world.world_map.get(ground_key)
-                
-                is_dest_clear = model_at_dest is None or model_at_dest not in GameWorld.SOLID_WALLS
-                is_ground_safe = model_at_ground is not None and model_at_ground in GameWorld.WALKABLE_GROUNDS
-                
-                if not is_ground_safe and action == 'moveForward' and dy == 0:
-                    fall_ground_key = f"{next_x}-{next_y-2}-{next_z}"
-                    if world.world_map.get(fall_ground_key) in GameWorld.WALKABLE_GROUNDS:
-                        next_y -= 1
-                        is_ground_safe = True
-
-                if is_dest_clear and is_ground_safe:
-                    next_state.x, next_state.y, next_state.z = next_x, next_y, next_z
-                    is_valid_move = True
-            elif action == 'turnLeft':
-                next_state.direction = (state.direction + 3) % 4
-                is_valid_move = True
-            elif action == 'turnRight':
-                next_state.direction = (state.direction + 1) % 4
-                is_valid_move = True
-            elif action == 'collect':
-                if current_pos_key in world.collectibles and world.collectibles[current_pos_key]['id'] not in state.collected_items:
-                    next_state.collected_items.add(world.collectibles[current_pos_key]['id'])
-                    is_valid_move = True
-            elif action == 'toggleSwitch':
-                if current_pos_key in world.switches:
-                    switch = world.switches[current_pos_key]
-                    current_switch_state = state.switch_states[switch['id']]
-                    next_state.switch_states[switch['id']] = 'off' if current_switch_state == 'on' else 'on'
-                    is_valid_move = True
-            
-            if is_valid_move:
-                if next_state.get_key() in visited: continue
-                next_node = PathNode(next_state)
-                next_node.parent, next_node.action = current_node, action
-                next_node.g_cost = current_node.g_cost + 1
-                next_node.h_cost = heuristic(next_state)
-                open_list.append(next_node)
+        if state.pose >> 2 == finish_cell and state.collected == world.all_collected_mask:
+            closest = current_node
+            yield progress(current_node.f_cost, True, _path_to(current_node))
+            return
+
+        next_g = current_node.g_cost + 1
+        if prune:
+            parent = current_node.parent
+            successors = search_successors(world, state, current_node.action,
+                                           parent.action if parent is not None else None, stats)
+        else:
+            successors = get_successors(world, state)
+        for action, next_state in successors:
+            next_key = next_state.get_key()
+            # Loại bỏ bản sao bị trội ngay trước khi đẩy vào hàng đợi.
+            if next_g >= best_g.get(next_key, next_g + 1):
+                if stats is not None:
+                    stats.duplicates_pruned += 1
+                continue
+            h_cost = heuristic(next_state)
+            if h_cost >= INF_COST: continue
+            best_g[next_key] = next_g
+            next_node = PathNode(next_state)
+            next_node.parent, next_node.action = current_node, action
+            next_node.g_cost, next_node.h_cost = next_g, h_cost
+            generated += 1
+            if stats is not None:
+                stats.nodes_generated += 1
+            if h_cost < closest.h_cost or h_cost == closest.h_cost and next_g > closest.g_cost:
+                closest = next_node
+            if greedy:
+                heapq.heappush(open_list, (h_cost, next_g, next(counter), next_node))
+            else:
+                heapq.heappush(open_list, (next_g + h_cost, h_cost, next(counter), next_node))
+    yield progress(INF_COST, True, None)
+
+# --- Tìm kiếm anytime: ARA* (A* có trọng số giảm dần, tái sử dụng công sức tìm kiếm) ---
+class AnytimeSolution:
+    """Một lời giải trung gian của ARA*: `bound` là cận trên đã chứng minh của tỉ lệ độ dài / độ dài tối ưu."""
+    __slots__ = ('actions', 'bound', 'weight', 'elapsed_ms')
+
+    def __init__(self, actions: List[Action], bound: float, weight: float, elapsed_ms: float):
+        self.actions, self.bound, self.weight, self.elapsed_ms = actions, bound, weight, elapsed_ms
+
+    @property
+    def length(self) -> int:
+        return len(self.actions)
+
+class AnytimeResult:
+    """Kết quả của `solve_level_anytime`: lời giải tốt nhất (có thể None), cận của nó và lịch sử cải thiện."""
+    def __init__(self):
+        self.solutions: List[AnytimeSolution] = []
+        self.optimal = False
+        self.timed_out = False
+
+    @property
+    def best(self) -> Optional[AnytimeSolution]:
+        return self.solutions[-1] if self.solutions else None
+
+    @property
+    def actions(self) -> Optional[List[Action]]:
+        return self.best.actions if self.solutions else None
+
+    @property
+    def bound(self) -> float:
+        return self.best.bound if self.solutions else float('inf')
+
+def solve_level_anytime(world: GameWorld, time_budget_ms: float = 200, initial_weight: float = 3.0,
+                        weight_step: float = 0.5, on_solution: Optional[Callable[[AnytimeSolution], None]] = None,
+                        stats: Optional[SearchStats] = None) -> AnytimeResult:
+    """
+    ARA*: bắt đầu với heuristic nhân trọng số cao để có lời giải nhanh, sau đó giảm trọng số và tiếp tục từ
+    các trạng thái đã có (OPEN + INCONS) để cải thiện lời giải cho đến khi hết `time_budget_ms` hoặc chứng minh tối ưu.
+    Mỗi lời giải tốt hơn được gửi tới `on_solution` (nếu có) ngay khi tìm thấy.
+    """
+    if stats is None:
+        return _solve_anytime(world, time_budget_ms, initial_weight, weight_step, on_solution, None)
+    with stats.phase('solve'):
+        result = _solve_anytime(world, time_budget_ms, initial_weight, weight_step, on_solution, stats)
+    stats.solution_depth = len(result.actions) if result.actions is not None else None
+    return result
+
+def _solve_anytime(world: GameWorld, time_budget_ms: float, initial_weight: float, weight_step: float,
+                   on_solution: Optional[Callable[[AnytimeSolution], None]],
+                   stats: Optional[SearchStats]) -> AnytimeResult:
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0
+    result = AnytimeResult()
+    heuristic = world.get_distance_heuristic(stats).evaluate
+    if stats is not None:
+        heuristic = stats.timed(heuristic)
+    finish_cell = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    start_state = search_start(world)
+    start_key = start_state.get_key()
+    if heuristic(start_state) >= INF_COST:
+        result.optimal = True
+        return result
+
+    g_of: Dict[Tuple[int, int, int], int] = {start_key: 0}
+    h_of: Dict[Tuple[int, int, int], int] = {start_key: heuristic(start_state)}
+    parent_of: Dict[Tuple[int, int, int], Tuple[Optional[Tuple[int, int, int]], Optional[Action]]] = {start_key: (None, None)}
+    counter = itertools.count()
+    weight = max(1.0, initial_weight)
+    open_list: List[Tuple[float, int, int, int, Tuple[int, int, int]]] = []
+    closed: Set[Tuple[int, int, int]] = set()
+    incons: Set[Tuple[int, int, int]] = set()
+    goal_key: Optional[Tuple[int, int, int]] = None
+    goal_g = INF_COST
+
+    def push(key: Tuple[int, int, int]) -> None:
+        g, h = g_of[key], h_of[key]
+        heapq.heappush(open_list, (g + weight * h, h, next(counter), g, key))
+
+    def top_key() -> float:
+        # Bỏ các bản ghi lỗi thời ở đỉnh heap để có khóa nhỏ nhất thực sự.
+        while open_list and (open_list[0][4] in closed or open_list[0][3] != g_of[open_list[0][4]]):
+            heapq.heappop(open_list)
+        return open_list[0][0] if open_list else float('inf')
+
+    def publish() -> None:
+        actions: List[Action] = []
+        key = goal_key
+        while key is not None:
+            key, action = parent_of[key]
+            if action is not None:
+                actions.append(action)
+        actions.reverse()
+        # Cận dưới của chi phí tối ưu: min(g + h) trên OPEN và INCONS.
+        pending = [k for k in incons] + [entry[4] for entry in open_list
+                                          if entry[4] not in closed and entry[3] == g_of[entry[4]]]
+        lower = min((g_of[k] + h_of[k] for k in pending), default=goal_g)
+        bound = max(1.0, min(weight, goal_g / lower)) if lower > 0 else 1.0
+        if result.solutions and result.solutions[-1].length == len(actions) and result.solutions[-1].bound <= bound:
+            return
+        solution = AnytimeSolution(actions, bound, weight, (time.perf_counter() - started) * 1000)
+        result.solutions.append(solution)
+        if on_solution is not None:
+            on_solution(solution)
+
+    push(start_key)
+    while True:
+        # ImprovePath: mở rộng cho đến khi lời giải hiện tại không thể cải thiện với trọng số này.
+        while goal_g > top_key():
+            if time.perf_counter() > deadline:
+                result.timed_out = True
+                return result
+            _, _, _, g, key = heapq.heappop(open_list)
+            closed.add(key)
+            if stats is not None:
+                stats.record_expansion(len(open_list), len(g_of))
+            state = GameState(*key)
+            if state.pose >> 2 == finish_cell and state.collected == world.all_collected_mask and g < goal_g:
+                goal_key, goal_g = key, g
+                continue
+            parent_key, last_action = parent_of[key]
+            previous_action = parent_of[parent_key][1] if parent_key is not None else None
+            for action, next_state in search_successors(world, state, last_action, previous_action, stats):
+                next_key = next_state.get_key()
+                if g + 1 >= g_of.get(next_key, INF_COST):
+                    if stats is not None:
+                        stats.duplicates_pruned += 1
+                    continue
+                if next_key not in h_of:
+                    h_of[next_key] = heuristic(next_state)
+                if h_of[next_key] >= INF_COST:
+                    continue
+                g_of[next_key] = g + 1
+                parent_of[next_key] = (key, action)
+                if stats is not None:
+                    stats.nodes_generated += 1
+                if next_key in closed:
+                    incons.add(next_key)
+                else:
+                    push(next_key)
+
+        if goal_key is not None:
+            publish()
+        # Dừng khi đã chạy xong với trọng số 1, không còn trạng thái nào, hoặc cận đã chứng minh được tối ưu.
+        if weight <= 1.0 or not (open_list or incons) or (result.solutions and result.bound <= 1.0):
+            result.optimal = True
+            if result.solutions:
+                result.solutions[-1].bound = 1.0
+            return result
+        # Giảm trọng số, đưa INCONS trở lại OPEN và tính lại khóa với trọng số mới.
+        weight = max(1.0, weight - weight_step)
+        pending = incons | {entry[4] for entry in open_list if entry[4] not in closed and entry[3] == g_of[entry[4]]}
+        open_list.clear()
+        incons.clear()
+        closed.clear()
+        for key in pending:
+            push(key)
+
+# --- Tìm kiếm giới hạn bộ nhớ: IDA* với bảng chuyển vị dung lượng cố định ---
+# Ước lượng số byte cho một ô của bảng chuyển vị: con trỏ trong list + tuple khóa 3 số nguyên + g + thế hệ.
+TT_ENTRY_BYTES = 128
+
+class TranspositionTable:
+    """
+    Bảng chuyển vị ánh xạ trực tiếp với dung lượng cố định, cấp phát một lần.
+    Khi hai trạng thái rơi vào cùng một ô, trạng thái cũ bị ghi đè ("quên") - bộ nhớ không bao giờ vượt mức.
+    `clear()` chỉ tăng số thế hệ, các ô của thế hệ cũ được coi là trống.
+    """
+    __slots__ = ('capacity', 'keys', 'values', 'generations', 'generation', 'size', 'forgotten')
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.keys: List[Optional[Tuple[int, int, int]]] = [None] * self.capacity
+        self.values = array('i', bytes(4 * self.capacity))
+        self.generations = array('i', bytes(4 * self.capacity))
+        self.generation = 1
+        self.size = 0
+        self.forgotten = 0
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.size = 0
+
+    def get(self, key: Tuple[int, int, int]) -> Optional[int]:
+        slot = hash(key) % self.capacity
+        if self.generations[slot] == self.generation and self.keys[slot] == key:
+            return self.values[slot]
+        return None
+
+    def store(self, key: Tuple[int, int, int], g_cost: int) -> None:
+        slot = hash(key) % self.capacity
+        if self.generations[slot] != self.generation:
+            self.size += 1
+        elif self.keys[slot] != key:
+            self.forgotten += 1
+        self.keys[slot] = key
+        self.values[slot] = g_cost
+        self.generations[slot] = self.generation
+
+def _solve_ida(world: GameWorld, stats: Optional[SearchStats], max_nodes: Optional[int], max_bytes: Optional[int],
+               start: Optional[GameState] = None, prune: bool = True) -> Optional[List[Action]]:
+    """
+    IDA* (lặp sâu dần theo ngưỡng f) dùng bảng chuyển vị cố định để cắt các trạng thái đã gặp với g không tốt hơn
+    trong cùng vòng lặp. Bộ nhớ bị chặn bởi dung lượng bảng cộng với độ sâu lời giải; việc quên trạng thái chỉ
+    làm tìm kiếm lặp lại nhiều hơn, lời giải vẫn tối ưu vì heuristic chấp nhận được.
+    """
+    capacity = max_nodes or DEFAULT_TT_CAPACITY
+    if max_bytes is not None:
+        capacity = min(capacity, max_bytes // TT_ENTRY_BYTES)
+    table = TranspositionTable(capacity)
+    heuristic = world.get_distance_heuristic(stats).evaluate
+    if stats is not None:
+        heuristic = stats.timed(heuristic)
+    finish_cell = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    start_state = search_start(world, start) if prune else start or GameState.initial(world)
+    threshold = heuristic(start_state)
+
+    def is_goal(state: GameState) -> bool:
+        return state.pose >> 2 == finish_cell and state.collected == world.all_collected_mask
+
+    while threshold < INF_COST:
+        next_threshold = INF_COST
+        table.clear()
+        table.store(start_state.get_key(), 0)
+
+        def expand(state: GameState, g_cost: int) -> Iterator[Tuple[int, int, Action, GameState]]:
+            nonlocal next_threshold
+            if stats is not None:
+                stats.record_expansion(len(stack), table.size)
+            children = []
+            if prune:
+                successors = search_successors(world, state, path[-1] if path else None,
+                                               path[-2] if len(path) > 1 else None, stats)
+            else:
+                successors = get_successors(world, state)
+            for action, next_state in successors:
+                h_cost = heuristic(next_state)
+                f_cost = g_cost + 1 + h_cost
+                if f_cost > threshold:
+                    next_threshold = min(next_threshold, f_cost)
+                    continue
+                children.append((h_cost, len(children), action, next_state))
+            children.sort()
+            return iter(children)
+
+        if is_goal(start_state):
+            return []
+        path: List[Action] = []
+        stack: List[Tuple[int, Iterator[Tuple[int, int, Action, GameState]]]] = []
+        stack.append((0, expand(start_state, 0)))
+        while stack:
+            g_cost, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+            _, _, action, next_state = child
+            next_key, next_g = next_state.get_key(), g_cost + 1
+            seen_g = table.get(next_key)
+            if seen_g is not None and seen_g <= next_g:
+                if stats is not None:
+                    stats.duplicates_pruned += 1
+                continue
+            table.store(next_key, next_g)
+            if stats is not None:
+                stats.nodes_generated += 1
+            path.append(action)
+            if is_goal(next_state):
+                if stats is not None:
+                    stats.nodes_forgotten += table.forgotten
+                return path
+            stack.append((next_g, expand(next_state, next_g)))
+        threshold = next_threshold
+    if stats is not None:
+        stats.nodes_forgotten += table.forgotten
     return None
 
+# --- Bộ giải phân cấp: thứ tự ghé vật phẩm (Held-Karp / nhánh cận), rồi nối các đoạn đường ngắn nhất ---
+# Với số vật phẩm không quá ngưỡng này, thứ tự ghé được giải chính xác bằng Held-Karp; lớn hơn thì dùng nhánh cận.
+HELD_KARP_LIMIT = 10
+
+class HierarchicalResult:
+    """
+    Kết quả của `solve_level_hierarchical`. `optimal` True khi thứ tự ghé đã được chứng minh tối ưu
+    (Held-Karp, hoặc nhánh cận chạy hết trước `time_budget_ms`); `order` là id vật phẩm theo thứ tự ghé.
+    """
+    __slots__ = ('actions', 'optimal', 'order', 'timed_out', 'legs_searched', 'elapsed_ms')
+
+    def __init__(self, actions: Optional[List[Action]], optimal: bool, order: List[Any], timed_out: bool,
+                 legs_searched: int, elapsed_ms: float):
+        self.actions = actions
+        self.optimal = optimal
+        self.order = order
+        self.timed_out = timed_out
+        self.legs_searched = legs_searched
+        self.elapsed_ms = elapsed_ms
+
+class _LegTable:
+    """
+    Chi phí thật (tính cả lượt quay) giữa các pose mốc: pose xuất phát, 4 hướng tại mỗi vật phẩm và ô đích.
+    Mỗi pose nguồn có một BFS xuôi trên đồ thị pose, dừng khi mọi pose mốc đã được gặp; con trỏ cha được giữ lại
+    để dựng đoạn đường giữa hai mốc mà không phải tìm lại.
+    """
+    def __init__(self, world: GameWorld, start_pose: int, target_cells: List[int], finish_cell: int,
+                 stats: Optional[SearchStats]):
+        self.world = world
+        self.stats = stats
+        self.landmarks = {(cell << 2) | d for cell in target_cells + [finish_cell] for d in range(4)}
+        self.parents: Dict[int, array] = {}
+        self.costs: Dict[int, Dict[int, int]] = {}
+        for source in [start_pose] + [(cell << 2) | d for cell in target_cells for d in range(4)]:
+            if source not in self.costs:
+                self._search(source)
+
+    def _search(self, source: int) -> None:
+        transitions, landmarks, stats = self.world.transitions, self.landmarks, self.stats
+        arrival = self.world.arrival_directions
+        parent = array('i', [-1]) * (len(self.world.grid) * 4)
+        parent[source] = source
+        costs: Dict[int, int] = {}
+        frontier, depth, remaining = [source], 0, len(landmarks)
+        while frontier and remaining:
+            next_frontier = []
+            append = next_frontier.append
+            for pose in frontier:
+                if pose in landmarks:
+                    costs[pose] = depth
+                    remaining -= 1
+                if stats is not None:
+                    stats.record_expansion(len(frontier), len(costs))
+                base, direction = pose & ~3, pose & 3
+                # Hai MOVE_ACTIONS (moveForward, jump) nằm liền nhau trong `transitions`.
+                forward, jump = transitions[pose * 2], transitions[pose * 2 + 1]
+                for nxt in (base | ((direction + 3) & 3), base | ((direction + 1) & 3),
+                            (forward << 2) | arrival.get(forward, direction) if forward != NO_CELL else -1,
+                            (jump << 2) | arrival.get(jump, direction) if jump != NO_CELL else -1):
+                    if nxt >= 0 and parent[nxt] < 0:
+                        parent[nxt] = pose
+                        append(nxt)
+            frontier, depth = next_frontier, depth + 1
+        self.parents[source] = parent
+        self.costs[source] = costs
+
+    def cost(self, source: int, target: int) -> int:
+        return self.costs[source].get(target, INF_COST)
+
+    def path(self, source: int, target: int) -> List[Action]:
+        """Dựng lại đoạn đường ngắn nhất `source` -> `target` từ con trỏ cha của BFS nguồn."""
+        parent, transitions, num_moves = self.parents[source], self.world.transitions, len(MOVE_ACTIONS)
+        actions: List[Action] = []
+        pose = target
+        while pose != source:
+            prev = parent[pose]
+            # Một bước qua cổng dịch chuyển có thể hạ cánh ngay tại ô cũ, nên xét bước di chuyển trước lượt quay.
+            cell, arrived = pose >> 2, self.world.arrival_direction(pose >> 2, prev & 3)
+            if transitions[prev * num_moves] == cell and arrived == pose & 3:
+                actions.append('moveForward')
+            elif transitions[prev * num_moves + 1] == cell and arrived == pose & 3:
+                actions.append('jump')
+            else:
+                actions.append('turnLeft' if pose & 3 == ((prev & 3) + 3) & 3 else 'turnRight')
+            pose = prev
+        actions.reverse()
+        return actions
+
+def _held_karp(start_costs: List[int], pair_costs: List[List[int]], finish_costs: List[int],
+               k: int) -> Tuple[int, List[int]]:
+    """
+    Held-Karp trên các nút (vật phẩm, hướng tới) = i * 4 + hướng: dp[mask][nút] là chi phí nhỏ nhất xuất phát,
+    ghé đúng các vật phẩm trong `mask` và đứng ở `nút`. Trả về (chi phí, dãy nút) hoặc (INF_COST, []).
+    Nút bị trội (quay tại chỗ từ một hướng khác của cùng vật phẩm cũng không đắt hơn) không cần mở rộng.
+    """
+    full = (1 << k) - 1
+    dp: List[Optional[List[int]]] = [None] * (1 << k)
+    back: List[Optional[List[int]]] = [None] * (1 << k)
+    for node in range(4 * k):
+        mask = 1 << (node >> 2)
+        if dp[mask] is None:
+            dp[mask], back[mask] = [INF_COST] * (4 * k), [-1] * (4 * k)
+        dp[mask][node] = start_costs[node]
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        if row is None:
+            continue
+        rest = [i for i in range(k) if not mask >> i & 1]
+        for node, value in enumerate(row):
+            if value >= INF_COST:
+                continue
+            base, direction = node & ~3, node & 3
+            if (row[base | ((direction + 1) & 3)] + 1 <= value or row[base | ((direction + 3) & 3)] + 1 <= value
+                    or row[base | ((direction + 2) & 3)] + 2 < value):
+                continue
+            costs = pair_costs[node]
+            for i in rest:
+                next_mask = mask | (1 << i)
+                target, target_back = dp[next_mask], back[next_mask]
+                if target is None:
+                    target = dp[next_mask] = [INF_COST] * (4 * k)
+                    target_back = back[next_mask] = [-1] * (4 * k)
+                for nxt in range(i * 4, i * 4 + 4):
+                    total = value + costs[nxt]
+                    if total < target[nxt]:
+                        target[nxt] = total
+                        target_back[nxt] = node
+    row = dp[full] or [INF_COST] * (4 * k)
+    best, last = INF_COST, -1
+    for node in range(4 * k):
+        if row[node] + finish_costs[node] < best:
+            best, last = row[node] + finish_costs[node], node
+    if last < 0:
+        return INF_COST, []
+    order, mask = [], full
+    while last >= 0:
+        order.append(last)
+        last, mask = back[mask][last], mask ^ (1 << (last >> 2))
+    order.reverse()
+    return best, order
+
+def _branch_and_bound(start_costs: List[int], pair_costs: List[List[int]], finish_costs: List[int], k: int,
+                      deadline: Optional[float]) -> Tuple[int, List[int], bool]:
+    """
+    Nhánh cận theo chiều sâu trên thứ tự ghé; cận dưới = cạnh rẻ nhất đi vào phần còn lại + MST (chi phí min theo
+    hướng) trên các vật phẩm còn lại và đích. Trả về (chi phí, dãy nút, đã duyệt hết hay chưa).
+    """
+    cell_costs = [[min(pair_costs[i * 4 + b][j * 4 + a] for b in range(4) for a in range(4)) for j in range(k)]
+                  for i in range(k)]
+    to_finish = [min(finish_costs[i * 4:i * 4 + 4]) for i in range(k)]
+    mst_memo: Dict[int, int] = {}
+
+    def mst(mask: int) -> int:
+        cached = mst_memo.get(mask)
+        if cached is None:
+            nodes = [i for i in range(k) if mask >> i & 1]
+            best = {i: to_finish[i] for i in nodes}
+            cached = 0
+            while best:
+                i = min(best, key=best.get)
+                cached += best.pop(i)
+                for j in best:
+                    best[j] = min(best[j], cell_costs[i][j], cell_costs[j][i])
+            mst_memo[mask] = cached = min(cached, INF_COST)
+        return cached
+
+    # Chi phí nhỏ nhất từ mỗi nút (vật phẩm, hướng) tới từng vật phẩm, bất kể hướng tới.
+    node_cell_costs = [[min(costs[i * 4:i * 4 + 4]) for i in range(k)] for costs in pair_costs]
+
+    def lower_bound(mask: int, node: int) -> int:
+        rest = ((1 << k) - 1) ^ mask
+        if not rest:
+            return 0
+        cell_costs_from = node_cell_costs[node]
+        entry = min(cell_costs_from[i] for i in range(k) if rest >> i & 1)
+        return entry + mst(rest)
+
+    # Lời giải ban đầu: láng giềng gần nhất.
+    incumbent, order, mask, costs, total = INF_COST, [], 0, start_costs, 0
+    for _ in range(k):
+        node = min((n for n in range(4 * k) if not mask >> (n >> 2) & 1), key=lambda n: costs[n])
+        total += costs[node]
+        order.append(node)
+        mask |= 1 << (node >> 2)
+        costs = pair_costs[node]
+    if total < INF_COST:
+        incumbent = total + finish_costs[order[-1]]
+    best_order = list(order) if incumbent < INF_COST else []
+    seen: Dict[Tuple[int, int], int] = {}
+    path: List[int] = []
+    complete = True
+
+    def dfs(mask: int, node: int, g: int, costs: List[int]) -> None:
+        nonlocal incumbent, best_order, complete
+        if deadline is not None and time.perf_counter() > deadline:
+            complete = False
+            return
+        if mask == (1 << k) - 1:
+            if g + finish_costs[node] < incumbent:
+                incumbent, best_order = g + finish_costs[node], list(path)
+            return
+        children = sorted((g + costs[n], n) for n in range(4 * k) if not mask >> (n >> 2) & 1)
+        for child_g, child in children:
+            if child_g >= INF_COST:
+                break
+            child_mask = mask | (1 << (child >> 2))
+            if seen.get((child_mask, child), INF_COST) <= child_g:
+                continue
+            seen[(child_mask, child)] = child_g
+            if child_g + lower_bound(child_mask, child) >= incumbent:
+                continue
+            path.append(child)
+            dfs(child_mask, child, child_g, pair_costs[child])
+            path.pop()
+            if not complete:
+                return
+
+    dfs(0, -1, 0, start_costs)
+    return incumbent, best_order, complete
+
+def solve_level_hierarchical(world: GameWorld, exact_limit: int = HELD_KARP_LIMIT,
+                             time_budget_ms: Optional[float] = None, stats: Optional[SearchStats] = None,
+                             start: Optional[GameState] = None) -> HierarchicalResult:
+    """
+    Bộ giải hai tầng, không duyệt không gian (pose x tập vật phẩm đã nhặt):
+    1. Chi phí thật giữa các mốc (xuất phát, 4 hướng tới mỗi vật phẩm, đích) bằng BFS trên đồ thị đã biên dịch.
+    2. Thứ tự ghé: Held-Karp chính xác khi số vật phẩm <= `exact_limit`, nhánh cận (có `time_budget_ms`) khi lớn hơn.
+    3. Nối các đoạn đường đã lưu cùng các hành động 'collect'.
+    Vì mốc phân biệt hướng tới, lời giải tối ưu toàn cục khi `optimal` True (cùng độ dài với A*).
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0 if time_budget_ms is not None else None
+    start_state = start or GameState.initial(world)
+    finish = world.finish_pos
+    finish_cell = world.cell_index(finish['x'], finish['y'], finish['z'])
+    ids = {world.cell_index(c['position']['x'], c['position']['y'], c['position']['z']): c.get('id')
+           for c in world.collectibles.values()}
+    targets = [cell for cell, bit in world.collectible_bits.items() if not start_state.collected & bit]
+    k = len(targets)
+
+    def result(actions: Optional[List[Action]], optimal: bool, order: List[Any], timed_out: bool,
+               legs: int) -> HierarchicalResult:
+        if stats is not None:
+            stats.solution_depth = len(actions) if actions is not None else None
+        return HierarchicalResult(actions, optimal, order, timed_out, legs, (time.perf_counter() - started) * 1000)
+
+    if not check_reachability(world, start_state).feasible:
+        return result(None, True, [], False, 0)
+    legs = _LegTable(world, start_state.pose, targets, finish_cell, stats)
+    node_poses = [(cell << 2) | d for cell in targets for d in range(4)]
+    finish_poses = [(finish_cell << 2) | d for d in range(4)]
+
+    def to_finish(source: int) -> int:
+        return min(legs.cost(source, pose) for pose in finish_poses)
+
+    if k == 0:
+        cost, order, complete = to_finish(start_state.pose), [], True
+    else:
+        start_costs = [legs.cost(start_state.pose, pose) for pose in node_poses]
+        pair_costs = [[legs.cost(source, pose) for pose in node_poses] for source in node_poses]
+        finish_costs = [to_finish(source) for source in node_poses]
+        if k <= exact_limit:
+            cost, order = _held_karp(start_costs, pair_costs, finish_costs, k)
+            complete = True
+        else:
+            cost, order, complete = _branch_and_bound(start_costs, pair_costs, finish_costs, k, deadline)
+    if cost >= INF_COST:
+        return result(None, complete, [], not complete, len(legs.costs))
+
+    actions: List[Action] = []
+    pose = start_state.pose
+    for node in order:
+        actions.extend(legs.path(pose, node_poses[node]))
+        actions.append('collect')
+        pose = node_poses[node]
+    end = min(finish_poses, key=lambda target: legs.cost(pose, target))
+    actions.extend(legs.path(pose, end))
+    return result(actions, complete, [ids.get(targets[node >> 2]) for node in order], not complete, len(legs.costs))
+
 # --- SECTION 5: CODE SYNTHESIS & OPTIMIZATION (Tổng hợp & Tối ưu code) ---
-def find_most_frequent_sequence(actions: List[str], min_len=3, max_len=10) -> Optional[Tuple[List[str], int]]:
-    """Tìm chuỗi con xuất hiện thường xuyên nhất để đề xuất tạo Hàm."""
-    sequence_counts = Counter()
-    actions_tuple = tuple(actions)
-    for length in range(min_len, max_len + 1):
-        for i in range(len(actions_tuple) - length + 1):
-            sequence_counts[actions_tuple[i:i+length]] += 1
-    
-    most_common, max_freq, best_savings = None, 1, 0
-    for seq, freq in sequence_counts.items():
-        if freq > 1:
-            savings = (freq - 1) * len(seq) - (len(seq) + freq)
-            if savings > best_savings:
-                best_savings, most_common, max_freq = savings, seq, freq
-    return (list(most_common), max_freq) if most_common else None
+def _suffix_array(seq: List[int]) -> List[int]:
+    """Mảng hậu tố bằng kỹ thuật nhân đôi tiền tố (O(n log^2 n) với sort của Python)."""
+    n = len(seq)
+    rank = list(seq)
+    sa = list(range(n))
+    k = 1
+    while True:
+        key = lambda i: (rank[i], rank[i + k] if i + k < n else -1)
+        sa.sort(key=key)
+        new_rank = [0] * n
+        for j in range(1, n):
+            new_rank[sa[j]] = new_rank[sa[j - 1]] + (key(sa[j]) != key(sa[j - 1]))
+        rank = new_rank
+        if n == 0 or rank[sa[-1]] == n - 1:
+            return sa
+        k <<= 1
+
+def _lcp_array(seq: List[int], sa: List[int]) -> List[int]:
+    """Thuật toán Kasai: lcp[i] là độ dài tiền tố chung dài nhất của hậu tố sa[i-1] và sa[i] (lcp[0] = 0)."""
+    n = len(seq)
+    rank = [0] * n
+    for i, suffix in enumerate(sa):
+        rank[suffix] = i
+    lcp, h = [0] * n, 0
+    for i in range(n):
+        if rank[i] > 0:
+            j = sa[rank[i] - 1]
+            while i + h < n and j + h < n and seq[i + h] == seq[j + h]:
+                h += 1
+            lcp[rank[i]] = h
+            if h:
+                h -= 1
+        else:
+            h = 0
+    return lcp
+
+def _count_non_overlapping(positions: List[int], length: int) -> int:
+    """Số lần xuất hiện không chồng lấn (tham lam từ trái sang, giống cách thay thế trong `synthesize_program`)."""
+    count, next_free = 0, -1
+    for pos in positions:
+        if pos >= next_free:
+            count += 1
+            next_free = pos + length
+    return count
+
+def _procedure_savings(freq: int, length: int) -> int:
+    return (freq - 1) * length - (length + freq)
+
+def find_most_frequent_sequence(actions: List[str], min_len=3, max_len=None) -> Optional[Tuple[List[str], int]]:
+    """
+    Tìm chuỗi con lặp lại mà các lần xuất hiện không chồng lấn của nó tiết kiệm nhiều khối lệnh nhất khi tạo Hàm.
+    Dùng mảng hậu tố + LCP trên hành động đã mã hóa thành số nguyên: mỗi khoảng LCP là một tập vị trí xuất hiện
+    chung cho mọi độ dài trong (lcp cha, lcp]; các khoảng được duyệt theo cận trên giảm dần nên phần lớn bị cắt sớm.
+    Không giới hạn độ dài khi `max_len` là None.
+    """
+    codes: Dict[str, int] = {}
+    seq = [codes.setdefault(action, len(codes)) for action in actions]
+    n = len(seq)
+    if n < 2 * min_len:
+        return None
+    max_len = n // 2 if max_len is None else min(max_len, n // 2)
+    sa = _suffix_array(seq)
+    lcp = _lcp_array(seq, sa)
+
+    # Liệt kê các khoảng LCP (lb, rb, lcp của khoảng, lcp của khoảng cha) bằng một ngăn xếp.
+    intervals: List[Tuple[int, int, int, int]] = []
+    stack: List[List[int]] = [[0, 0]]  # [lcp, lb]
+    for i in range(1, n + 1):
+        current = lcp[i] if i < n else 0
+        lb = i - 1
+        while current < stack[-1][0]:
+            ell, lb = stack.pop()
+            parent = max(current, stack[-1][0])
+            intervals.append((lb, i - 1, ell, parent))
+        if current > stack[-1][0]:
+            stack.append([current, lb])
+
+    def upper_bound(interval: Tuple[int, int, int, int]) -> int:
+        lb, rb, ell, _ = interval
+        length = min(ell, max_len)
+        freq = min(rb - lb + 1, n // max(1, length))
+        return _procedure_savings(freq, length)
+
+    candidates = [iv for iv in intervals if min(iv[2], max_len) >= max(iv[3] + 1, min_len)]
+    candidates.sort(key=upper_bound, reverse=True)
+    best: Optional[Tuple[int, int, int, int]] = None  # (savings, vị trí đầu, độ dài, số lần xuất hiện)
+    for interval in candidates:
+        if best is not None and upper_bound(interval) <= best[0]:
+            break
+        lb, rb, ell, parent = interval
+        low, high = max(parent + 1, min_len), min(ell, max_len)
+        positions = sorted(sa[lb:rb + 1])
+        gaps = {b - a for a, b in zip(positions, positions[1:])}
+        # Số lần xuất hiện không chồng lấn chỉ thay đổi tại các khoảng cách giữa hai vị trí liên tiếp.
+        for length in sorted({high} | {g for g in gaps if low <= g <= high}):
+            freq = _count_non_overlapping(positions, length)
+            savings = _procedure_savings(freq, length)
+            if freq > 1 and savings > 0 and (best is None or savings > best[0]):
+                best = (savings, positions[0], length, freq)
+    if best is None:
+        return None
+    _, start, length, freq = best
+    return list(actions[start:start + length]), freq
 
 def compress_actions_to_structure(actions: List[str]) -> List[Dict]:
     """Hàm đệ quy nén chuỗi hành động thành cấu trúc có vòng lặp."""
@@ -225,22 +1673,137 @@ def compress_actions_to_structure(actions: List[str]) -> List[Dict]:
             })
             i += best_repeats * best_seq_len
         else:
-            action_str = actions[i]
-            if action_str.startswith("CALL:"):
-                structured_code.append({"type": "CALL", "name": action_str.split(":", 1)[1]})
-            else:
-                structured_code.append({"type": action_str})
+            structured_code.append(_action_block(actions[i]))
             i += 1
     return structured_code
 
-def synthesize_program(actions: List[Action]) -> Dict:
-    """Quy trình tổng hợp code chính, tạo hàm và vòng lặp."""
+COMPRESSION_MODES: Tuple[str, ...] = ('greedy', 'optimal')
+_HASH_MOD = (1 << 61) - 1
+_HASH_BASE = 1_000_003
+
+class _LoopCompressor:
+    """
+    Nén tối ưu (theo `count_blocks`) bằng quy hoạch động trên các đoạn, làm việc với ID hành động đã intern.
+    Kiểm tra lặp dùng băm lăn (O(1)); kết quả của mỗi thân vòng lặp được ghi nhớ theo nội dung (băm + độ dài),
+    nên cùng một thân xuất hiện ở nhiều nơi chỉ được tính một lần.
+    """
+    def __init__(self, actions: List[str]):
+        self.names: List[str] = []
+        ids: Dict[str, int] = {}
+        self.seq: List[int] = []
+        for action in actions:
+            if action not in ids:
+                ids[action] = len(self.names)
+                self.names.append(action)
+            self.seq.append(ids[action])
+        n = len(self.seq)
+        self.prefix = [0] * (n + 1)
+        self.powers = [1] * (n + 1)
+        for i, code in enumerate(self.seq):
+            self.prefix[i + 1] = (self.prefix[i] * _HASH_BASE + code + 1) % _HASH_MOD
+            self.powers[i + 1] = (self.powers[i] * _HASH_BASE) % _HASH_MOD
+        self.memo: Dict[Tuple[int, int, Optional[int]], Tuple[int, List[Dict]]] = {}
+
+    def _hash(self, i: int, j: int) -> int:
+        return (self.prefix[j] - self.prefix[i] * self.powers[j - i]) % _HASH_MOD
+
+    def encode(self, i: int, j: int, depth: Optional[int] = None) -> Tuple[int, List[Dict]]:
+        """
+        Trả về (số khối nhỏ nhất, danh sách khối) cho đoạn seq[i:j].
+        `depth` giới hạn số tầng `maze_repeat` lồng nhau (None: không giới hạn, 0: không dùng vòng lặp).
+        """
+        memo_key = (self._hash(i, j), j - i, depth)
+        cached = self.memo.get(memo_key)
+        if cached is not None:
+            return cached
+        length = j - i
+        body_depth = None if depth is None else depth - 1
+        seq, prefix, powers = self.seq, self.prefix, self.powers
+        # cost[x]: số khối ít nhất cho seq[i:i+x]; choice[x] = (k, p) nếu khối cuối là vòng lặp thân dài p bắt đầu từ k.
+        cost = [0] * (length + 1)
+        choice: List[Optional[Tuple[int, int]]] = [None] * (length + 1)
+        # runs[(p, x)] = (cost[k] nhỏ nhất, k) trên các k sao cho seq[i+k:i+x] gồm >= 2 lần lặp của thân dài p.
+        runs: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for x in range(1, length + 1):
+            cost[x], choice[x] = cost[x - 1] + 1, None
+            end = i + x
+            last = seq[end - 1]
+            # Chu kỳ của các bình phương nguyên thủy uu kết thúc tại x, theo thứ tự tăng dần.
+            primitive_periods: List[int] = []
+            for p in range(1, x // 2 + 1 if depth != 0 else 1):
+                if seq[end - 1 - p] != last:
+                    continue
+                mid, start = end - p, end - 2 * p
+                if (prefix[mid] - prefix[start] * powers[p]) % _HASH_MOD != \
+                        (prefix[end] - prefix[mid] * powers[p]) % _HASH_MOD:
+                    continue
+                if any(p % q == 0 and self._hash(mid, end - q) == self._hash(mid + q, end) for q in primitive_periods):
+                    # Thân dạng u^m: cùng đoạn đó đã được xét như vòng lặp của u (ít khối hơn), bỏ qua.
+                    continue
+                primitive_periods.append(p)
+                best = (cost[x - 2 * p], x - 2 * p)
+                previous = runs.get((p, x - p))
+                if previous is not None and previous[0] < best[0]:
+                    best = previous
+                runs[(p, x)] = best
+                candidate = best[0] + 1 + self.encode(mid, end, body_depth)[0]
+                if candidate < cost[x]:
+                    cost[x], choice[x] = candidate, (best[1], p)
+
+        blocks: List[Dict] = []
+        x = length
+        while x > 0:
+            if choice[x] is None:
+                blocks.append(_action_block(self.names[seq[i + x - 1]]))
+                x -= 1
+            else:
+                k, p = choice[x]
+                blocks.append({"type": "maze_repeat", "times": (x - k) // p,
+                               "body": self.encode(i + x - p, i + x, body_depth)[1]})
+                x = k
+        blocks.reverse()
+        result = (cost[length], blocks)
+        self.memo[memo_key] = result
+        return result
+
+def _action_block(action_str: str) -> Dict:
+    if action_str.startswith("CALL:"):
+        return {"type": "CALL", "name": action_str.split(":", 1)[1]}
+    return {"type": action_str}
+
+def compress_actions_optimal(actions: List[str], max_depth: Optional[int] = None) -> List[Dict]:
+    """
+    Chế độ nén 'optimal': cấu trúc vòng lặp (kể cả lồng nhau, tối đa `max_depth` tầng) có ít khối lệnh nhất, nên
+    không bao giờ kém `compress_actions_to_structure`. O(n^2) phép so sánh O(1) thay cho so sánh lát cắt danh sách.
+    """
+    if not actions:
+        return []
+    return _LoopCompressor(actions).encode(0, len(actions), max_depth)[1]
+
+def synthesize_program(actions: List[Action], stats: Optional[SearchStats] = None,
+                       compression: str = 'greedy') -> Dict:
+    """
+    Quy trình tổng hợp code chính, tạo hàm và vòng lặp.
+    `compression`: 'greedy' (mặc định, như trước) hoặc 'optimal' (quy hoạch động, ít khối nhất).
+    """
+    if compression not in COMPRESSION_MODES:
+        raise ValueError(f"compression không hợp lệ: {compression!r} (chọn một trong {COMPRESSION_MODES})")
+    if stats is not None:
+        with stats.phase('synthesize'):
+            return _synthesize_program(actions, compression, stats)
+    return _synthesize_program(actions, compression, None)
+
+def _synthesize_program(actions: List[Action], compression: str, stats: Optional[SearchStats]) -> Dict:
+    """Thân của `synthesize_program`; gọi `stats.checkpoint()` trước mỗi lượt tìm Hàm và trước khi nén vòng lặp."""
+    compress = compress_actions_optimal if compression == 'optimal' else compress_actions_to_structure
     procedures, remaining_actions = {}, list(actions)
     for i in range(3):
+        if stats is not None:
+            stats.checkpoint()
         result = find_most_frequent_sequence(remaining_actions)
         if result:
             sequence, proc_name = result[0], f"PROCEDURE_{i+1}"
-            procedures[proc_name] = compress_actions_to_structure(sequence)
+            procedures[proc_name] = compress(sequence)
             new_actions, j, seq_tuple = [], 0, tuple(sequence)
             while j < len(remaining_actions):
                 if tuple(remaining_actions[j:j+len(sequence)]) == seq_tuple:
@@ -251,15 +1814,371 @@ def synthesize_program(actions: List[Action]) -> Dict:
                     j += 1
             remaining_actions = new_actions
         else: break
-    return {"main": compress_actions_to_structure(remaining_actions), "procedures": procedures}
+    if stats is not None:
+        stats.checkpoint()
+    return {"main": compress(remaining_actions), "procedures": procedures}
+
+# --- Tổng hợp bằng tìm kiếm: chọn tập Hàm và cấu trúc vòng lặp cùng lúc, mục tiêu là count_blocks ---
+class SynthesisResult:
+    """
+    Kết quả của `synthesize_program_search`. `optimal` là True khi đã duyệt hết không gian tìm kiếm (không hết giờ,
+    không bị cắt bởi `beam_width`): Hàm là các đoạn con liên tiếp của chuỗi hành động (có thể gọi Hàm trước đó),
+    thay ở mọi lần xuất hiện không chồng lấn từ trái sang, vòng lặp được nén tối ưu.
+    `solve_level_blocks` cũng trả về kiểu này, với nghĩa của `optimal` mô tả trong docstring của nó.
+    """
+    def __init__(self, program: Dict, blocks: int, optimal: bool, timed_out: bool, states_explored: int):
+        self.program, self.blocks = program, blocks
+        self.optimal, self.timed_out, self.states_explored = optimal, timed_out, states_explored
+
+class _ProgramSearch:
+    """Nhánh-và-cận theo chiều sâu trên tập Hàm; chi phí nén vòng lặp được ghi nhớ theo nội dung chuỗi."""
+    def __init__(self, max_procedures: int, max_depth: Optional[int], beam_width: Optional[int],
+                 deadline: Optional[float], best_blocks: int, stats: Optional[SearchStats] = None):
+        self.max_procedures, self.max_depth, self.beam_width = max_procedures, max_depth, beam_width
+        self.deadline = deadline
+        self.stats = stats
+        self.best_blocks = best_blocks
+        self.best: Optional[Tuple[Tuple[Action, ...], Tuple[Tuple[str, Tuple[Action, ...]], ...]]] = None
+        self.complete = True
+        self.timed_out = False
+        self.states_explored = 0
+        self._loop_cost: Dict[Tuple[Action, ...], int] = {}
+        self._visited: Set[Tuple[Tuple[Action, ...], Tuple[Tuple[str, Tuple[Action, ...]], ...]]] = set()
+
+    def loop_cost(self, tokens: Tuple[Action, ...]) -> int:
+        cost = self._loop_cost.get(tokens)
+        if cost is None:
+            cost = _LoopCompressor(list(tokens)).encode(0, len(tokens), self.max_depth)[0] if tokens else 0
+            self._loop_cost[tokens] = cost
+        return cost
+
+    @staticmethod
+    def candidates(main: Tuple[Action, ...]) -> List[Tuple[int, Tuple[Action, ...]]]:
+        """Các đoạn con dài >= 2 có >= 2 lần xuất hiện không chồng lấn, xếp theo số khối tiết kiệm khi chưa nén vòng lặp."""
+        n = len(main)
+        result = []
+        for length in range(2, n // 2 + 1):
+            positions: Dict[Tuple[Action, ...], List[int]] = {}
+            for i in range(n - length + 1):
+                positions.setdefault(main[i:i + length], []).append(i)
+            for sequence, found in positions.items():
+                freq = _count_non_overlapping(found, length)
+                if freq > 1:
+                    result.append((_procedure_savings(freq, length), sequence))
+        result.sort(key=lambda item: (-item[0], len(item[1]), item[1]))
+        return result
+
+    @staticmethod
+    def extract(main: Tuple[Action, ...], sequence: Tuple[Action, ...], name: str) -> Tuple[Action, ...]:
+        out, j, length = [], 0, len(sequence)
+        while j < len(main):
+            if main[j:j + length] == sequence:
+                out.append(f"CALL:{name}")
+                j += length
+            else:
+                out.append(main[j])
+                j += 1
+        return tuple(out)
+
+    def run(self, main: Tuple[Action, ...], procedures: Tuple[Tuple[str, Tuple[Action, ...]], ...], fixed: int) -> None:
+        """`fixed`: số khối của các Hàm đã định nghĩa (không đổi ở các nút con)."""
+        state_key = (main, procedures)
+        if state_key in self._visited:
+            return
+        self._visited.add(state_key)
+        self.states_explored += 1
+        if self.stats is not None and self.states_explored % self.stats.progress_interval == 0:
+            self.stats.checkpoint()
+        blocks = 1 + fixed + self.loop_cost(main)
+        if blocks < self.best_blocks or self.best is None and blocks == self.best_blocks:
+            self.best_blocks, self.best = blocks, (main, procedures)
+        if len(procedures) >= self.max_procedures:
+            return
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.timed_out = True
+            return
+        # Cận dưới cho mọi nút con: mỗi loại token của main vẫn phải xuất hiện ít nhất một lần, cộng thêm
+        # khối định nghĩa Hàm mới và lời gọi nó.
+        if 1 + fixed + len(set(main)) + 2 >= self.best_blocks:
+            return
+        options = self.candidates(main)
+        if self.beam_width is not None and len(options) > self.beam_width:
+            options = options[:self.beam_width]
+            self.complete = False
+        name = f"PROCEDURE_{len(procedures) + 1}"
+        for _, sequence in options:
+            child_fixed = fixed + 1 + self.loop_cost(sequence)
+            child_main = self.extract(main, sequence, name)
+            if 1 + child_fixed + len(set(child_main)) >= self.best_blocks:
+                continue
+            self.run(child_main, procedures + ((name, sequence),), child_fixed)
+            if self.timed_out:
+                return
+
+def _search_subtree(task: Tuple) -> Tuple[int, Optional[Tuple], bool, bool, int]:
+    """Chạy trong tiến trình worker: tìm kiếm trên cây con bắt đầu từ một lựa chọn Hàm đầu tiên."""
+    main, procedures, fixed, max_procedures, max_depth, beam_width, wall_deadline, best_blocks = task
+    # Hạn chót truyền bằng đồng hồ tường vì perf_counter của các tiến trình không nhất thiết so sánh được.
+    deadline = time.perf_counter() + (wall_deadline - time.time()) if wall_deadline is not None else None
+    search = _ProgramSearch(max_procedures, max_depth, beam_width, deadline, best_blocks)
+    search.run(main, procedures, fixed)
+    return search.best_blocks, search.best, search.complete, search.timed_out, search.states_explored
+
+def synthesize_program_search(actions: List[Action], max_procedures: int = 3, max_depth: Optional[int] = None,
+                              time_budget_ms: Optional[float] = 1000, beam_width: Optional[int] = None,
+                              workers: int = 1, stats: Optional[SearchStats] = None) -> SynthesisResult:
+    """
+    Tổng hợp chương trình ít khối lệnh nhất bằng nhánh-và-cận trên tập Hàm (tối đa `max_procedures`), mỗi
+    trạng thái được chấm bằng bộ nén vòng lặp tối ưu (tối đa `max_depth` tầng lồng). Lời giải của
+    `synthesize_program` làm cận ban đầu nên kết quả không bao giờ kém hơn. `beam_width` giới hạn số ứng viên
+    ở mỗi nút; `workers` > 1 chia các cây con ở gốc cho một pool tiến trình.
+    `stats` nhận thời gian giai đoạn 'synthesize'/'count' và số trạng thái đã duyệt (`synthesis_states`);
+    `progress_callback` được gọi mỗi `progress_interval` trạng thái và có thể ném ngoại lệ để hủy.
+    """
+    if stats is not None:
+        with stats.phase('synthesize'):
+            return _synthesize_program_search(actions, max_procedures, max_depth, time_budget_ms, beam_width,
+                                              workers, stats)
+    return _synthesize_program_search(actions, max_procedures, max_depth, time_budget_ms, beam_width, workers, None)
+
+def _synthesize_program_search(actions: List[Action], max_procedures: int, max_depth: Optional[int],
+                               time_budget_ms: Optional[float], beam_width: Optional[int], workers: int,
+                               stats: Optional[SearchStats]) -> SynthesisResult:
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0 if time_budget_ms is not None else None
+    incumbent = _synthesize_program(actions, 'optimal', stats)
+    incumbent_blocks = count_blocks(incumbent, stats)
+    if max_depth is not None:
+        incumbent_blocks = INF_COST  # Bản greedy không tôn trọng giới hạn lồng nhau.
+    search = _ProgramSearch(max_procedures, max_depth, beam_width, deadline, incumbent_blocks, stats)
+    root = tuple(actions)
+    root_options = search.candidates(root) if max_procedures > 0 else []
+
+    if workers > 1 and len(root_options) > 1:
+        import multiprocessing
+        # Chỉ chấm gốc ở tiến trình chính; mỗi lựa chọn Hàm đầu tiên là một cây con độc lập.
+        search.max_procedures = 0
+        search.run(root, (), 0)
+        search.max_procedures = max_procedures
+        if beam_width is not None and len(root_options) > beam_width:
+            root_options = root_options[:beam_width]
+            search.complete = False
+        wall_deadline = None if deadline is None else time.time() + (deadline - time.perf_counter())
+        tasks = [(search.extract(root, sequence, "PROCEDURE_1"), (("PROCEDURE_1", sequence),),
+                  1 + search.loop_cost(sequence), max_procedures, max_depth, beam_width, wall_deadline,
+                  search.best_blocks)
+                 for _, sequence in root_options]
+        with multiprocessing.Pool(processes=workers) as pool:
+            for blocks, best, complete, timed_out, explored in pool.imap_unordered(_search_subtree, tasks):
+                if stats is not None:
+                    stats.checkpoint()
+                search.states_explored += explored
+                search.complete = search.complete and complete
+                search.timed_out = search.timed_out or timed_out
+                if best is not None and blocks < search.best_blocks:
+                    search.best_blocks, search.best = blocks, best
+    else:
+        search.run(root, (), 0)
+
+    if stats is not None:
+        stats.synthesis_states += search.states_explored
+    if search.best is None:
+        program, blocks = incumbent, count_blocks(incumbent, stats)
+    else:
+        main, procedures = search.best
+        program = {"main": compress_actions_optimal(list(main), max_depth),
+                   "procedures": {name: compress_actions_optimal(list(body), max_depth) for name, body in procedures}}
+        blocks = count_blocks(program, stats)
+    optimal = search.complete and not search.timed_out
+    return SynthesisResult(program, blocks, optimal, search.timed_out, search.states_explored)
+
+# --- Giải theo số khối lệnh: tìm kiếm trực tiếp trên không gian chương trình ---
+# Số lần lặp tối đa của một khối `maze_repeat` mà bộ giải theo số khối thử.
+MAX_REPEAT_TIMES = 12
+
+class _BlockSearch:
+    """
+    Tìm kiếm chi phí đều (Dijkstra) trên trạng thái game, mỗi cạnh là một khối lệnh của `main`: hành động đơn,
+    lời gọi Hàm, hoặc `maze_repeat` với thân ngắn. Mỗi cạnh chỉ mô phỏng khối mới từ trạng thái hiện tại (không
+    chạy lại tiền tố); bảng trạng thái kế tiếp và kết quả của từng vòng lặp được ghi nhớ và dùng chung giữa các
+    bộ Hàm. Token là tên hành động, hoặc tuple các hành động của một Hàm (lời gọi Hàm).
+    """
+    def __init__(self, world: GameWorld, max_body: int, deadline: Optional[float], stats: Optional[SearchStats]):
+        self.world, self.max_body, self.deadline, self.stats = world, max_body, deadline, stats
+        self._successors: Dict[Tuple[int, int, int], Dict[Action, Tuple[int, int, int]]] = {}
+        self._repeats: Dict[Tuple[Tuple[int, int, int], Tuple], List[Tuple[int, int, int]]] = {}
+        self.timed_out = False
+        self.states_explored = 0
+
+    def step(self, key: Tuple[int, int, int], token) -> Optional[Tuple[int, int, int]]:
+        """Thực thi một token từ trạng thái `key`; None nếu gặp hành động không hợp lệ."""
+        if isinstance(token, tuple):
+            for action in token:
+                key = self.step(key, action)
+                if key is None:
+                    return None
+            return key
+        successors = self._successors.get(key)
+        if successors is None:
+            successors = {a: s.get_key() for a, s in get_successors(self.world, GameState(*key))}
+            self._successors[key] = successors
+        return successors.get(token)
+
+    def repeat(self, key: Tuple[int, int, int], body: Tuple) -> List[Tuple[int, int, int]]:
+        """Trạng thái sau 1, 2, ... lần thực thi `body` (dừng ở lần đầu thất bại hoặc MAX_REPEAT_TIMES)."""
+        memo_key = (key, body)
+        states = self._repeats.get(memo_key)
+        if states is None:
+            states = []
+            # Lần thứ t+1 chỉ mô phỏng thêm một thân từ kết quả của lần thứ t.
+            while len(states) < MAX_REPEAT_TIMES:
+                for token in body:
+                    key = self.step(key, token)
+                    if key is None:
+                        break
+                if key is None:
+                    break
+                states.append(key)
+            self._repeats[memo_key] = states
+        return states
+
+    def bodies(self, tokens: List) -> List[Tuple]:
+        """
+        Các thân vòng lặp dài tối đa `max_body`: nguyên thủy, không có hai lệnh quay ngược nhau liền kề, và không
+        chỉ gồm lệnh quay (vòng lặp chỉ quay không bao giờ ít khối hơn viết thẳng).
+        """
+        result: List[Tuple] = []
+        frontier: List[Tuple] = [()]
+        for _ in range(self.max_body):
+            frontier = [body + (token,) for body in frontier for token in tokens
+                        if not body or {body[-1], token} != {'turnLeft', 'turnRight'}]
+            result.extend(body for body in frontier
+                          if any(t not in ('turnLeft', 'turnRight') for t in body)
+                          and _LoopCompressor([str(t) for t in body]).encode(0, len(body))[0] == len(body))
+        return result
+
+    def run(self, procedures: Dict[str, Tuple[Action, ...]], budget: int) -> Optional[Tuple[int, List[Dict]]]:
+        """Chương trình `main` ít khối nhất với bộ Hàm cho trước, chỉ khi số khối < `budget`."""
+        world = self.world
+        tokens: List = [a for a in SEARCH_ACTIONS if a != 'toggleSwitch' or world.switch_bits]
+        tokens += list(procedures.values())
+        names = {body: f"CALL:{name}" for name, body in procedures.items()}
+        bodies = self.bodies(tokens)
+        finish_cell = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+        start = GameState.initial(world).get_key()
+        best_g: Dict[Tuple[int, int, int], int] = {start: 0}
+        # parent[key] = (key trước, (số lần lặp, thân)); thân một token với 1 lần lặp là một khối đơn.
+        parent: Dict[Tuple[int, int, int], Tuple[Optional[Tuple[int, int, int]], Tuple[int, Tuple]]] = {}
+        counter = itertools.count()
+        open_list: List[Tuple[int, int, Tuple[int, int, int]]] = [(0, next(counter), start)]
+        while open_list:
+            g, _, key = heapq.heappop(open_list)
+            if g > best_g[key]:
+                continue
+            self.states_explored += 1
+            if self.stats is not None:
+                self.stats.record_expansion(len(open_list), len(best_g))
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                self.timed_out = True
+                return None
+            if key[0] >> 2 == finish_cell and key[1] == world.all_collected_mask:
+                return g, self._blocks(parent, key, names)
+            # Cận dưới: trạng thái chưa phải đích cần thêm ít nhất một khối nữa.
+            if g + 1 >= budget:
+                continue
+            generated = len(best_g)
+            for token in tokens:
+                next_key = self.step(key, token)
+                if next_key is not None and g + 1 < best_g.get(next_key, INF_COST):
+                    best_g[next_key] = g + 1
+                    parent[next_key] = (key, (1, (token,)))
+                    heapq.heappush(open_list, (g + 1, next(counter), next_key))
+            for body in bodies:
+                cost = g + 1 + len(body)
+                if cost >= budget:
+                    continue
+                for times, next_key in enumerate(self.repeat(key, body)[1:], start=2):
+                    if cost < best_g.get(next_key, INF_COST):
+                        best_g[next_key] = cost
+                        parent[next_key] = (key, (times, body))
+                        heapq.heappush(open_list, (cost, next(counter), next_key))
+            if self.stats is not None:
+                self.stats.nodes_generated += len(best_g) - generated
+        return None
+
+    @staticmethod
+    def _blocks(parent: Dict, key: Tuple[int, int, int], names: Dict[Tuple, str]) -> List[Dict]:
+        def token_block(token) -> Dict:
+            return _action_block(names[token] if isinstance(token, tuple) else token)
+        blocks: List[Dict] = []
+        while key in parent:
+            key, (times, body) = parent[key]
+            if times == 1:
+                blocks.append(token_block(body[0]))
+            else:
+                blocks.append({"type": "maze_repeat", "times": times, "body": [token_block(t) for t in body]})
+        blocks.reverse()
+        return blocks
+
+def solve_level_blocks(world: GameWorld, max_procedures: int = 2, max_body: int = 3,
+                       procedure_candidates: int = 6, time_budget_ms: Optional[float] = 2000,
+                       stats: Optional[SearchStats] = None, actions: Optional[List[Action]] = None) -> SynthesisResult:
+    """
+    Chế độ giải thứ hai: tìm chương trình ít khối lệnh nhất thay vì đường đi ngắn nhất. Với mỗi bộ Hàm (tối đa
+    `max_procedures`, chọn từ `procedure_candidates` đoạn lặp của đường đi ngắn nhất), Dijkstra trên trạng thái
+    game tìm `main` ít khối nhất; cận dưới theo số khối cắt mọi nhánh không thể tốt hơn kết quả hiện có.
+    Kết quả ban đầu là `synthesize_program(solve_level(...))`, nên chỉ trả về chương trình khác khi nó ít khối hơn;
+    `actions` là đường đi đã có sẵn (bỏ qua bước `solve_level`).
+    `optimal` chỉ True khi đã duyệt hết mọi bộ Hàm ứng viên (không bị cắt bởi `procedure_candidates` hay hết giờ),
+    và là tối ưu trong không gian tìm kiếm: Hàm là đoạn lặp của đường đi ngắn nhất, thân vòng lặp dài <= `max_body`.
+    Trả về SynthesisResult với `program` None nếu level không có lời giải.
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0 if time_budget_ms is not None else None
+    if actions is None:
+        actions = solve_level(world, stats=stats)
+    if actions is None:
+        return SynthesisResult(None, 0, True, False, 0)
+    best_program = synthesize_program(actions, stats, 'optimal')
+    best_blocks = count_blocks(best_program, stats)
+
+    search = _BlockSearch(world, max_body, deadline, stats)
+    all_candidates = _ProgramSearch.candidates(tuple(actions))
+    candidates = [body for _, body in all_candidates[:procedure_candidates]]
+    procedure_sets = itertools.chain.from_iterable(
+        itertools.combinations(candidates, size) for size in range(max_procedures + 1))
+    for bodies in procedure_sets:
+        procedures = {f"PROCEDURE_{i + 1}": body for i, body in enumerate(bodies)}
+        fixed = 1 + sum(1 + _LoopCompressor(list(body)).encode(0, len(body))[0] for body in bodies)
+        if fixed + 1 >= best_blocks:
+            continue
+        found = search.run(procedures, best_blocks - fixed)
+        if search.timed_out:
+            break
+        if found is None:
+            continue
+        # Nén lại toàn bộ main bằng bộ nén tối ưu: không bao giờ nhiều khối hơn cấu trúc mà tìm kiếm đã dựng.
+        main_tokens = [f"CALL:{b['name']}" if b['type'] == 'CALL' else b['type']
+                       for block in found[1]
+                       for b in (block['body'] * block['times'] if block['type'] == 'maze_repeat' else [block])]
+        program = {"main": compress_actions_optimal(main_tokens),
+                   "procedures": {name: compress_actions_optimal(list(body)) for name, body in procedures.items()}}
+        blocks = count_blocks(program, stats)
+        if blocks < best_blocks:
+            best_program, best_blocks = program, blocks
+    exhaustive = len(all_candidates) <= procedure_candidates and not search.timed_out
+    return SynthesisResult(best_program, best_blocks, exhaustive, search.timed_out, search.states_explored)
 
 # --- SECTION 6: REPORTING & UTILITIES (Báo cáo & Tiện ích) ---
 
-def count_blocks(program: Dict) -> int:
+def count_blocks(program: Dict, stats: Optional[SearchStats] = None) -> int:
     """
     [CHỨC NĂNG MỚI] Đệ quy đếm tổng số khối lệnh trong chương trình đã tối ưu.
     Mỗi lệnh, vòng lặp, định nghĩa hàm, lời gọi hàm đều được tính là 1 khối.
     """
+    if stats is not None:
+        with stats.phase('count'):
+            return count_blocks(program)
     def _count_list_recursively(block_list: List[Dict]) -> int:
         count = 0
         for block in block_list:
@@ -307,15 +2226,58 @@ def format_program(program: Dict, indent=0) -> str:
             output += f"{prefix}{block_type}\n"
     return output
 
+def expand_program(program: Dict) -> List[Action]:
+    """Trải phẳng chương trình (main + procedures, vòng lặp, lời gọi Hàm) thành chuỗi hành động."""
+    procedures = program.get("procedures", {})
+    def _expand(block_list: List[Dict], depth: int) -> List[Action]:
+        if depth > len(procedures) + 1:
+            raise ValueError("Hàm gọi đệ quy")
+        actions: List[Action] = []
+        for block in block_list:
+            block_type = block.get("type")
+            if block_type == "maze_repeat":
+                actions.extend(_expand(block.get("body", []), depth) * int(block.get("times", 0)))
+            elif block_type == "CALL":
+                actions.extend(_expand(procedures[block["name"]], depth + 1))
+            else:
+                actions.append(block_type)
+        return actions
+    return _expand(program.get("main", []), 0)
+
 # --- SECTION 7: MAIN EXECUTION BLOCK (Phần thực thi chính) ---
 if __name__ == "__main__":
-    # [ĐÃ SỬA LỖI] Khối này giờ đây đọc tên file từ tham số dòng lệnh
-    if len(sys.argv) < 2:
-        print("LỖI: Bạn chưa cung cấp tên file JSON.")
-        print("Cách dùng: python gameSolver.py <ten_file_json>")
-        sys.exit(1)
+    import argparse
 
-    json_filename = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Giải level Maze bằng A* và tổng hợp thành chương trình có cấu trúc.")
+    parser.add_argument("json_filename", help="File JSON của level")
+    parser.add_argument("--heuristic", choices=HEURISTIC_MODES, default="admissible",
+                        help="'admissible' đảm bảo tối ưu, 'greedy' nhanh hơn nhưng không đảm bảo tối ưu")
+    parser.add_argument("--engine", choices=SEARCH_ENGINES, default="astar",
+                        help="'astar' (mặc định) hoặc 'ida' (IDA* giới hạn bộ nhớ)")
+    parser.add_argument("--max-nodes", type=int, default=None, help="Số trạng thái tối đa trong bảng chuyển vị (engine 'ida')")
+    parser.add_argument("--memory-mb", type=float, default=None, help="Giới hạn bộ nhớ của bảng chuyển vị tính bằng MB (engine 'ida')")
+    parser.add_argument("--time-budget-ms", type=float, default=None,
+                        help="Chạy ARA* anytime và trả về lời giải tốt nhất trong khoảng thời gian này")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="Tắt cắt tỉa không gian trạng thái (luật quay/công tắc) để so sánh số nút")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số tiến trình cho A* song song phân tán theo băm (HDA*, engine 'astar')")
+    parser.add_argument("--compression", choices=COMPRESSION_MODES, default="greedy",
+                        help="'greedy' (mặc định) hoặc 'optimal' (quy hoạch động, ít khối lệnh nhất)")
+    parser.add_argument("--synthesis-search-ms", type=float, default=None, metavar="MS",
+                        help="Tìm kiếm đồng thời tập Hàm và vòng lặp để có ít khối lệnh nhất trong MS mili giây")
+    parser.add_argument("--blocks-budget-ms", type=float, default=None, metavar="MS",
+                        help="Tìm trực tiếp chương trình ít khối lệnh nhất (có thể dài hơn đường đi ngắn nhất) trong MS mili giây")
+    parser.add_argument("--profile", nargs="?", const="-", default=None, metavar="FILE",
+                        help="Ghi báo cáo đo đạc (số nút, thời gian heuristic, thời gian từng giai đoạn...) dạng JSON "
+                             "vào FILE; không có FILE thì stdout chỉ chứa JSON, các thông báo khác chuyển sang stderr")
+    parser.add_argument("--progress", type=int, default=0, metavar="N",
+                        help="In tiến độ ra stderr sau mỗi N lần mở rộng nút")
+    args = parser.parse_args()
+    json_filename = args.json_filename
+    profile_stdout = sys.stdout
+    if args.profile == "-":
+        sys.stdout = sys.stderr
 
     try:
         print(f"Đang tải file '{json_filename}'...")
@@ -323,16 +2285,50 @@ if __name__ == "__main__":
             level_data = json.load(f)
         
         print("Đã tải xong. Bắt đầu Giai đoạn 1: Tìm đường đi tối ưu bằng A*...")
-        optimal_actions = solve_level(GameWorld(level_data))
+        search_stats = SearchStats(
+            progress_callback=(lambda st: print(f"  ... đã mở rộng {st.nodes_expanded} nút, "
+                                                f"open lớn nhất {st.peak_open_size}", file=sys.stderr))
+            if args.progress > 0 else None,
+            progress_interval=args.progress or 1000)
+        max_bytes = int(args.memory_mb * 1024 * 1024) if args.memory_mb is not None else None
+        world = GameWorld(level_data)
+        if args.time_budget_ms is not None:
+            anytime_result = solve_level_anytime(
+                world, args.time_budget_ms, stats=search_stats,
+                on_solution=lambda s: print(f"  -> {s.length} hành động, cận tối ưu <= {s.bound:.3f} (sau {s.elapsed_ms:.1f} ms)"))
+            optimal_actions = anytime_result.actions
+            if anytime_result.timed_out:
+                print(f"(Hết thời gian {args.time_budget_ms} ms, dùng lời giải tốt nhất đã tìm được)")
+        else:
+            optimal_actions = solve_level(world, args.heuristic, search_stats,
+                                          args.engine, args.max_nodes, max_bytes, prune=not args.no_prune,
+                                          workers=args.workers)
+        print(f"(Chế độ heuristic '{args.heuristic}': đã mở rộng {search_stats.nodes_expanded} nút)")
+        if search_stats.nodes_forgotten:
+            print(f"(Đã chạm giới hạn bộ nhớ: quên {search_stats.nodes_forgotten} trạng thái trong bảng chuyển vị)")
         
         if optimal_actions:
             print(f"GIAI ĐOẠN 1 HOÀN TẤT: Tìm thấy chuỗi {len(optimal_actions)} hành động tối ưu.")
             
             print("\nBắt đầu Giai đoạn 2: Tổng hợp thành chương trình có cấu trúc...")
-            program_solution = synthesize_program(optimal_actions)
+            if args.blocks_budget_ms is not None:
+                blocks_result = solve_level_blocks(world, time_budget_ms=args.blocks_budget_ms, stats=search_stats,
+                                                   actions=optimal_actions)
+                program_solution = blocks_result.program
+                coverage = 'đã duyệt hết' if blocks_result.optimal else \
+                    'hết thời gian' if blocks_result.timed_out else 'chỉ xét một phần các Hàm ứng viên'
+                print(f"(Giải theo số khối: duyệt {blocks_result.states_explored} trạng thái, {coverage})")
+            elif args.synthesis_search_ms is not None:
+                synthesis = synthesize_program_search(optimal_actions, time_budget_ms=args.synthesis_search_ms,
+                                                      stats=search_stats)
+                program_solution = synthesis.program
+                print(f"(Tìm kiếm tổng hợp: duyệt {synthesis.states_explored} trạng thái, "
+                      f"{'đã chứng minh tối ưu' if synthesis.optimal else 'chưa chứng minh tối ưu'})")
+            else:
+                program_solution = synthesize_program(optimal_actions, search_stats, args.compression)
             
             # [TÍNH NĂNG MỚI] Đếm số khối lệnh sau khi tối ưu
-            optimized_block_count = count_blocks(program_solution)
+            optimized_block_count = count_blocks(program_solution, search_stats)
             
             print(f"\nGIAI ĐOẠN 2 HOÀN TẤT: Lời giải tối ưu về cấu trúc là:")
             print(f"(Tối ưu từ {len(optimal_actions)} hành động xuống còn {optimized_block_count} khối lệnh)")
@@ -342,6 +2338,21 @@ if __name__ == "__main__":
 
         else:
             print("❌ KHÔNG TÌM THẤY LỜI GIẢI cho level này.")
+            report = check_reachability(world)
+            for target in report.unreachable_targets:
+                pos = target['position']
+                reason = 'không tới được' if target['reason'] == 'unreachable' else 'tới được nhưng không về được đích'
+                print(f"   - {target['kind']} '{target['id']}' tại ({pos['x']}, {pos['y']}, {pos['z']}): {reason}")
+            if report.blocking_cells:
+                cells = ', '.join(f"({b['x']}, {b['y']}, {b['z']}) {b['modelKey']}" for b in report.blocking_cells)
+                print(f"   Các khối đang chắn đường: {cells}")
+
+        if args.profile == "-":
+            print(json.dumps(search_stats.to_dict(), indent=2, ensure_ascii=False), file=profile_stdout)
+        elif args.profile:
+            with open(args.profile, "w", encoding="utf-8") as f:
+                json.dump(search_stats.to_dict(), f, indent=2, ensure_ascii=False)
+            print(f"(Đã ghi báo cáo đo đạc vào '{args.profile}')", file=sys.stderr)
 
     except FileNotFoundError:
         print(f"LỖI: Không tìm thấy file '{json_filename}'. Hãy chắc chắn bạn đã nhập đúng tên và file ở cùng thư mục.")
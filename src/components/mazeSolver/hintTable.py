@@ -0,0 +1,316 @@
+"""
+Bảng gợi ý tính sẵn cho từng level: chi phí còn lại (cost-to-go) của mọi trạng thái (pose, collected).
+
+Bảng đầy đủ được dựng bằng một lần BFS ngược từ tất cả trạng thái đích (đứng ở ô đích với đủ vật phẩm, mọi
+hướng) trên toàn không gian trạng thái và lưu trong một mảng phẳng `array('B')`/`array('H')`. Một gợi ý
+"bước tiếp theo tốt nhất" khi đó chỉ là một lần tra bảng cộng với quét các trạng thái kề, thay vì chạy lại A*.
+
+Level lớn (số trạng thái vượt `DENSE_STATE_LIMIT`) dùng bảng giới hạn: chỉ các trạng thái cách lộ trình tối
+ưu (từ vị trí xuất phát) không quá `radius` bước. Giá trị của chúng là chi phí ngắn nhất để quay về lộ trình
+rồi đi tiếp, tính trong vùng đó; đây chỉ là cận trên, nên bảng chỉ giữ các trạng thái mà giá trị chắc chắn tối
+ưu: nằm trên lộ trình, hoặc bằng cận dưới của heuristic chấp nhận được. Trạng thái không có trong bảng trả về
+None để bên gọi quay về tìm kiếm.
+
+Công tắc không ảnh hưởng tới luật di chuyển hiện tại (xem `GameWorld.relevant_switch_mask`) nên không nằm trong
+khóa của bảng.
+
+Cách dùng:
+    table = build_hint_table(world)
+    action, remaining = table.next_action(state)
+    table.save('level.hints'); table = HintTable.load('level.hints', world)
+    python hintTable.py level.json -o level.hints --radius 8
+"""
+import argparse
+import heapq
+import json
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from gameSolver import SOLVER_VERSION, Action, GameState, GameWorld, SearchStats, get_successors, solve_level
+
+# Số trạng thái tối đa của bảng đầy đủ (pose x tập vật phẩm); vượt quá thì dùng bảng giới hạn.
+DENSE_STATE_LIMIT = 1 << 20
+# Bán kính mặc định (số bước lệch khỏi lộ trình tối ưu) của bảng giới hạn.
+DEFAULT_RADIUS = 6
+# Giá trị "chưa biết / không tới được đích" trong bảng.
+UNKNOWN = 0xFFFF
+HINT_FILE_MAGIC = b'MAZEHINT1\n'
+
+
+class HintTable:
+    """
+    Bảng cost-to-go trên chỉ số trạng thái nén `collected * num_poses + slot * 4 + hướng`, với `slot` là thứ tự
+    của ô trong `world.standable_cells`. Bảng đầy đủ: `costs[index]`; bảng giới hạn: `keys` (đã sắp xếp) và `costs`
+    song song, tra bằng tìm kiếm nhị phân.
+    """
+
+    def __init__(self, world: GameWorld, costs: array, keys: Optional[array] = None, radius: Optional[int] = None):
+        self.world = world
+        self.costs = costs
+        self.keys = keys
+        self.radius = radius
+        self.num_poses = len(world.standable_cells) * 4
+        self._slots: Dict[int, int] = {cell: slot for slot, cell in enumerate(world.standable_cells)}
+        self._unknown = UNKNOWN if costs.typecode == 'H' else 0xFF
+
+    @property
+    def bounded(self) -> bool:
+        return self.keys is not None
+
+    def __len__(self) -> int:
+        """Số trạng thái có giá trị trong bảng."""
+        return sum(1 for c in self.costs if c != self._unknown)
+
+    def index(self, state: GameState) -> int:
+        slot = self._slots.get(state.pose >> 2)
+        if slot is None:
+            return -1
+        return state.collected * self.num_poses + slot * 4 + (state.pose & 3)
+
+    def cost(self, state: GameState) -> Optional[int]:
+        """Số hành động còn lại tới đích từ `state`, hoặc None nếu không tới được / ngoài vùng của bảng."""
+        index = self.index(state)
+        if index < 0:
+            return None
+        if self.keys is None:
+            value = self.costs[index] if index < len(self.costs) else self._unknown
+        else:
+            position = bisect_left(self.keys, index)
+            value = self.costs[position] if position < len(self.keys) and self.keys[position] == index else self._unknown
+        return None if value == self._unknown else value
+
+    def next_action(self, state: GameState) -> Optional[Tuple[Optional[Action], int]]:
+        """(hành động tiếp theo tối ưu, số hành động còn lại); (None, 0) khi đã ở đích, None nếu bảng không biết."""
+        remaining = self.cost(state)
+        if remaining is None:
+            return None
+        if remaining == 0:
+            return None, 0
+        for action, next_state in get_successors(self.world, state):
+            if self.cost(next_state) == remaining - 1:
+                return action, remaining
+        return None
+
+    def plan(self, state: GameState) -> Optional[List[Action]]:
+        """Dãy hành động tới đích bằng cách lần theo bảng, hoặc None nếu bảng không dẫn tới đích từ `state`."""
+        actions: List[Action] = []
+        remaining = self.cost(state)
+        while remaining:
+            step = next(((a, s) for a, s in get_successors(self.world, state) if self.cost(s) == remaining - 1), None)
+            if step is None:
+                return None
+            actions.append(step[0])
+            state, remaining = step[1], remaining - 1
+        return actions if remaining == 0 else None
+
+    # --- Lưu / tải ---
+    def save(self, path: str, level_hash: Optional[str] = None) -> None:
+        header = {
+            'solver_version': SOLVER_VERSION, 'level_hash': level_hash, 'num_poses': self.num_poses,
+            'radius': self.radius, 'byteorder': sys.byteorder, 'costs': [self.costs.typecode, len(self.costs)],
+            'keys': [self.keys.typecode, len(self.keys)] if self.keys is not None else None,
+        }
+        with open(path, 'wb') as f:
+            f.write(HINT_FILE_MAGIC)
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            self.costs.tofile(f)
+            if self.keys is not None:
+                self.keys.tofile(f)
+
+    @classmethod
+    def load(cls, path: str, world: GameWorld, level_hash: Optional[str] = None) -> 'HintTable':
+        """Tải bảng đã lưu; ném ValueError nếu file hỏng hoặc không khớp phiên bản solver / level."""
+        with open(path, 'rb') as f:
+            if f.readline() != HINT_FILE_MAGIC:
+                raise ValueError(f"'{path}' không phải file bảng gợi ý")
+            header = json.loads(f.readline().decode('utf-8'))
+            if header['solver_version'] != SOLVER_VERSION:
+                raise ValueError(f"Bảng gợi ý của solver phiên bản {header['solver_version']}, cần {SOLVER_VERSION}")
+            if level_hash is not None and header['level_hash'] not in (None, level_hash):
+                raise ValueError("Bảng gợi ý thuộc về level khác")
+            if header['num_poses'] != len(world.standable_cells) * 4:
+                raise ValueError("Bảng gợi ý không khớp với level đã biên dịch")
+            arrays = []
+            for spec in (header['costs'], header['keys']):
+                if spec is None:
+                    arrays.append(None)
+                    continue
+                values = array(spec[0])
+                values.fromfile(f, spec[1])
+                if header['byteorder'] != sys.byteorder:
+                    values.byteswap()
+                arrays.append(values)
+        return cls(world, arrays[0], arrays[1], header['radius'])
+
+
+def _compact(costs: array, limit: int) -> array:
+    """Thu về `array('B')` khi mọi giá trị đã biết đều nhỏ hơn 255."""
+    if limit < 0xFF:
+        return array('B', [0xFF if c == UNKNOWN else c for c in costs])
+    return costs
+
+
+def build_dense_table(world: GameWorld, stats: Optional[SearchStats] = None) -> HintTable:
+    """BFS ngược từ mọi trạng thái đích trên toàn bộ không gian (pose, collected); `stats.checkpoint()` mỗi lớp."""
+    cells = world.standable_cells
+    slots = {cell: slot for slot, cell in enumerate(cells)}
+    num_poses = len(cells) * 4
+    # Đồ thị ngược của bước di chuyển trên chỉ số pose nén (gồm cả cổng dịch chuyển).
+    reverse_moves = world.get_distance_heuristic(stats)._reverse_moves
+    predecessors: List[Tuple[int, ...]] = [
+        tuple(slots[prev >> 2] * 4 + (prev & 3) for prev in reverse_moves.get((cell << 2) | d, ()))
+        for cell in cells for d in range(4)
+    ]
+    slot_bits = [world.collectible_bits.get(cell, 0) for cell in cells]
+    full = world.all_collected_mask
+    costs = array('H', [UNKNOWN]) * ((full + 1) * num_poses)
+
+    finish = world.finish_pos
+    finish_slot = slots.get(world.cell_index(finish['x'], finish['y'], finish['z']))
+    frontier = [full * num_poses + finish_slot * 4 + d for d in range(4)] if finish_slot is not None else []
+    for index in frontier:
+        costs[index] = 0
+    depth = 0
+    while frontier:
+        if stats is not None:
+            stats.checkpoint()
+        depth += 1
+        next_frontier: List[int] = []
+        append = next_frontier.append
+        for index in frontier:
+            mask, pose = divmod(index, num_poses)
+            base = index - (pose & 3)
+            row = mask * num_poses
+            candidates = [base + ((pose + 1) & 3), base + ((pose + 3) & 3)]
+            candidates.extend(row + prev for prev in predecessors[pose])
+            bit = slot_bits[pose >> 2]
+            if bit and mask & bit:
+                candidates.append(index - bit * num_poses)
+            for prev in candidates:
+                if costs[prev] == UNKNOWN:
+                    costs[prev] = depth
+                    append(prev)
+        frontier = next_frontier
+    return HintTable(world, _compact(costs, depth - 1))
+
+
+def build_bounded_table(world: GameWorld, radius: int = DEFAULT_RADIUS,
+                        stats: Optional[SearchStats] = None) -> HintTable:
+    """
+    Bảng chỉ phủ các trạng thái tới được trong `radius` bước từ lộ trình tối ưu. Giá trị được tính bằng Dijkstra
+    ngược trong vùng đó, khởi tạo bằng chi phí còn lại (chính xác) của các trạng thái trên lộ trình; chỉ giữ các
+    giá trị được chứng minh tối ưu. `stats` nhận số liệu của lần giải lộ trình và `checkpoint()` ở mỗi lớp BFS
+    cũng như mỗi `progress_interval` bước Dijkstra.
+    """
+    checkpoint = stats.checkpoint if stats is not None else lambda: None
+    empty = HintTable(world, array('H'), array('q'), radius)
+    actions = solve_level(world, stats=stats)
+    if actions is None:
+        return empty
+    state = GameState.initial(world)
+    path = [state]
+    for action in actions:
+        state = next(s for a, s in get_successors(world, state) if a == action)
+        path.append(state)
+
+    index = empty.index
+    known: Dict[int, GameState] = {}
+    seeds: Dict[int, int] = {}
+    for step, state in enumerate(path):
+        known[index(state)] = state
+        seeds[index(state)] = len(actions) - step
+    # Vùng lệch: BFS xuôi `radius` lớp từ mọi trạng thái trên lộ trình, ghi lại cạnh ngược trong vùng.
+    reverse: Dict[int, List[int]] = {}
+    frontier = list(known)
+    for _ in range(radius + 1):
+        checkpoint()
+        next_frontier = []
+        for key in frontier:
+            for action, next_state in get_successors(world, known[key]):
+                if action == 'toggleSwitch':
+                    continue
+                next_key = index(next_state)
+                reverse.setdefault(next_key, []).append(key)
+                if next_key not in known:
+                    known[next_key] = next_state
+                    next_frontier.append(next_key)
+        frontier = next_frontier
+    # Lớp ngoài cùng chỉ dùng làm cạnh tới; không nằm trong vùng.
+    region = set(known) - set(frontier)
+
+    best: Dict[int, int] = dict(seeds)
+    heap = [(cost, key) for key, cost in seeds.items()]
+    heapq.heapify(heap)
+    interval = stats.progress_interval if stats is not None else 0
+    popped = 0
+    while heap:
+        popped += 1
+        if popped == interval:
+            checkpoint()
+            popped = 0
+        cost, key = heapq.heappop(heap)
+        if cost > best[key]:
+            continue
+        for prev in reverse.get(key, ()):
+            if prev in region and cost + 1 < best.get(prev, UNKNOWN):
+                best[prev] = cost + 1
+                heapq.heappush(heap, (cost + 1, prev))
+
+    checkpoint()
+    lower_bound = world.get_distance_heuristic().evaluate
+    exact = [key for key, cost in best.items() if key in seeds or cost == lower_bound(known[key])]
+    keys = array('q', sorted(exact))
+    costs = array('H', [best[key] for key in keys])
+    return HintTable(world, _compact(costs, max(costs, default=0)), keys, radius)
+
+
+def build_hint_table(world: GameWorld, radius: Optional[int] = None, state_limit: int = DENSE_STATE_LIMIT,
+                     stats: Optional[SearchStats] = None) -> HintTable:
+    """
+    Bảng đầy đủ nếu không gian trạng thái đủ nhỏ (và không chỉ định `radius`), ngược lại bảng giới hạn.
+    `progress_callback` của `stats` được gọi định kỳ trong lúc dựng và có thể ném ngoại lệ để hủy.
+    """
+    num_states = (world.all_collected_mask + 1) * len(world.standable_cells) * 4
+    if radius is None and num_states <= state_limit:
+        return build_dense_table(world, stats)
+    return build_bounded_table(world, DEFAULT_RADIUS if radius is None else radius, stats)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dựng bảng gợi ý (cost-to-go) cho một level và đo tốc độ tra.")
+    parser.add_argument('level', help="File JSON của level")
+    parser.add_argument('-o', '--output', help="File lưu bảng gợi ý")
+    parser.add_argument('--radius', type=int, help="Dựng bảng giới hạn quanh lộ trình tối ưu với bán kính này")
+    args = parser.parse_args(argv)
+
+    with open(args.level, 'r', encoding='utf-8') as f:
+        level: Dict[str, Any] = json.load(f)
+    world = GameWorld(level)
+    started = time.perf_counter()
+    table = build_hint_table(world, args.radius)
+    build_ms = (time.perf_counter() - started) * 1000
+    kind = f"giới hạn (bán kính {table.radius})" if table.bounded else "đầy đủ"
+    size = table.costs.itemsize * len(table.costs) + (table.keys.itemsize * len(table.keys) if table.bounded else 0)
+    print(f"Bảng {kind}: {len(table)} trạng thái, {size / 1024:.1f} KB, dựng trong {build_ms:.1f} ms")
+
+    start = GameState.initial(world)
+    started = time.perf_counter()
+    repeat = 1000
+    for _ in range(repeat):
+        hint = table.next_action(start)
+    lookup_us = (time.perf_counter() - started) / repeat * 1e6
+    started = time.perf_counter()
+    solve_level(world, start=start)
+    solve_ms = (time.perf_counter() - started) * 1000
+    print(f"Gợi ý từ vị trí xuất phát: {hint}; tra bảng {lookup_us:.1f} µs, giải lại {solve_ms:.1f} ms")
+    if args.output:
+        table.save(args.output)
+        print(f"Đã lưu {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Giải lại tăng dần cho trình chỉnh sửa level (Lifelong Planning A*).
+
+`SolverSession` giữ một `GameWorld` có thể sửa tại chỗ cùng các bảng g/rhs của LPA* trên trạng thái
+(pose, collected). Sau mỗi thao tác sửa nhỏ (thêm/xóa khối, di chuyển vật phẩm, bật/tắt công tắc), chỉ các ô lân cận
+được biên dịch lại, chỉ vùng bị ảnh hưởng của các trường khoảng cách được sửa, và LPA* chỉ mở rộng lại các trạng
+thái mà chi phí thật sự thay đổi, thay vì dựng lại world + heuristic + A* từ đầu.
+
+Công tắc không chặn đường đi trong luật di chuyển hiện tại (xem `get_successors`) và đích không xét công tắc,
+nên khóa tìm kiếm bỏ qua bit công tắc: bật/tắt trạng thái ban đầu của công tắc chỉ cập nhật dữ liệu level.
+
+Cách dùng:
+    session = SolverSession(level_data)
+    actions = session.solve()
+    session.add_block(3, 1, 4, 'wall.stone')
+    actions = session.solve()          # giải lại tăng dần
+    python incrementalSolver.py level.json --edits 50
+"""
+import argparse
+import copy
+import heapq
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from gameSolver import (INF_COST, MOVE_ACTIONS, NO_CELL, Action, GameState, GameWorld, SearchStats,
+                        solve_level)
+
+# Đỉnh ảo "đã về đích": nối từ mọi trạng thái đứng ở đích với đủ vật phẩm. Cạnh này tốn 1 (không phải 0) vì
+# điều kiện dừng của LPA* cần chi phí cạnh dương; độ dài lời giải là g(GOAL) - 1.
+GOAL = -1
+
+
+class SolverSession:
+    """
+    Phiên giải tăng dần trên một bản sao của level. Các thao tác sửa chỉ ghi nhận thay đổi; `solve()` sửa lại
+    phần đồ thị tìm kiếm bị ảnh hưởng và trả về lời giải tối ưu (hoặc None nếu level không giải được).
+    """
+
+    def __init__(self, level_data: Dict[str, Any], stats: Optional[SearchStats] = None):
+        self.level = copy.deepcopy(level_data)
+        self.stats = stats
+        # Số liệu của lần `solve()` gần nhất: số trạng thái mở rộng lại, số pose của trường khoảng cách được sửa.
+        self.last_expanded = 0
+        self.last_repaired_poses = 0
+        self.rebuilds = 0
+        self._repaired_poses = 0
+        self._rebuild()
+
+    # --- Dựng lại toàn bộ (lần đầu hoặc khi thao tác sửa vượt khỏi khung bao) ---
+    def _rebuild(self) -> None:
+        self.world = GameWorld(self.level)
+        self.heuristic = self.world.get_distance_heuristic()
+        self._bits = len(self.world.collectible_bits)
+        finish = self.world.finish_pos
+        self._finish_cell = self.world.cell_index(finish['x'], finish['y'], finish['z'])
+        self._start = self._state(GameState.initial(self.world).pose, 0)
+        self._g: Dict[int, int] = {}
+        self._rhs: Dict[int, int] = {self._start: 0}
+        self._h: Dict[int, int] = {}
+        self._open: List[Tuple[int, int, int]] = []
+        self._open_keys: Dict[int, Tuple[int, int]] = {}
+        self._masks = {0}
+        self._push(self._start)
+        self.rebuilds += 1
+
+    def _state(self, pose: int, collected: int) -> int:
+        return (pose << self._bits) | collected
+
+    # --- Các thao tác sửa level ---
+    def add_block(self, x: int, y: int, z: int, model_key: str = 'ground.normal') -> None:
+        """Đặt (hoặc thay) khối `model_key` tại (x, y, z)."""
+        blocks = self.level['gameConfig'].setdefault('blocks', [])
+        blocks[:] = [b for b in blocks if (b['position']['x'], b['position']['y'], b['position']['z']) != (x, y, z)]
+        blocks.append({'modelKey': model_key, 'position': {'x': x, 'y': y, 'z': z}})
+        self._edit_block(x, y, z, model_key)
+
+    def remove_block(self, x: int, y: int, z: int) -> None:
+        """Xóa khối tại (x, y, z) nếu có."""
+        blocks = self.level['gameConfig'].get('blocks', [])
+        blocks[:] = [b for b in blocks if (b['position']['x'], b['position']['y'], b['position']['z']) != (x, y, z)]
+        self._edit_block(x, y, z, None)
+
+    def move_collectible(self, collectible_id: str, x: int, y: int, z: int) -> None:
+        """Di chuyển vật phẩm có id `collectible_id` tới (x, y, z)."""
+        item = next((c for c in self.level['gameConfig'].get('collectibles', []) if c.get('id') == collectible_id), None)
+        if item is None:
+            raise KeyError(f"Không có vật phẩm '{collectible_id}'")
+        old = item['position']
+        world = self.world
+        old_cell = world.cell_index(old['x'], old['y'], old['z'])
+        if not self._in_bounds(x, y, z) or old_cell not in world.collectible_bits:
+            item['position'] = {'x': x, 'y': y, 'z': z}
+            self._rebuild()
+            return
+        new_cell = world.cell_index(x, y, z)
+        if new_cell in world.collectible_bits:
+            raise ValueError(f"Ô ({x}, {y}, {z}) đã có vật phẩm")
+        # GameWorld giữ tham chiếu tới chính phần tử config nên vị trí trong level cũng được cập nhật.
+        bit = world.move_collectible(old_cell, new_cell)
+        index = bit.bit_length() - 1
+        self.heuristic.retarget(index, new_cell)
+        # Cạnh 'collect' bị gỡ khỏi ô cũ và thêm vào ô mới: đích của cạnh (trạng thái có bit này, ở cả hai ô) phải
+        # tính lại rhs, kể cả tập vật phẩm `mask | bit` chưa từng được sinh ra trước đó.
+        for mask in {mask | bit for mask in self._masks}:
+            self._masks.add(mask)
+            for cell in (old_cell, new_cell):
+                for direction in range(4):
+                    self._update_vertex(self._state((cell << 2) | direction, mask))
+        self._rekey()
+
+    def toggle_switch(self, switch_id: str) -> None:
+        """Đảo trạng thái ban đầu của công tắc `switch_id` (không đổi đồ thị tìm kiếm)."""
+        for item in self.level['gameConfig'].get('interactibles', []):
+            if item.get('type') == 'switch' and item.get('id') == switch_id:
+                item['initialState'] = 'off' if item.get('initialState') == 'on' else 'on'
+                pos = item['position']
+                self.world.initial_switch_mask ^= self.world.switch_bits[
+                    self.world.cell_index(pos['x'], pos['y'], pos['z'])]
+                return
+        raise KeyError(f"Không có công tắc '{switch_id}'")
+
+    def _in_bounds(self, x: int, y: int, z: int) -> bool:
+        ox, oy, oz = self.world.origin
+        sx, sy, sz = self.world.size
+        return 0 <= x - ox < sx and 0 <= y - oy and y + 2 - oy < sy and 0 <= z - oz < sz
+
+    def _edit_block(self, x: int, y: int, z: int, model_key: Optional[str]) -> None:
+        if not self._in_bounds(x, y, z):
+            self._rebuild()
+            return
+        changes = self.world.set_block(x, y, z, model_key)
+        if not changes:
+            return
+        pair_costs = self.heuristic.pair_costs
+        repaired = self.heuristic.update_edges(changes)
+        self._repaired_poses += len(repaired)
+        num_moves = len(MOVE_ACTIONS)
+        for pose, k, old_dest in changes:
+            direction = pose & 3
+            new_dest = self.world.transitions[pose * num_moves + k]
+            for mask in self._masks:
+                for dest in (old_dest, new_dest):
+                    if dest != NO_CELL:
+                        self._update_vertex(self._state((dest << 2) | self.world.arrival_direction(dest, direction), mask))
+        self._rekey(None if self.heuristic.pair_costs is not pair_costs else repaired)
+
+    # --- LPA* ---
+    def _heuristic(self, state: int) -> int:
+        value = self._h.get(state)
+        if value is None:
+            if state == GOAL:
+                value = 0
+            else:
+                value = self.heuristic.evaluate(GameState(state >> self._bits, state & self.world.all_collected_mask))
+            self._h[state] = value
+        return value
+
+    def _key(self, state: int) -> Tuple[int, int]:
+        best = min(self._g.get(state, INF_COST), self._rhs.get(state, INF_COST))
+        return (min(best + self._heuristic(state), INF_COST), best)
+
+    def _push(self, state: int) -> None:
+        key = self._key(state)
+        self._open_keys[state] = key
+        heapq.heappush(self._open, (key[0], key[1], state))
+
+    def _rekey(self, poses: Optional[Set[int]] = None) -> None:
+        """
+        Heuristic đã đổi: bỏ giá trị h đã nhớ và tính lại khóa trên biên. Nếu biết tập `poses` có trường khoảng
+        cách bị sửa (còn `pair_costs` giữ nguyên) thì chỉ các trạng thái ở những pose đó bị ảnh hưởng.
+        """
+        if poses is None:
+            self._h.clear()
+            stale = list(self._open_keys)
+        else:
+            if not poses:
+                return
+            shift = self._bits
+            for state in [s for s in self._h if s != GOAL and s >> shift in poses]:
+                del self._h[state]
+            stale = [s for s in self._open_keys if s != GOAL and s >> shift in poses]
+        for state in stale:
+            self._push(state)
+
+    def _predecessors(self, state: int) -> List[Tuple[int, Action]]:
+        """Các (trạng thái trước, hành động) dẫn tới `state`; mọi cạnh đều có chi phí 1."""
+        world = self.world
+        if state == GOAL:
+            return [(self._state((self._finish_cell << 2) | d, world.all_collected_mask), 'finish') for d in range(4)]
+        pose, collected = state >> self._bits, state & world.all_collected_mask
+        cell, direction = pose >> 2, pose & 3
+        result = [(self._state((cell << 2) | ((direction + 1) & 3), collected), 'turnLeft'),
+                  (self._state((cell << 2) | ((direction + 3) & 3), collected), 'turnRight')]
+        num_moves = len(MOVE_ACTIONS)
+        for prev in self.heuristic._reverse_moves.get(pose, ()):
+            action = 'moveForward' if world.transitions[prev * num_moves] == cell else 'jump'
+            result.append((self._state(prev, collected), action))
+        bit = world.collectible_bits.get(cell, 0)
+        if bit and collected & bit:
+            result.append((self._state(pose, collected ^ bit), 'collect'))
+        return result
+
+    def _successors(self, state: int) -> List[int]:
+        if state == GOAL:
+            return []
+        world = self.world
+        pose, collected = state >> self._bits, state & world.all_collected_mask
+        cell, direction = pose >> 2, pose & 3
+        result = [self._state((cell << 2) | ((direction + 3) & 3), collected),
+                  self._state((cell << 2) | ((direction + 1) & 3), collected)]
+        base = pose * len(MOVE_ACTIONS)
+        for k in range(len(MOVE_ACTIONS)):
+            dest = world.transitions[base + k]
+            if dest != NO_CELL:
+                result.append(self._state((dest << 2) | world.arrival_direction(dest, direction), collected))
+        bit = world.collectible_bits.get(cell, 0)
+        if bit and not collected & bit:
+            result.append(self._state(pose, collected | bit))
+            self._masks.add(collected | bit)
+        if cell == self._finish_cell and collected == world.all_collected_mask:
+            result.append(GOAL)
+        return result
+
+    def _update_vertex(self, state: int) -> None:
+        if state != self._start:
+            best = INF_COST
+            for prev, _ in self._predecessors(state):
+                value = self._g.get(prev, INF_COST)
+                if value < best:
+                    best = value
+            best = best + 1 if best < INF_COST else INF_COST
+            if best < INF_COST:
+                self._rhs[state] = best
+            else:
+                self._rhs.pop(state, None)
+        if self._g.get(state, INF_COST) != self._rhs.get(state, INF_COST):
+            self._push(state)
+        else:
+            self._open_keys.pop(state, None)
+
+    def _compute_shortest_path(self) -> int:
+        expanded = 0
+        g, rhs, open_keys, heap = self._g, self._rhs, self._open_keys, self._open
+        while heap:
+            k1, k2, state = heap[0]
+            if open_keys.get(state) != (k1, k2):
+                heapq.heappop(heap)
+                continue
+            goal_g, goal_rhs = g.get(GOAL, INF_COST), rhs.get(GOAL, INF_COST)
+            if (k1, k2) >= self._key(GOAL) and goal_g == goal_rhs:
+                break
+            if k1 >= INF_COST:
+                break
+            heapq.heappop(heap)
+            del open_keys[state]
+            expanded += 1
+            if self.stats is not None:
+                self.stats.record_expansion(len(open_keys), len(g))
+            current = rhs.get(state, INF_COST)
+            if g.get(state, INF_COST) > current:
+                g[state] = current
+                for succ in self._successors(state):
+                    self._update_vertex(succ)
+            else:
+                g.pop(state, None)
+                self._update_vertex(state)
+                for succ in self._successors(state):
+                    self._update_vertex(succ)
+            heap = self._open
+        return expanded
+
+    def solve(self) -> Optional[List[Action]]:
+        """Sửa lại phần đồ thị bị ảnh hưởng bởi các thao tác từ lần gọi trước và trả về lời giải tối ưu."""
+        self.last_expanded = self._compute_shortest_path()
+        self.last_repaired_poses, self._repaired_poses = self._repaired_poses, 0
+        if self.stats is not None:
+            self.stats.nodes_generated = len(self._g)
+        if self._g.get(GOAL, INF_COST) >= INF_COST:
+            return None
+        # Lần ngược từ GOAL theo tiền nhiệm có g + 1 nhỏ nhất.
+        actions: List[Action] = []
+        state = GOAL
+        while state != self._start:
+            best_prev, best_action, best_value = None, None, INF_COST
+            for prev, action in self._predecessors(state):
+                value = self._g.get(prev, INF_COST)
+                if value < best_value:
+                    best_prev, best_action, best_value = prev, action, value
+            if best_prev is None:
+                return None
+            if best_action != 'finish':
+                actions.append(best_action)
+            state = best_prev
+        actions.reverse()
+        return actions
+
+
+def _random_edit(session: SolverSession, rng: random.Random) -> str:
+    """Một thao tác sửa ngẫu nhiên một ô (dùng cho chế độ đo của CLI)."""
+    world = session.world
+    ox, oy, oz = world.origin
+    x, z = ox + rng.randrange(world.size[0]), oz + rng.randrange(world.size[2])
+    column = [y for y in range(oy, oy + world.size[1]) if f"{x}-{y}-{z}" in world.world_map]
+    top = max(column) if column else oy
+    if column and rng.random() < 0.5:
+        session.remove_block(x, top, z)
+        return f"remove ({x}, {top}, {z})"
+    if top + 3 - oy < world.size[1]:
+        session.add_block(x, top + 1, z, rng.choice(('wall.stone', 'ground.normal')))
+        return f"add ({x}, {top + 1}, {z})"
+    session.remove_block(x, top, z)
+    return f"remove ({x}, {top}, {z})"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Đo thời gian giải lại tăng dần sau các thao tác sửa một ô.")
+    parser.add_argument('level', help="File JSON của level")
+    parser.add_argument('--edits', type=int, default=20, help="Số thao tác sửa ngẫu nhiên")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify', action='store_true', help="So độ dài lời giải với một lần giải đầy đủ")
+    args = parser.parse_args(argv)
+
+    with open(args.level, 'r', encoding='utf-8') as f:
+        level = json.load(f)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    session = SolverSession(level)
+    actions = session.solve()
+    print(f"Giải lần đầu: {(time.perf_counter() - started) * 1000:.1f} ms, "
+          f"{len(actions) if actions is not None else 'không có'} hành động")
+    for _ in range(args.edits):
+        started = time.perf_counter()
+        description = _random_edit(session, rng)
+        actions = session.solve()
+        incremental_ms = (time.perf_counter() - started) * 1000
+        line = (f"{description:<22} tăng dần {incremental_ms:8.1f} ms  mở rộng {session.last_expanded:>6}  "
+                f"-> {len(actions) if actions is not None else 'không có'}")
+        if args.verify:
+            started = time.perf_counter()
+            full = solve_level(GameWorld(copy.deepcopy(session.level)))
+            full_ms = (time.perf_counter() - started) * 1000
+            same = (full is None) == (actions is None) and (full is None or len(full) == len(actions))
+            line += f"  đầy đủ {full_ms:8.1f} ms  {'ok' if same else 'KHÁC'}"
+            if not same:
+                print(line)
+                return 1
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
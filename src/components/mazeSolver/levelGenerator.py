@@ -0,0 +1,136 @@
+"""
+Sinh level Maze 3D tổng hợp (có seed) để đo hiệu năng và kiểm thử solver ở quy mô lớn.
+
+Cách dùng:
+    python levelGenerator.py --seed 7 --width 16 --depth 16 --collectibles 4 -o level.json
+"""
+import argparse
+import json
+import random
+import sys
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from gameSolver import DIRECTIONS, MOVE_ACTIONS, NO_CELL, GameWorld
+
+GROUND_MODELS = ('ground.normal', 'ground.checker', 'ground.earth', 'ground.snow')
+WALL_MODEL = 'wall.stone'
+
+
+def _smooth_heights(heights: List[List[int]]) -> None:
+    """Ép chênh lệch độ cao giữa hai ô kề nhau không quá 1 (đi xuống bằng moveForward, lên bằng jump)."""
+    width, depth = len(heights), len(heights[0])
+    changed = True
+    while changed:
+        changed = False
+        for x in range(width):
+            for z in range(depth):
+                for dx, _, dz in DIRECTIONS:
+                    nx, nz = x + dx, z + dz
+                    if 0 <= nx < width and 0 <= nz < depth and heights[x][z] > heights[nx][nz] + 1:
+                        heights[x][z] = heights[nx][nz] + 1
+                        changed = True
+
+
+def _reachable_cells(world: GameWorld) -> List[Tuple[int, int, int]]:
+    """Các ô đứng được mà người chơi tới được từ vị trí xuất phát (bỏ qua hướng, vật phẩm và công tắc)."""
+    start = world.start_info
+    start_cell = world.cell_index(start['x'], start['y'], start['z'])
+    seen, queue = {start_cell}, deque([start_cell])
+    num_moves = len(MOVE_ACTIONS)
+    while queue:
+        cell = queue.popleft()
+        for direction in range(4):
+            for k in range(num_moves):
+                dest = world.transitions[(cell * 4 + direction) * num_moves + k]
+                if dest != NO_CELL and dest not in seen:
+                    seen.add(dest)
+                    queue.append(dest)
+    return sorted(world.cell_position(cell) for cell in seen)
+
+
+def generate_level(seed: int, width: int = 10, depth: int = 10, height_variation: int = 0,
+                   wall_density: float = 0.15, num_collectibles: int = 3, num_switches: int = 0,
+                   num_portals: int = 0, level_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Sinh một level có thể giải được: nền là một lưới `width` x `depth` với độ cao trong [0, height_variation],
+    tường phủ ngẫu nhiên theo `wall_density`; vật phẩm, công tắc, cặp cổng dịch chuyển và đích
+    được đặt trên các ô tới được từ vị trí xuất phát.
+    """
+    rng = random.Random(seed)
+    heights = [[rng.randint(0, height_variation) for _ in range(depth)] for _ in range(width)]
+    _smooth_heights(heights)
+
+    blocks: List[Dict[str, Any]] = []
+    for x in range(width):
+        for z in range(depth):
+            blocks.append({'modelKey': rng.choice(GROUND_MODELS), 'position': {'x': x, 'y': heights[x][z], 'z': z}})
+
+    start_x, start_z = rng.randrange(width), rng.randrange(depth)
+    start = {'x': start_x, 'y': heights[start_x][start_z] + 1, 'z': start_z, 'direction': rng.randrange(4)}
+    for x in range(width):
+        for z in range(depth):
+            if (x, z) != (start_x, start_z) and rng.random() < wall_density:
+                blocks.append({'modelKey': WALL_MODEL, 'position': {'x': x, 'y': heights[x][z] + 1, 'z': z}})
+
+    base_config = {'blocks': blocks, 'players': [{'id': 'player1', 'start': start}], 'finish': dict(start)}
+    reachable = [pos for pos in _reachable_cells(GameWorld({'gameConfig': base_config}))
+                 if (pos[0], pos[2]) != (start_x, start_z)]
+    needed = num_collectibles + num_switches + 2 * num_portals + 1
+    if len(reachable) < needed:
+        raise ValueError(f"Level quá chật: chỉ có {len(reachable)} ô tới được, cần {needed}")
+    spots = [{'x': x, 'y': y, 'z': z} for x, y, z in rng.sample(reachable, needed)]
+
+    collectibles = [{'id': f'c{i + 1}', 'type': 'crystal', 'position': spots.pop()} for i in range(num_collectibles)]
+    interactibles: List[Dict[str, Any]] = []
+    for i in range(num_switches):
+        interactibles.append({'id': f'switch_{i + 1}', 'type': 'switch', 'position': spots.pop(),
+                              'initialState': rng.choice(('on', 'off'))})
+    for i in range(num_portals):
+        a_id, b_id = f'portal_{i + 1}_A', f'portal_{i + 1}_B'
+        interactibles.append({'id': a_id, 'type': 'portal', 'color': 'blue', 'position': spots.pop(), 'targetId': b_id})
+        interactibles.append({'id': b_id, 'type': 'portal', 'color': 'blue', 'position': spots.pop(), 'targetId': a_id})
+
+    return {
+        'id': level_id or f'generated-{seed}',
+        'gameType': 'maze',
+        'level': 0,
+        'titleKey': 'Games.maze',
+        'gameConfig': {
+            'type': 'maze',
+            'renderer': '3d',
+            'blocks': blocks,
+            'players': [{'id': 'player1', 'start': start}],
+            'collectibles': collectibles,
+            'interactibles': interactibles,
+            'finish': spots.pop(),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sinh level Maze 3D tổng hợp.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--height-variation', type=int, default=0)
+    parser.add_argument('--wall-density', type=float, default=0.15)
+    parser.add_argument('--collectibles', type=int, default=3)
+    parser.add_argument('--switches', type=int, default=0)
+    parser.add_argument('--portals', type=int, default=0)
+    parser.add_argument('-o', '--output', default='-', help="File JSON đầu ra ('-' là stdout)")
+    args = parser.parse_args(argv)
+
+    level = generate_level(args.seed, args.width, args.depth, args.height_variation, args.wall_density,
+                           args.collectibles, args.switches, args.portals)
+    text = json.dumps(level, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+A* song song phân tán theo băm (HDA*) trên nhiều tiến trình.
+
+Mỗi trạng thái thuộc về đúng một worker, chọn bằng hàm băm của khóa trạng thái. Worker giữ hàng đợi mở và bảng
+g/cha của riêng mình; trạng thái kế tiếp thuộc worker khác được gom thành lô rồi gửi qua hàng đợi
+`multiprocessing`. Chi phí lời giải tốt nhất đã tìm thấy (incumbent) được chia sẻ: worker không mở rộng nút có
+f >= incumbent. Mỗi worker còn công bố f nhỏ nhất trong hàng đợi của mình; một worker chỉ mở rộng nút có f không
+vượt quá f nhỏ nhất toàn cục, để các worker không chạy trước quá xa vào vùng f lớn (chi phí tìm kiếm thừa).
+Tiến trình điều phối kết luận tìm kiếm đã xong khi mọi worker rảnh và tổng số lô đã gửi bằng tổng số lô đã nhận
+trong hai lần quan sát liên tiếp không đổi (đếm kép). Khi đó không còn nút nào có f nhỏ hơn incumbent, nên lời
+giải vẫn tối ưu như A* tuần tự. Đường đi được dựng lại bằng cách hỏi cha của từng trạng thái từ worker sở hữu nó.
+
+Tạo tiến trình và gửi lô tốn vài chục ms cố định, nên `solve_level_parallel` chỉ dùng HDA* khi đáng: số worker bị
+giới hạn bởi số CPU được cấp, và A* tuần tự được chạy trước tối đa `PARALLEL_MIN_EXPANSIONS` nút; level giải xong
+trong ngưỡng đó không tạo tiến trình nào. Đường tăng tốc theo số worker chưa được đo: máy phát triển hiện tại chỉ
+có 1 CPU; đo bằng `benchmark.py --parallel 1,2,4` trên máy nhiều lõi.
+
+Cách dùng:
+    actions = solve_level(world, workers=4)
+    actions = solve_level_parallel(world, workers=4, stats=stats)
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from gameSolver import (INF_COST, Action, GameState, GameWorld, SearchStats, _astar_events, get_successors,
+                        search_start, search_successors)
+
+# Số nút mở rộng giữa hai lần nhận/gửi lô.
+EXPAND_BATCH = 64
+# Thời gian chờ hộp thư khi worker rảnh, và chu kỳ chờ f nhỏ nhất toàn cục / kiểm tra kết thúc (giây).
+IDLE_WAIT = 0.01
+POLL_INTERVAL = 0.002
+# Số nút A* tuần tự mở rộng trước khi chuyển sang HDA* (~150 ms ở ~30 nút/ms, lớn hơn nhiều chi phí khởi động).
+PARALLEL_MIN_EXPANSIONS = 5000
+
+
+def _owner(key: int, workers: int) -> int:
+    """Worker sở hữu trạng thái: băm nhân (Fibonacci) để các khóa liền nhau rải đều giữa các worker."""
+    return ((key * 0x9E3779B97F4A7C15) >> 32) % workers
+
+
+class _KeyCodec:
+    """Đóng gói (pose, switches, collected) thành một số nguyên: nhỏ khi gửi giữa tiến trình và băm nhanh."""
+    def __init__(self, world: GameWorld):
+        self.collected_bits = len(world.collectible_bits)
+        self.switch_bits = len(world.switch_bits)
+
+    def encode(self, state: GameState) -> int:
+        return (((state.pose << self.switch_bits) | state.switches) << self.collected_bits) | state.collected
+
+    def decode(self, key: int) -> GameState:
+        collected = key & ((1 << self.collected_bits) - 1)
+        rest = key >> self.collected_bits
+        return GameState(rest >> self.switch_bits, collected, rest & ((1 << self.switch_bits) - 1))
+
+
+def _worker(index: int, workers: int, world: GameWorld, start_key: int, prune: bool, inboxes, results,
+            incumbent, idle, sent, received, frontier) -> None:
+    """Vòng lặp của một worker HDA*: nhận lô, mở rộng các nút của mình, gửi trạng thái kế tiếp cho chủ của chúng."""
+    codec = _KeyCodec(world)
+    heuristic = world.get_distance_heuristic().evaluate
+    finish_cell = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    inbox = inboxes[index]
+    open_list: List[Tuple[int, int, int, int, int]] = []
+    counter = itertools.count()
+    best_g: Dict[int, int] = {}
+    # Trạng thái -> (khóa cha, hành động, hành động trước đó của cha) để dựng đường đi và áp luật cắt tỉa.
+    parents: Dict[int, Tuple[int, Optional[Action], Optional[Action]]] = {}
+    outboxes: List[List[Tuple]] = [[] for _ in range(workers)]
+    expanded = generated = 0
+
+    def receive(key: int, g: int, parent: int, action: Optional[Action], previous: Optional[Action]) -> None:
+        nonlocal generated
+        if g >= best_g.get(key, INF_COST):
+            return
+        h = heuristic(codec.decode(key))
+        if h >= INF_COST:
+            return
+        best_g[key] = g
+        parents[key] = (parent, action, previous)
+        generated += 1
+        heapq.heappush(open_list, (g + h, h, next(counter), g, key))
+
+    def handle(message: Tuple) -> bool:
+        """Xử lý một thông điệp trong hộp thư; trả về False khi nhận lệnh dừng."""
+        kind = message[0]
+        if kind == 'nodes':
+            # Đánh dấu bận trước khi tăng bộ đếm nhận: bộ điều phối không thể thấy "đủ lô" mà vẫn "rảnh" cũ.
+            idle[index] = 0
+            with received.get_lock():
+                received[index] += 1
+            for node in message[1]:
+                receive(*node)
+        elif kind == 'parent':
+            results.put(('parent', message[1], parents.get(message[1])))
+        elif kind == 'stop':
+            results.put(('stats', index, expanded, generated))
+            return False
+        return True
+
+    if _owner(start_key, workers) == index:
+        receive(start_key, 0, -1, None, None)
+    while True:
+        # 1. Nhận mọi lô / lệnh đang chờ (không chặn).
+        while True:
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if not handle(message):
+                return
+
+        # 2. Mở rộng một lô nút có f < incumbent và không vượt f nhỏ nhất toàn cục (đọc không khóa, có thể hơi cũ).
+        frontier[index] = open_list[0][0] if open_list else INF_COST
+        bound = min(min(frontier), incumbent.value - 1)
+        for _ in range(EXPAND_BATCH):
+            if not open_list or open_list[0][0] > bound:
+                break
+            f, _, _, g, key = heapq.heappop(open_list)
+            if g > best_g[key]:
+                continue
+            expanded += 1
+            state = codec.decode(key)
+            if state.pose >> 2 == finish_cell and state.collected == world.all_collected_mask:
+                with incumbent.get_lock():
+                    if g < incumbent.value:
+                        incumbent.value = g
+                        results.put(('goal', g, key))
+                continue
+            _, action, previous = parents[key]
+            successors = search_successors(world, state, action, previous) if prune else get_successors(world, state)
+            for next_action, next_state in successors:
+                next_key = codec.encode(next_state)
+                owner = _owner(next_key, workers)
+                if owner == index:
+                    receive(next_key, g + 1, key, next_action, action)
+                else:
+                    outboxes[owner].append((next_key, g + 1, key, next_action, action))
+
+        # 3. Gửi các lô (tăng bộ đếm gửi trước khi đặt vào hàng đợi).
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                with sent.get_lock():
+                    sent[index] += 1
+                inboxes[owner].put(('nodes', batch))
+                outboxes[owner] = []
+
+        # 4. Không còn việc (hoặc phải chờ worker khác có f nhỏ hơn): chờ hộp thư; chỉ báo rảnh khi thật sự hết việc.
+        frontier[index] = open_list[0][0] if open_list else INF_COST
+        if not open_list or open_list[0][0] >= incumbent.value:
+            idle[index] = 1
+        if idle[index] or open_list[0][0] > min(frontier):
+            try:
+                message = inbox.get(timeout=IDLE_WAIT if idle[index] else POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if not handle(message):
+                return
+
+
+def _available_cpus() -> int:
+    """Số CPU tiến trình này được phép chạy trên (tôn trọng giới hạn affinity/cgroup nếu hệ điều hành hỗ trợ)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def solve_level_parallel(world: GameWorld, workers: int = 2, stats: Optional[SearchStats] = None,
+                         start: Optional[GameState] = None, prune: bool = True) -> Optional[List[Action]]:
+    """
+    A* tối ưu dùng tối đa `workers` tiến trình; trả về lời giải (cùng độ dài với A* tuần tự) hoặc None.
+    `workers` bị giới hạn bởi số CPU; chỉ khi A* tuần tự chưa xong sau `PARALLEL_MIN_EXPANSIONS` nút mới chuyển
+    sang HDA* (các nút đó được tính vào `stats`). `progress_callback` của `stats` được gọi định kỳ và có thể ném
+    ngoại lệ để hủy tìm kiếm.
+    """
+    if workers < 1:
+        raise ValueError("workers phải >= 1")
+    workers = min(workers, _available_cpus())
+    probe = _astar_events(world, False, stats, start, PARALLEL_MIN_EXPANSIONS if workers > 1 else None, prune)
+    event = next(probe)
+    probe.close()
+    if event.done:
+        return event.actions
+    return _solve_hda(world, workers, stats, start, prune)
+
+
+def _solve_hda(world: GameWorld, workers: int, stats: Optional[SearchStats], start: Optional[GameState],
+               prune: bool) -> Optional[List[Action]]:
+    """HDA* với đúng `workers` tiến trình; `stats` nhận tổng số nút mở rộng/sinh ra của mọi worker."""
+    # Dựng heuristic trước khi tạo tiến trình để worker thừa hưởng (fork) hoặc nhận kèm world (spawn).
+    world.get_distance_heuristic()
+    codec = _KeyCodec(world)
+    start_state = search_start(world, start) if prune else start or GameState.initial(world)
+    start_key = codec.encode(start_state)
+
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    incumbent = context.Value('q', INF_COST)
+    idle = context.Array('b', workers)
+    sent = context.Array('q', workers)
+    received = context.Array('q', workers)
+    frontier = context.Array('q', [INF_COST] * workers, lock=False)
+    processes = [
+        context.Process(target=_worker, args=(i, workers, world, start_key, prune, inboxes, results, incumbent,
+                                              idle, sent, received, frontier), daemon=True)
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    goal: Optional[Tuple[int, int]] = None
+    pending: List[Tuple[Any, ...]] = []
+    try:
+        previous = None
+        while True:
+            # Chờ chặn trên hàng đợi kết quả thay vì ngủ: thông điệp 'goal' được nhận ngay khi tới.
+            try:
+                message = results.get(timeout=POLL_INTERVAL)
+                if message[0] == 'goal' and (goal is None or message[1] < goal[0]):
+                    goal = (message[1], message[2])
+                continue
+            except queue.Empty:
+                pass
+            if stats is not None and stats.progress_callback is not None:
+                stats.progress_callback(stats)
+            snapshot = (all(idle[:]), sum(sent[:]), sum(received[:]))
+            if snapshot[0] and snapshot[1] == snapshot[2]:
+                if snapshot == previous:
+                    break
+                previous = snapshot
+            else:
+                previous = None
+
+        # Lấy nốt các thông điệp 'goal' còn trong hàng đợi rồi dựng đường đi bằng cách hỏi cha từng bước.
+        while True:
+            try:
+                message = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                break
+            if message[0] == 'goal' and (goal is None or message[1] < goal[0]):
+                goal = (message[1], message[2])
+        actions: Optional[List[Action]] = None
+        if goal is not None:
+            actions = []
+            key = goal[1]
+            while key != start_key:
+                inboxes[_owner(key, workers)].put(('parent', key))
+                message = results.get()
+                while message[0] != 'parent':
+                    pending.append(message)
+                    message = results.get()
+                parent, action, _ = message[2]
+                actions.append(action)
+                key = parent
+            actions.reverse()
+    finally:
+        for inbox in inboxes:
+            inbox.put(('stop',))
+        reported = [m for m in pending if m[0] == 'stats']
+        deadline = time.perf_counter() + 5
+        while len(reported) < workers and time.perf_counter() < deadline:
+            try:
+                message = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if message[0] == 'stats':
+                reported.append(message)
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        if stats is not None:
+            stats.nodes_expanded += sum(m[2] for m in reported)
+            stats.nodes_generated += sum(m[3] for m in reported)
+    return actions
@@ -0,0 +1,258 @@
+"""
+Bộ mô phỏng nhanh để chấm và kiểm tra hàng loạt chuỗi hành động / chương trình của học sinh.
+
+`Simulator` biên dịch `GameWorld` một lần thành bảng bước `step_table[pose * NUM_CODES + mã hành động]` -> pose kế
+tiếp (hoặc -1 nếu hành động không hợp lệ), đã gồm luật quay, di chuyển, nhảy, cổng dịch chuyển và việc đứng yên của
+'collect'/'toggleSwitch'. Luật giống hệt `get_successors`: chạy tới hành động không hợp lệ đầu tiên thì dừng.
+
+Có hai chế độ chạy lô: vòng lặp Python thuần trên bảng bước, và chế độ NumPy (nếu cài đặt) đưa mọi chuỗi vào một
+ma trận mã hành động rồi bước đồng thời tất cả các chuỗi theo từng cột.
+
+Cách dùng:
+    simulator = Simulator(world)
+    result = simulator.run(program_or_actions)        # SimulationResult
+    results = simulator.run_batch(sequences)          # dùng NumPy khi có
+    python programSimulator.py level.json --random 100000 --length 40
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn; không có thì chạy lô bằng vòng lặp Python.
+    np = None
+
+from gameSolver import NO_CELL, SEARCH_ACTIONS, Action, GameState, GameWorld, expand_program, solve_level
+
+# Mã hành động: chỉ số trong SEARCH_ACTIONS; tên lạ nhận mã INVALID_CODE (luôn không hợp lệ).
+INVALID_CODE = len(SEARCH_ACTIONS)
+
+
+class _ActionCodes(dict):
+    def __missing__(self, action: Any) -> int:
+        return INVALID_CODE
+
+
+ACTION_CODES: Dict[Action, int] = _ActionCodes((action, code) for code, action in enumerate(SEARCH_ACTIONS))
+NUM_CODES = INVALID_CODE + 1
+COLLECT_CODE = ACTION_CODES['collect']
+TOGGLE_CODE = ACTION_CODES['toggleSwitch']
+# Đệm cuối các chuỗi ngắn trong ma trận (uint8) của chế độ NumPy.
+PAD_CODE = 0xFF
+# Bitmask vật phẩm của chế độ NumPy nằm trong int64.
+NUMPY_MAX_COLLECTIBLES = 62
+
+Program = Union[Dict[str, Any], Sequence[Action]]
+
+
+class SimulationResult:
+    """Kết quả chạy một chuỗi: `failed_step` là chỉ số hành động không hợp lệ đầu tiên (None nếu chạy hết)."""
+    __slots__ = ('reached_finish', 'collected', 'failed_step', 'steps', 'valid', 'pose', 'collected_mask', 'switches')
+
+    def __init__(self, reached_finish: bool, collected: int, failed_step: Optional[int], steps: int, valid: bool,
+                 pose: int, collected_mask: int, switches: int):
+        self.reached_finish = reached_finish
+        self.collected = collected
+        self.failed_step = failed_step
+        self.steps = steps
+        self.valid = valid
+        self.pose = pose
+        self.collected_mask = collected_mask
+        self.switches = switches
+
+    @property
+    def state(self) -> GameState:
+        return GameState(self.pose, self.collected_mask, self.switches)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'valid': self.valid, 'reached_finish': self.reached_finish, 'collected': self.collected,
+                'failed_step': self.failed_step, 'steps': self.steps}
+
+
+class Simulator:
+    """Chạy chuỗi hành động trên một `GameWorld` đã biên dịch (không sửa world)."""
+
+    def __init__(self, world: GameWorld):
+        self.world = world
+        num_cells = len(world.grid)
+        self.step_table = array('i', [-1]) * (num_cells * 4 * NUM_CODES)
+        self.collect_bits = array('q', bytes(8 * num_cells))
+        self.toggle_bits = array('q', bytes(8 * num_cells))
+        for cell, bit in world.collectible_bits.items():
+            self.collect_bits[cell] = bit
+        for cell, bit in world.switch_bits.items():
+            self.toggle_bits[cell] = bit
+        for cell in world.standable_cells:
+            for direction in range(4):
+                pose = (cell << 2) | direction
+                row = pose * NUM_CODES
+                for action in ('moveForward', 'jump'):
+                    dest = world.transitions[pose * 2 + (action == 'jump')]
+                    if dest != NO_CELL:
+                        self.step_table[row + ACTION_CODES[action]] = \
+                            (dest << 2) | world.arrival_direction(dest, direction)
+                self.step_table[row + ACTION_CODES['turnLeft']] = (cell << 2) | ((direction + 3) & 3)
+                self.step_table[row + ACTION_CODES['turnRight']] = (cell << 2) | ((direction + 1) & 3)
+                if self.collect_bits[cell]:
+                    self.step_table[row + COLLECT_CODE] = pose
+                if self.toggle_bits[cell]:
+                    self.step_table[row + TOGGLE_CODE] = pose
+        self.start = GameState.initial(world)
+        finish = world.finish_pos
+        self.finish_cell = world.cell_index(finish['x'], finish['y'], finish['z'])
+        self._arrays = None
+
+    @staticmethod
+    def encode(program: Program) -> bytes:
+        """Chuỗi mã hành động của một chương trình (dict, được trải phẳng bằng `expand_program`) hoặc danh sách."""
+        actions = expand_program(program) if isinstance(program, dict) else program
+        return bytes(map(ACTION_CODES.__getitem__, actions))
+
+    def _result(self, pose: int, collected: int, switches: int, failed_step: Optional[int], steps: int):
+        world = self.world
+        reached = pose >> 2 == self.finish_cell
+        return SimulationResult(reached, bin(collected).count('1'), failed_step, steps,
+                                failed_step is None and reached and collected == world.all_collected_mask,
+                                pose, collected, switches)
+
+    def run_codes(self, codes: Sequence[int]) -> SimulationResult:
+        step_table, collect_bits, toggle_bits = self.step_table, self.collect_bits, self.toggle_bits
+        pose, collected, switches = self.start.pose, self.start.collected, self.start.switches
+        for step, code in enumerate(codes):
+            nxt = step_table[pose * NUM_CODES + code]
+            if nxt < 0:
+                return self._result(pose, collected, switches, step, step)
+            if code == COLLECT_CODE:
+                bit = collect_bits[pose >> 2]
+                if collected & bit:
+                    return self._result(pose, collected, switches, step, step)
+                collected |= bit
+            elif code == TOGGLE_CODE:
+                switches ^= toggle_bits[pose >> 2]
+            pose = nxt
+        return self._result(pose, collected, switches, None, len(codes))
+
+    def run(self, program: Program) -> SimulationResult:
+        return self.run_codes(self.encode(program))
+
+    def run_batch(self, programs: Sequence[Program], vectorized: Optional[bool] = None) -> List[SimulationResult]:
+        """
+        Chạy nhiều chuỗi. `vectorized=None` dùng NumPy khi có (và số vật phẩm vừa int64), True bắt buộc NumPy,
+        False luôn dùng vòng lặp Python.
+        """
+        encoded = [self.encode(program) for program in programs]
+        if vectorized is None:
+            vectorized = np is not None and len(self.world.collectible_bits) <= NUMPY_MAX_COLLECTIBLES
+        if not vectorized:
+            return [self.run_codes(codes) for codes in encoded]
+        if np is None:
+            raise RuntimeError("Chế độ vector hóa cần NumPy")
+        if len(self.world.collectible_bits) > NUMPY_MAX_COLLECTIBLES:
+            raise ValueError(f"Chế độ NumPy hỗ trợ tối đa {NUMPY_MAX_COLLECTIBLES} vật phẩm")
+        return self._run_numpy(encoded)
+
+    def _run_numpy(self, encoded: List[bytes]) -> List[SimulationResult]:
+        if self._arrays is None:
+            self._arrays = (np.frombuffer(self.step_table, dtype=np.int32),
+                            np.frombuffer(self.collect_bits, dtype=np.int64),
+                            np.frombuffer(self.toggle_bits, dtype=np.int64))
+        step_table, collect_bits, toggle_bits = self._arrays
+        count = len(encoded)
+        lengths = np.fromiter(map(len, encoded), dtype=np.int32, count=count)
+        width = int(lengths.max()) if count else 0
+        padding = bytes([PAD_CODE]) * width
+        matrix = np.frombuffer(b''.join(codes + padding[len(codes):] for codes in encoded),
+                               dtype=np.uint8).reshape(count, width)
+
+        pose = np.full(count, self.start.pose, dtype=np.int64)
+        collected = np.full(count, self.start.collected, dtype=np.int64)
+        switches = np.full(count, self.start.switches, dtype=np.int64)
+        failed = np.full(count, -1, dtype=np.int32)
+        alive = np.ones(count, dtype=bool)
+        for step in range(width):
+            codes = matrix[:, step]
+            active = alive & (codes != PAD_CODE)
+            if not active.any():
+                break
+            index = np.flatnonzero(active)
+            code = codes[index].astype(np.int64)
+            current = pose[index]
+            nxt = step_table[current * NUM_CODES + code]
+            cell = current >> 2
+            bit = np.where(code == COLLECT_CODE, collect_bits[cell], 0)
+            ok = (nxt >= 0) & ((collected[index] & bit) == 0)
+            bad = index[~ok]
+            failed[bad] = step
+            alive[bad] = False
+            good, nxt, bit, code, cell = index[ok], nxt[ok], bit[ok], code[ok], cell[ok]
+            pose[good] = nxt
+            collected[good] |= bit
+            switches[good] ^= np.where(code == TOGGLE_CODE, toggle_bits[cell], 0)
+
+        # Các cột kết quả được tính vector hóa; chỉ bước dựng đối tượng cuối cùng chạy trong Python.
+        world = self.world
+        steps = np.where(failed >= 0, failed, lengths)
+        reached = (pose >> 2) == self.finish_cell
+        counts = np.zeros(count, dtype=np.int64)
+        for i in range(len(world.collectible_bits)):
+            counts += (collected >> i) & 1
+        valid = (failed < 0) & reached & (collected == world.all_collected_mask)
+        failed_steps = [f if f >= 0 else None for f in failed.tolist()]
+        return list(map(SimulationResult, reached.tolist(), counts.tolist(), failed_steps, steps.tolist(),
+                        valid.tolist(), pose.tolist(), collected.tolist(), switches.tolist()))
+
+
+def random_sequences(world: GameWorld, count: int, length: int, seed: int = 0,
+                     base: Optional[List[Action]] = None) -> List[List[Action]]:
+    """Các chuỗi ngẫu nhiên để đo: đột biến vài hành động của `base` (nếu có), ngược lại chọn ngẫu nhiên hoàn toàn."""
+    rng = random.Random(seed)
+    sequences = []
+    for _ in range(count):
+        if base:
+            sequence = list(base)
+            for _ in range(rng.randrange(3)):
+                sequence[rng.randrange(len(sequence))] = rng.choice(SEARCH_ACTIONS)
+        else:
+            sequence = [rng.choice(SEARCH_ACTIONS) for _ in range(length)]
+        sequences.append(sequence)
+    return sequences
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Chạy hàng loạt chuỗi hành động trên một level và đo thông lượng.")
+    parser.add_argument('level', help="File JSON của level")
+    parser.add_argument('--sequences', help="File JSON: danh sách chương trình (dict) hoặc danh sách hành động")
+    parser.add_argument('--random', type=int, default=10000, help="Số chuỗi ngẫu nhiên khi không có --sequences")
+    parser.add_argument('--length', type=int, default=40, help="Độ dài chuỗi ngẫu nhiên khi level không giải được")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=('auto', 'python', 'numpy'), default='auto')
+    args = parser.parse_args(argv)
+
+    with open(args.level, 'r', encoding='utf-8') as f:
+        world = GameWorld(json.load(f))
+    if args.sequences:
+        with open(args.sequences, 'r', encoding='utf-8') as f:
+            programs = json.load(f)
+    else:
+        programs = random_sequences(world, args.random, args.length, args.seed, solve_level(world))
+    started = time.perf_counter()
+    simulator = Simulator(world)
+    compile_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    results = simulator.run_batch(programs, {'auto': None, 'python': False, 'numpy': True}[args.mode])
+    elapsed = time.perf_counter() - started
+    valid = sum(r.valid for r in results)
+    failed = sum(r.failed_step is not None for r in results)
+    print(f"Biên dịch {compile_ms:.1f} ms; {len(results)} chuỗi trong {elapsed * 1000:.1f} ms "
+          f"({len(results) / elapsed if elapsed > 0 else float('inf'):,.0f} chuỗi/giây)")
+    print(f"Hợp lệ: {valid}, hỏng giữa chừng: {failed}, tới đích: {sum(r.reached_finish for r in results)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
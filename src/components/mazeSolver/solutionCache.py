@@ -0,0 +1,186 @@
+"""
+Cache lời giải trên đĩa, định địa chỉ theo nội dung (content-addressed).
+
+Khóa là SHA-256 của phần `gameConfig` thực sự ảnh hưởng tới tìm kiếm (blocks, players, collectibles,
+interactibles, finish) đã chuẩn hóa, cộng với `SOLVER_VERSION`. Bản dịch, blocklyConfig, âm thanh... không
+làm đổi khóa. Mỗi mục là một file JSON nhỏ, được ghi nguyên tử (file tạm + `os.replace`) để nhiều worker
+dùng chung một thư mục; dung lượng bị giới hạn bằng cơ chế loại bỏ LRU theo thời điểm truy cập (mtime).
+Mỗi đối tượng cache giữ một bộ đếm dung lượng (quét thư mục một lần lúc đầu, cộng dồn theo từng lần ghi) và chỉ
+quét lại thư mục để loại bỏ khi bộ đếm vượt `max_bytes`. Bộ đếm không thấy các lần ghi của tiến trình khác cho
+tới lần quét kế tiếp, nên khi nhiều worker dùng chung thư mục, giới hạn là giới hạn mềm.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from gameSolver import SOLVER_VERSION, GameWorld, count_blocks, solve_level, synthesize_program
+
+# Các trường của gameConfig ảnh hưởng tới kết quả tìm kiếm.
+SEARCH_CONFIG_FIELDS = ('blocks', 'players', 'collectibles', 'interactibles', 'finish')
+# Trường do GameWorld tự suy ra và ghi ngược vào config, không phải dữ liệu gốc của level.
+DERIVED_FIELDS = ('targetPosition',)
+# Khoảng cách tối thiểu (giây) giữa hai lần cập nhật mtime của cùng một mục khi trúng cache trong bộ nhớ.
+TOUCH_INTERVAL = 1.0
+
+
+def _position_sort_key(item: Dict[str, Any]):
+    pos = item.get('position', {})
+    return (pos.get('x', 0), pos.get('y', 0), pos.get('z', 0))
+
+
+def level_cache_key(level_data: Dict[str, Any]) -> str:
+    """Băm chuẩn hóa các trường tìm kiếm của level (kèm phiên bản solver) thành khóa hex."""
+    config = level_data['gameConfig']
+    normalized: Dict[str, Any] = {field: config.get(field) for field in SEARCH_CONFIG_FIELDS}
+    # Sắp xếp ổn định theo vị trí: thứ tự khai báo không đổi khóa, nhưng các khối trùng vị trí giữ nguyên thứ tự.
+    normalized['blocks'] = sorted(config.get('blocks', []), key=_position_sort_key)
+    normalized['collectibles'] = sorted(config.get('collectibles', []), key=_position_sort_key)
+    normalized['interactibles'] = sorted(
+        ({k: v for k, v in i.items() if k not in DERIVED_FIELDS} for i in config.get('interactibles', [])),
+        key=lambda i: str(i.get('id')),
+    )
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f"{SOLVER_VERSION}\n{payload}".encode('utf-8')).hexdigest()
+
+
+class SolutionCache:
+    """Cache LRU trên đĩa, có thêm một lớp LRU nhỏ trong bộ nhớ để lần truy cập lặp lại không phải đọc file."""
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, memory_entries: int = 256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        # Thời điểm (time.monotonic) file của mỗi mục trong bộ nhớ được cập nhật mtime lần cuối.
+        self._touched: Dict[str, float] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            # Mục nóng chỉ được đọc từ bộ nhớ nhưng vẫn phải "mới" trên đĩa, nếu không LRU trên đĩa loại nó trước.
+            now = time.monotonic()
+            if now - self._touched.get(key, 0.0) >= TOUCH_INTERVAL:
+                self._touched[key] = now
+                try:
+                    os.utime(self._path(key))
+                except OSError:
+                    pass
+            return entry
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Cập nhật thời điểm truy cập để LRU trên đĩa biết mục này vừa được dùng.
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            # Không có, đang bị worker khác loại bỏ, hoặc hỏng: coi như trượt cache.
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix='.json')
+        try:
+            data = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            size = len(data)
+            try:
+                size -= os.stat(path).st_size
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._remember(key, entry)
+        self._total_bytes += size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        """Ghi vào LRU bộ nhớ; file của mục vừa được đọc/ghi nên cũng vừa có mtime mới."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        self._touched[key] = time.monotonic()
+        while len(self._memory) > self.memory_entries:
+            self._touched.pop(self._memory.popitem(last=False)[0], None)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """(mtime, kích thước, đường dẫn) của mọi mục trên đĩa."""
+        entries: List[Tuple[float, int, str]] = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for item in os.scandir(shard.path):
+                if item.name.startswith('.tmp-'):
+                    continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, item.path))
+        return entries
+
+    def evict(self) -> int:
+        """
+        Quét thư mục (đồng bộ lại bộ đếm dung lượng) rồi xóa các mục ít được dùng gần đây nhất cho tới khi tổng
+        dung lượng về dưới `max_bytes`. `put` chỉ gọi hàm này khi bộ đếm đã vượt giới hạn.
+        """
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total <= self.max_bytes:
+            self._total_bytes = total
+            return removed
+        for _, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            key = os.path.basename(path)[:-len('.json')]
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+            total -= size
+            removed += 1
+            if total <= self.max_bytes:
+                break
+        self._total_bytes = total
+        return removed
+
+
+def solve_with_cache(level_data: Dict[str, Any], cache: Optional[SolutionCache]) -> Dict[str, Any]:
+    """
+    Giải và tổng hợp chương trình cho level, đi qua cache nếu có.
+    Trả về {'actions', 'program', 'blocks', 'cache_hit'}; 'actions' là None nếu level không có lời giải.
+    """
+    key = level_cache_key(level_data) if cache is not None else None
+    if cache is not None:
+        entry = cache.get(key)
+        if entry is not None:
+            return dict(entry, cache_hit=True)
+
+    actions = solve_level(GameWorld(level_data))
+    program = synthesize_program(actions) if actions is not None else None
+    entry = {
+        'actions': actions,
+        'program': program,
+        'blocks': count_blocks(program) if program is not None else None,
+    }
+    if cache is not None:
+        cache.put(key, entry)
+    return dict(entry, cache_hit=False)
@@ -0,0 +1,369 @@
+"""
+Máy chủ HTTP giải Maze (asyncio, chỉ dùng thư viện chuẩn) cho React player và công cụ soạn level.
+
+Vòng lặp sự kiện chỉ phân tích HTTP và điều phối; mọi phép giải nặng CPU chạy trong một pool tiến trình có
+giới hạn. Hàng đợi có trần: khi số việc đang chờ vượt `--max-queue`, máy chủ trả 429 kèm `Retry-After`.
+Các yêu cầu giống hệt nhau (cùng phương thức, cùng khóa băm level và tham số) đang chạy được gộp làm một; nếu
+mọi client của một việc đều ngắt kết nối, việc đó bị hủy (kể cả khi đang giải trong worker).
+
+Trình duyệt (React player chạy trên origin khác) gọi được máy chủ nhờ CORS: mọi phản hồi có
+`Access-Control-Allow-Origin` theo `--allow-origin` và yêu cầu preflight `OPTIONS` được trả 204.
+
+Cách dùng:
+    python solverServer.py --port 8765 --workers 4 --max-queue 32 --allow-origin http://localhost:5173
+
+Endpoint:
+    POST /solve | /synthesize | /validate | /hint   thân JSON giống `params` của solverService
+    GET  /metrics                                    độ sâu hàng đợi, histogram độ trễ, tỉ lệ trúng cache...
+    GET  /health
+    OPTIONS (mọi endpoint trên)                      preflight CORS
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from solutionCache import level_cache_key
+from solverService import (INVALID_PARAMS, METHOD_NOT_FOUND, REQUEST_CANCELLED, REQUEST_TIMEOUT, RequestContext,
+                           RpcError, SolverService)
+
+METHODS = ('solve', 'synthesize', 'validate', 'hint')
+# Cận trên (ms) của các ngăn histogram độ trễ; ngăn cuối là +Inf.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MAX_BODY_BYTES = 8 * 1024 * 1024
+HTTP_STATUS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 429: 'Too Many Requests', 499: 'Client Closed Request', 500: 'Internal Server Error',
+               504: 'Gateway Timeout'}
+RPC_TO_HTTP = {INVALID_PARAMS: 400, METHOD_NOT_FOUND: 404, REQUEST_TIMEOUT: 504, REQUEST_CANCELLED: 499}
+# Thời gian trình duyệt được giữ kết quả preflight CORS (giây).
+CORS_MAX_AGE = 600
+
+
+# --- Phía worker (chạy trong tiến trình con) ---
+_worker_service: Optional[SolverService] = None
+
+
+def _start_worker() -> None:
+    """Khởi tạo SolverService của worker; cũng được gửi tới pool trước khi nhận kết nối để tạo sẵn mọi worker."""
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = SolverService(output=None)
+
+
+def _run_job(method: str, params: Dict[str, Any], cancel_event, timeout_ms: Optional[float]) -> Tuple:
+    """
+    Chạy một phương thức của SolverService trong worker; mỗi worker giữ cache GameWorld riêng.
+    Trả về ('ok', kết quả, trúng cache world) hoặc ('error', mã JSON-RPC, thông điệp).
+    """
+    _start_worker()
+    ctx = RequestContext(None, timeout_ms)
+    ctx.cancelled = cancel_event
+    hits = _worker_service.worlds.hits
+    try:
+        result = _worker_service.methods[method](params, ctx)
+    except RpcError as e:
+        return 'error', e.code, str(e)
+    except Exception as e:
+        return 'error', -32000, f"{type(e).__name__}: {e}"
+    return 'ok', result, _worker_service.worlds.hits > hits
+
+
+# --- Phía máy chủ ---
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def observe(self, ms: float) -> None:
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.counts[index] += 1
+        self.total_ms += ms
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets, cumulative = {}, 0
+        for bound, count in zip([str(b) for b in LATENCY_BUCKETS_MS] + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'buckets_ms': buckets, 'count': self.count, 'sum_ms': round(self.total_ms, 3),
+                'mean_ms': round(self.total_ms / self.count, 3) if self.count else None}
+
+
+class Job:
+    """Một phép giải đang chờ hoặc đang chạy trong pool, có thể được nhiều client cùng chờ."""
+    def __init__(self, key: str, future: 'asyncio.Future', cancel_event):
+        self.key, self.future, self.cancel_event = key, future, cancel_event
+        self.subscribers = 0
+
+
+class SolverServer:
+    def __init__(self, workers: int = 2, max_queue: int = 32, result_cache_size: int = 256,
+                 default_timeout_ms: Optional[float] = 30000, allow_origin: str = '*'):
+        self.workers = max(1, workers)
+        # '*' hoặc danh sách origin ngăn cách bởi dấu phẩy; với danh sách, origin của yêu cầu được lặp lại nếu khớp.
+        self.allow_origins = [o.strip() for o in allow_origin.split(',') if o.strip()]
+        self.max_queue = max_queue
+        self.default_timeout_ms = default_timeout_ms
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.manager = multiprocessing.Manager()
+        self.jobs: Dict[str, Job] = {}
+        self.results: 'OrderedDict[str, Tuple]' = OrderedDict()
+        self.result_cache_size = result_cache_size
+        self.started = time.perf_counter()
+        self.latency = {method: LatencyHistogram() for method in METHODS}
+        self.counters = {'requests': 0, 'rejected_429': 0, 'deduplicated': 0, 'cancelled': 0,
+                         'result_cache_hits': 0, 'result_cache_misses': 0,
+                         'world_cache_hits': 0, 'world_cache_misses': 0}
+        self.status_counts: Dict[int, int] = {}
+
+    @staticmethod
+    def job_key(method: str, params: Dict[str, Any]) -> str:
+        """Khóa gộp yêu cầu: phương thức + khóa băm level + các tham số còn lại (trừ timeout)."""
+        rest = {k: v for k, v in params.items() if k not in ('level', 'timeout_ms')}
+        level_hash = level_cache_key(params['level']) if isinstance(params.get('level'), dict) else None
+        payload = json.dumps([method, level_hash, rest], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def queue_depth(self) -> int:
+        """Số việc đã nhận nhưng chưa có worker rảnh để chạy."""
+        return max(0, len(self.jobs) - self.workers)
+
+    def metrics(self) -> Dict[str, Any]:
+        c = self.counters
+        result_lookups = c['result_cache_hits'] + c['result_cache_misses']
+        world_lookups = c['world_cache_hits'] + c['world_cache_misses']
+        return {
+            'uptime_s': round(time.perf_counter() - self.started, 3),
+            'workers': self.workers,
+            'queue_depth': self.queue_depth,
+            'queue_limit': self.max_queue,
+            'in_flight_jobs': len(self.jobs),
+            'counters': dict(c),
+            'status_codes': {str(k): v for k, v in sorted(self.status_counts.items())},
+            'result_cache_hit_rate': round(c['result_cache_hits'] / result_lookups, 4) if result_lookups else None,
+            'world_cache_hit_rate': round(c['world_cache_hits'] / world_lookups, 4) if world_lookups else None,
+            'latency': {method: hist.to_dict() for method, hist in self.latency.items()},
+        }
+
+    def _finish_job(self, job: Job, future: 'asyncio.Future') -> None:
+        # Việc bị hủy có thể kết thúc sau khi một việc mới cùng khóa đã thế chỗ: chỉ gỡ khi vẫn là chính nó.
+        if self.jobs.get(job.key) is job:
+            del self.jobs[job.key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        outcome = future.result()
+        if outcome[0] == 'ok':
+            self.counters['world_cache_hits' if outcome[2] else 'world_cache_misses'] += 1
+            self.results[job.key] = outcome
+            while len(self.results) > self.result_cache_size:
+                self.results.popitem(last=False)
+
+    async def run_method(self, method: str, params: Dict[str, Any],
+                         disconnected: 'asyncio.Future') -> Tuple[int, Dict[str, Any]]:
+        """Trả về (mã HTTP, thân JSON); gộp với việc đang chạy nếu có, hủy việc khi không còn ai chờ."""
+        if 'level' not in params and 'level_hash' in params:
+            # level_hash chỉ có nghĩa với cache của một tiến trình; ở đây mỗi worker có cache riêng.
+            return 400, {'error': {'code': INVALID_PARAMS, 'message': "Máy chủ HTTP cần 'level' đầy đủ"}}
+        try:
+            key = self.job_key(method, params)
+        except (KeyError, TypeError) as e:
+            return 400, {'error': {'code': INVALID_PARAMS, 'message': f"Level không hợp lệ: {e}"}}
+        cached = self.results.get(key)
+        if cached is not None:
+            self.results.move_to_end(key)
+            self.counters['result_cache_hits'] += 1
+            return 200, {'result': cached[1], 'cache_hit': True}
+        self.counters['result_cache_misses'] += 1
+
+        job = self.jobs.get(key)
+        if job is None:
+            if self.queue_depth >= self.max_queue:
+                self.counters['rejected_429'] += 1
+                return 429, {'error': {'code': 429, 'message': "Hàng đợi đã đầy, hãy thử lại sau"}}
+            loop = asyncio.get_running_loop()
+            cancel_event = self.manager.Event()
+            timeout_ms = params.get('timeout_ms', self.default_timeout_ms)
+            future = loop.run_in_executor(self.pool, _run_job, method, params, cancel_event, timeout_ms)
+            job = Job(key, future, cancel_event)
+            self.jobs[key] = job
+            future.add_done_callback(lambda f, job=job: self._finish_job(job, f))
+        else:
+            self.counters['deduplicated'] += 1
+
+        job.subscribers += 1
+        try:
+            await asyncio.wait({job.future, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            job.subscribers -= 1
+        if not job.future.done():
+            # Client đã bỏ đi; nếu không còn ai chờ việc này thì hủy nó (trong hàng đợi hoặc đang chạy).
+            self.counters['cancelled'] += 1
+            if job.subscribers == 0:
+                job.future.cancel()
+                job.cancel_event.set()
+                self.jobs.pop(key, None)
+            return 499, {'error': {'code': REQUEST_CANCELLED, 'message': "Client đã ngắt kết nối"}}
+        if job.future.cancelled():
+            return 499, {'error': {'code': REQUEST_CANCELLED, 'message': "Việc đã bị hủy"}}
+        outcome = job.future.result()
+        if outcome[0] == 'ok':
+            return 200, {'result': outcome[1], 'cache_hit': False}
+        return RPC_TO_HTTP.get(outcome[1], 500), {'error': {'code': outcome[1], 'message': outcome[2]}}
+
+    # --- HTTP ---
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        started = time.perf_counter()
+        method_name: Optional[str] = None
+        origin: Optional[str] = None
+        try:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode('latin-1').split('\r\n')
+            parts = lines[0].split(' ')
+            if len(parts) != 3:
+                await self._send(writer, 400, {'error': {'code': 400, 'message': "Dòng yêu cầu không hợp lệ"}})
+                return
+            verb, path = parts[0], parts[1].split('?', 1)[0]
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            self.counters['requests'] += 1
+            origin = headers.get('origin')
+
+            if verb == 'OPTIONS' and (path in ('/metrics', '/health') or path.strip('/') in METHODS):
+                allowed = 'GET, OPTIONS' if path in ('/metrics', '/health') else 'POST, OPTIONS'
+                await self._send(writer, 204, None, origin, {
+                    'Access-Control-Allow-Methods': allowed,
+                    'Access-Control-Allow-Headers': headers.get('access-control-request-headers', 'Content-Type'),
+                    'Access-Control-Max-Age': str(CORS_MAX_AGE),
+                })
+                return
+            if path in ('/metrics', '/health'):
+                if verb != 'GET':
+                    await self._send(writer, 405, {'error': {'code': 405, 'message': "Chỉ hỗ trợ GET"}}, origin)
+                else:
+                    await self._send(writer, 200, self.metrics() if path == '/metrics' else {'status': 'ok'}, origin)
+                return
+            method_name = path.strip('/')
+            if method_name not in METHODS:
+                await self._send(writer, 404, {'error': {'code': 404, 'message': f"Không có endpoint '{path}'"}},
+                                 origin)
+                return
+            if verb != 'POST':
+                await self._send(writer, 405, {'error': {'code': 405, 'message': "Chỉ hỗ trợ POST"}}, origin)
+                return
+            length = int(headers.get('content-length', '0') or 0)
+            if length > MAX_BODY_BYTES:
+                await self._send(writer, 413, {'error': {'code': 413, 'message': "Thân yêu cầu quá lớn"}}, origin)
+                return
+            try:
+                params = json.loads(await reader.readexactly(length)) if length else {}
+            except asyncio.IncompleteReadError:
+                return
+            except json.JSONDecodeError as e:
+                await self._send(writer, 400, {'error': {'code': -32700, 'message': str(e)}}, origin)
+                return
+            if not isinstance(params, dict):
+                await self._send(writer, 400,
+                                 {'error': {'code': INVALID_PARAMS, 'message': "Thân phải là object JSON"}}, origin)
+                return
+
+            # Client gửi xong yêu cầu (Connection: close); đọc được EOF nghĩa là client đã bỏ đi.
+            disconnected = asyncio.ensure_future(reader.read(1))
+            try:
+                status, body = await self.run_method(method_name, params, disconnected)
+            finally:
+                disconnected.cancel()
+            if status != 499:
+                await self._send(writer, status, body, origin)
+            else:
+                self.status_counts[499] = self.status_counts.get(499, 0) + 1
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if method_name in self.latency:
+                self.latency[method_name].observe((time.perf_counter() - started) * 1000)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def cors_headers(self, origin: Optional[str]) -> Dict[str, str]:
+        """Header CORS cho một phản hồi; rỗng khi origin của yêu cầu không được phép."""
+        if '*' in self.allow_origins:
+            return {'Access-Control-Allow-Origin': '*'}
+        if origin is not None and origin in self.allow_origins:
+            return {'Access-Control-Allow-Origin': origin, 'Vary': 'Origin'}
+        return {}
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: Optional[Dict[str, Any]],
+                    origin: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> None:
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+        extra = dict(self.cors_headers(origin), **(headers or {}))
+        if status == 429:
+            extra['Retry-After'] = '1'
+        if body is not None:
+            extra['Content-Type'] = 'application/json; charset=utf-8'
+        head = (f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+                + ''.join(f"{name}: {value}\r\n" for name, value in extra.items())
+                + f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        """
+        Tạo sẵn mọi worker của pool rồi mới nhận kết nối: worker được fork lười ở yêu cầu đầu tiên sẽ thừa hưởng
+        socket của client đang mở, khiến client đọc tới EOF bị treo.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _start_worker) for _ in range(self.workers)))
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await self.start(host, port)
+        print(f"Máy chủ giải Maze đang chạy tại http://{host}:{port} ({self.workers} worker)", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Máy chủ HTTP giải Maze với pool tiến trình.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--max-queue', type=int, default=32, help="Số việc chờ tối đa trước khi trả 429")
+    parser.add_argument('--timeout-ms', type=float, default=30000, help="Thời gian tối đa mặc định cho mỗi việc")
+    parser.add_argument('--allow-origin', default='*',
+                        help="Origin được gọi từ trình duyệt (CORS): '*' hoặc danh sách ngăn cách bởi dấu phẩy")
+    args = parser.parse_args(argv)
+    server = SolverServer(args.workers, args.max_queue, default_timeout_ms=args.timeout_ms,
+                          allow_origin=args.allow_origin)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+Dịch vụ giải Maze chạy lâu dài: đọc yêu cầu JSON-RPC 2.0 theo dòng (NDJSON) từ stdin, ghi phản hồi ra stdout.
+
+Tiến trình giữ các `GameWorld` đã biên dịch (kèm trường khoảng cách của heuristic) trong một cache LRU theo
+khóa băm của level, nên các yêu cầu lặp lại trên cùng level không phải tải và biên dịch lại. Mỗi yêu cầu có
+`id`, có thể đặt `timeout_ms` và bị hủy bằng phương thức `cancel`; phản hồi có thể về không theo thứ tự gửi.
+
+Cách dùng:
+    python solverService.py --workers 2 --cache-size 64
+
+Phương thức:
+    solve       {level | level_hash, timeout_ms?, heuristic?, engine?}   -> {level_hash, actions, length, nodes_expanded}
+    synthesize  {level | level_hash | actions, compression?, timeout_ms?} -> {program, blocks, actions}
+    validate    {level | level_hash, actions | program}                  -> {valid, reached_finish, collected, failed_step, ...}
+                {level | level_hash, sequences}                          -> {results: [{valid, reached_finish, ...}]}
+    hint        {level | level_hash, actions?, timeout_ms?}              -> {next_action, remaining, plan, source}
+    cancel      {target}                                                 -> {cancelled}
+    stats       {}                                                       -> bộ đếm yêu cầu, tỉ lệ trúng cache, số yêu cầu/giây
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gameSolver import (COMPRESSION_MODES, HEURISTIC_MODES, SEARCH_ENGINES, GameState, GameWorld, SearchStats,
+                        check_reachability, count_blocks, expand_program, get_successors, solve_level,
+                        synthesize_program)
+from hintTable import HintTable, build_hint_table
+from programSimulator import Simulator
+from solutionCache import level_cache_key
+
+# Mã lỗi JSON-RPC 2.0 chuẩn và mã riêng của dịch vụ (dải -32000..-32099).
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SOLVER_ERROR = -32000
+REQUEST_TIMEOUT = -32001
+REQUEST_CANCELLED = -32002
+# Số lần mở rộng nút giữa hai lần kiểm tra hết giờ / bị hủy.
+CHECK_INTERVAL = 256
+
+
+class RpcError(Exception):
+    """Lỗi trả về cho client dưới dạng đối tượng `error` của JSON-RPC."""
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class RequestContext:
+    """Trạng thái của một yêu cầu đang chạy: hạn chót và cờ hủy, được kiểm tra định kỳ trong vòng lặp tìm kiếm."""
+    def __init__(self, request_id: Any, timeout_ms: Optional[float]):
+        self.request_id = request_id
+        self.deadline = time.perf_counter() + timeout_ms / 1000.0 if timeout_ms else None
+        self.cancelled = threading.Event()
+
+    def check(self, *_: Any) -> None:
+        if self.cancelled.is_set():
+            raise RpcError(REQUEST_CANCELLED, "Yêu cầu đã bị hủy")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise RpcError(REQUEST_TIMEOUT, "Hết thời gian xử lý yêu cầu")
+
+    def stats(self) -> SearchStats:
+        return SearchStats(progress_callback=self.check, progress_interval=CHECK_INTERVAL)
+
+
+class WorldCache:
+    """LRU các GameWorld đã biên dịch theo khóa băm level (an toàn khi dùng từ nhiều luồng)."""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: 'OrderedDict[str, GameWorld]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, params: Dict[str, Any]) -> Tuple[str, GameWorld]:
+        level = params.get('level')
+        if level is not None:
+            if not isinstance(level, dict) or 'players' not in level.get('gameConfig', {}):
+                raise RpcError(INVALID_PARAMS, "'level' phải là level Maze 3D (gameConfig có 'players')")
+            key = level_cache_key(level)
+        elif 'level_hash' in params:
+            key = params['level_hash']
+        else:
+            raise RpcError(INVALID_PARAMS, "Thiếu 'level' hoặc 'level_hash'")
+        with self._lock:
+            world = self._entries.get(key)
+            if world is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, world
+            self.misses += 1
+        if level is None:
+            raise RpcError(INVALID_PARAMS, f"level_hash '{key}' không có trong cache, hãy gửi lại 'level'")
+        world = GameWorld(level)
+        with self._lock:
+            self._entries[key] = world
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return key, world
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+
+def _choice(params: Dict[str, Any], name: str, choices, default: str) -> str:
+    value = params.get(name, default)
+    if value not in choices:
+        raise RpcError(INVALID_PARAMS, f"'{name}' phải là một trong {list(choices)}")
+    return value
+
+
+def _action_list(params: Dict[str, Any]) -> Optional[List[str]]:
+    """`params['actions']` (None nếu không có); phải là danh sách tên hành động."""
+    actions = params.get('actions')
+    if actions is not None and not (isinstance(actions, list) and all(isinstance(a, str) for a in actions)):
+        raise RpcError(INVALID_PARAMS, "'actions' phải là danh sách hành động (chuỗi)")
+    return actions
+
+
+def _run_actions(world: GameWorld, actions: List[str]) -> Dict[str, Any]:
+    """Chạy chuỗi hành động từ trạng thái đầu; dừng ở hành động không hợp lệ đầu tiên."""
+    state = GameState.initial(world)
+    failed_step: Optional[int] = None
+    for step, action in enumerate(actions):
+        next_state = next((s for a, s in get_successors(world, state) if a == action), None)
+        if next_state is None:
+            failed_step = step
+            break
+        state = next_state
+    finish_cell = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    collected = bin(state.collected).count('1')
+    reached = state.pose >> 2 == finish_cell
+    return {
+        'state': state,
+        'valid': failed_step is None and reached and state.collected == world.all_collected_mask,
+        'reached_finish': reached,
+        'collected': collected,
+        'total_collectibles': bin(world.all_collected_mask).count('1'),
+        'failed_step': failed_step,
+        'failed_action': actions[failed_step] if failed_step is not None else None,
+    }
+
+
+class SolverService:
+    """Bộ điều phối yêu cầu: phân tích JSON-RPC, chạy phương thức trên pool luồng và ghi phản hồi."""
+    def __init__(self, output=sys.stdout, workers: int = 1, cache_size: int = 64):
+        self.output = output
+        self.worlds = WorldCache(cache_size)
+        # Bảng gợi ý và bộ mô phỏng theo khóa level, dựng ở lần dùng đầu tiên (LRU cùng dung lượng với cache world).
+        self.hint_tables: 'OrderedDict[str, HintTable]' = OrderedDict()
+        self.simulators: 'OrderedDict[str, Simulator]' = OrderedDict()
+        self.artifact_capacity = cache_size
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.in_flight: Dict[Any, RequestContext] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.completed = 0
+        self.failed = 0
+        self.methods: Dict[str, Callable[[Dict[str, Any], RequestContext], Dict[str, Any]]] = {
+            'solve': self.solve, 'synthesize': self.synthesize, 'validate': self.validate, 'hint': self.hint,
+        }
+
+    # --- Phương thức ---
+    def solve(self, params: Dict[str, Any], ctx: RequestContext) -> Dict[str, Any]:
+        key, world = self.worlds.get(params)
+        stats = ctx.stats()
+        actions = solve_level(world, _choice(params, 'heuristic', HEURISTIC_MODES, 'admissible'), stats,
+                              _choice(params, 'engine', SEARCH_ENGINES, 'astar'))
+        result = {'level_hash': key, 'actions': actions, 'length': len(actions) if actions is not None else None,
+                  'nodes_expanded': stats.nodes_expanded}
+        if actions is None:
+            result['diagnostic'] = check_reachability(world, stats=stats).to_dict()
+        return result
+
+    def synthesize(self, params: Dict[str, Any], ctx: RequestContext) -> Dict[str, Any]:
+        compression = _choice(params, 'compression', COMPRESSION_MODES, 'greedy')
+        actions = _action_list(params)
+        if actions is None:
+            actions = self.solve(params, ctx)['actions']
+            if actions is None:
+                return {'program': None, 'blocks': None, 'actions': None}
+        program = synthesize_program(actions, ctx.stats(), compression)
+        return {'program': program, 'blocks': count_blocks(program), 'actions': actions}
+
+    def validate(self, params: Dict[str, Any], ctx: RequestContext) -> Dict[str, Any]:
+        key, world = self.worlds.get(params)
+        if 'sequences' in params:
+            if not isinstance(params['sequences'], list):
+                raise RpcError(INVALID_PARAMS, "'sequences' phải là danh sách chương trình hoặc chuỗi hành động")
+            simulator = self._cached(self.simulators, key, lambda: Simulator(world))
+            try:
+                results = simulator.run_batch(params['sequences'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise RpcError(INVALID_PARAMS, f"Chương trình không hợp lệ: {e}")
+            return {'results': [result.to_dict() for result in results]}
+        if 'program' in params:
+            try:
+                actions = expand_program(params['program'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise RpcError(INVALID_PARAMS, f"Chương trình không hợp lệ: {e}")
+        elif params.get('actions') is not None:
+            actions = _action_list(params)
+        else:
+            raise RpcError(INVALID_PARAMS, "Thiếu 'actions' hoặc 'program'")
+        result = _run_actions(world, actions)
+        result.pop('state')
+        result['length'] = len(actions)
+        return result
+
+    def hint(self, params: Dict[str, Any], ctx: RequestContext) -> Dict[str, Any]:
+        """
+        Hành động tiếp theo tối ưu sau khi người chơi đã thực hiện `actions` (mặc định: chưa làm gì). Tra bảng
+        gợi ý của level (`source: 'table'`); trạng thái nằm ngoài bảng giới hạn thì giải lại (`source: 'search'`).
+        """
+        key, world = self.worlds.get(params)
+        done = _run_actions(world, _action_list(params) or [])
+        if done['failed_step'] is not None:
+            return {'next_action': None, 'remaining': None, 'plan': None,
+                    'failed_step': done['failed_step'], 'failed_action': done['failed_action']}
+        table = self._cached(self.hint_tables, key, lambda: build_hint_table(world, stats=ctx.stats()))
+        plan = table.plan(done['state'])
+        source = 'table'
+        if plan is None and (table.bounded or table.cost(done['state']) is not None):
+            plan = solve_level(world, stats=ctx.stats(), start=done['state'])
+            source = 'search'
+        if plan is None:
+            return {'next_action': None, 'remaining': None, 'plan': None, 'failed_step': None}
+        return {'next_action': plan[0] if plan else None, 'remaining': len(plan), 'plan': plan, 'failed_step': None,
+                'source': source}
+
+    def _cached(self, cache: 'OrderedDict[str, Any]', key: str, build: Callable[[], Any]) -> Any:
+        """Lấy (hoặc dựng rồi lưu) dữ liệu tính sẵn của một level trong cache LRU `cache`."""
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+                return value
+        value = build()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.artifact_capacity:
+                cache.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.perf_counter() - self.started
+        lookups = self.worlds.hits + self.worlds.misses
+        return {
+            'uptime_s': round(uptime, 3),
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': len(self.in_flight),
+            'requests_per_second': round(self.completed / uptime, 2) if uptime > 0 else None,
+            'cache_size': self.worlds.size,
+            'cache_hit_rate': round(self.worlds.hits / lookups, 4) if lookups else None,
+        }
+
+    # --- Điều phối ---
+    def _write(self, response: Dict[str, Any]) -> None:
+        line = json.dumps(response, ensure_ascii=False)
+        with self._write_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def _respond(self, request_id: Any, result: Any = None, error: Optional[RpcError] = None) -> None:
+        if request_id is None:
+            return  # Notification: không có phản hồi.
+        response: Dict[str, Any] = {'jsonrpc': '2.0', 'id': request_id}
+        if error is not None:
+            response['error'] = {'code': error.code, 'message': str(error)}
+        else:
+            response['result'] = result
+        self._write(response)
+
+    def _execute(self, method: Callable, params: Dict[str, Any], ctx: RequestContext) -> None:
+        try:
+            ctx.check()
+            result = method(params, ctx)
+            with self._lock:
+                self.completed += 1
+            self._respond(ctx.request_id, result)
+        except RpcError as e:
+            with self._lock:
+                self.failed += 1
+            self._respond(ctx.request_id, error=e)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            self._respond(ctx.request_id, error=RpcError(SOLVER_ERROR, f"{type(e).__name__}: {e}"))
+        finally:
+            with self._lock:
+                if self.in_flight.get(ctx.request_id) is ctx:
+                    del self.in_flight[ctx.request_id]
+
+    def handle_line(self, line: str) -> None:
+        """Xử lý một dòng yêu cầu; `cancel` và `stats` được trả lời ngay, các phương thức khác chạy trên pool."""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            self._write({'jsonrpc': '2.0', 'id': None, 'error': {'code': PARSE_ERROR, 'message': str(e)}})
+            return
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            self._write({'jsonrpc': '2.0', 'id': None,
+                         'error': {'code': INVALID_REQUEST, 'message': "Yêu cầu phải là object có 'method'"}})
+            return
+        request_id, method_name = request.get('id'), request['method']
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            self._respond(request_id, error=RpcError(INVALID_PARAMS, "'params' phải là object"))
+            return
+
+        if method_name == 'cancel':
+            with self._lock:
+                target = self.in_flight.get(params.get('target'))
+            if target is not None:
+                target.cancelled.set()
+            self._respond(request_id, {'cancelled': target is not None})
+            return
+        if method_name == 'stats':
+            self._respond(request_id, self.stats())
+            return
+        method = self.methods.get(method_name)
+        if method is None:
+            self._respond(request_id, error=RpcError(METHOD_NOT_FOUND, f"Không có phương thức '{method_name}'"))
+            return
+        timeout_ms = params.get('timeout_ms')
+        if timeout_ms is not None and (not isinstance(timeout_ms, (int, float)) or timeout_ms <= 0):
+            self._respond(request_id, error=RpcError(INVALID_PARAMS, "'timeout_ms' phải là số dương"))
+            return
+        ctx = RequestContext(request_id, timeout_ms)
+        if request_id is not None:
+            with self._lock:
+                self.in_flight[request_id] = ctx
+        self.executor.submit(self._execute, method, params, ctx)
+
+    def serve(self, stream=sys.stdin) -> None:
+        try:
+            for line in stream:
+                if line.strip():
+                    self.handle_line(line)
+        finally:
+            # Hết stdin: chờ các yêu cầu đang chạy xong rồi mới thoát.
+            self.executor.shutdown(wait=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dịch vụ giải Maze qua JSON-RPC trên stdin/stdout (mỗi dòng một yêu cầu).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Số luồng xử lý yêu cầu (cho phép hủy / hết giờ khi đang giải; không tăng song song CPU)")
+    parser.add_argument('--cache-size', type=int, default=64, help="Số level đã biên dịch giữ trong cache LRU")
+    args = parser.parse_args(argv)
+    SolverService(sys.stdout, args.workers, args.cache_size).serve(sys.stdin)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Các module của solver import lẫn nhau theo tên phẳng (`from gameSolver import ...`), nên thêm thư mục cha vào sys.path."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+"""A* với hàng đợi ưu tiên phải cho lời giải ngắn nhất (so với BFS thuần) và tất định trên các quest có sẵn."""
+import glob
+import json
+import os
+from collections import deque
+
+import pytest
+
+from gameSolver import GameState, GameWorld, get_successors, solve_level
+from levelGenerator import generate_level
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTS = sorted(glob.glob(os.path.join(HERE, 'maze-3d-*.json')) +
+                glob.glob(os.path.join(HERE, '..', '..', '..', 'public', 'quests', 'maze-3d-*.json')))
+
+
+def _is_goal(world, state):
+    finish = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    return state.pose >> 2 == finish and state.collected == world.all_collected_mask
+
+
+def _bfs_length(world):
+    start = GameState.initial(world)
+    depth = {start.get_key(): 0}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        if _is_goal(world, state):
+            return depth[state.get_key()]
+        for _, next_state in get_successors(world, state):
+            if next_state.get_key() not in depth:
+                depth[next_state.get_key()] = depth[state.get_key()] + 1
+                queue.append(next_state)
+    return None
+
+
+def _replay(world, actions):
+    state = GameState.initial(world)
+    for action in actions:
+        state = dict(get_successors(world, state))[action]
+    return state
+
+
+def _levels():
+    for path in QUESTS:
+        with open(path) as f:
+            level = json.load(f)
+        if 'players' in level.get('gameConfig', {}):  # Bỏ qua quest định dạng cũ mà GameWorld không đọc.
+            yield os.path.basename(path), level
+    for seed in (1, 2, 3):
+        yield f'generated-{seed}', generate_level(seed, width=8, depth=8, num_collectibles=2 + seed % 2)
+
+
+@pytest.mark.parametrize('name,level', list(_levels()), ids=lambda value: value if isinstance(value, str) else '')
+def test_astar_is_optimal_and_deterministic(name, level):
+    actions = solve_level(GameWorld(level))
+    assert actions is not None
+    assert len(actions) == _bfs_length(GameWorld(level))
+    assert _is_goal(GameWorld(level), _replay(GameWorld(level), actions))
+    assert solve_level(GameWorld(level)) == actions
@@ -0,0 +1,35 @@
+"""`--timeout` phải có hiệu lực cả khi không dùng được SIGALRM (Windows, hoặc gọi ngoài luồng chính)."""
+import json
+import signal
+import threading
+
+import pytest
+
+from batchSolver import solve_quest_file
+from levelGenerator import generate_level
+
+
+@pytest.fixture
+def quest(tmp_path):
+    path = tmp_path / 'level.json'
+    path.write_text(json.dumps(generate_level(1, width=30, depth=30, height_variation=2, num_collectibles=6)))
+    return str(path)
+
+
+def test_timeout_without_sigalrm(quest, monkeypatch):
+    monkeypatch.delattr(signal, 'SIGALRM', raising=False)
+    assert solve_quest_file((quest, 1e-6, False, None))['status'] == 'timeout'
+
+
+def test_timeout_outside_main_thread(quest):
+    rows = []
+    thread = threading.Thread(target=lambda: rows.append(solve_quest_file((quest, 1e-6, False, None))))
+    thread.start()
+    thread.join()
+    assert rows[0]['status'] == 'timeout'
+
+
+def test_generous_timeout_solves(quest):
+    row = solve_quest_file((quest, 60, False, None))
+    assert row['status'] == 'solved'
+    assert row['nodes_expanded'] > 0
@@ -0,0 +1,23 @@
+"""benchmark.compare: cổng theo chỉ số tất định, thời gian chỉ so sánh sau khi chuẩn hóa."""
+from benchmark import compare, compare_timing
+
+BASELINE = {'actions': 54, 'blocks': 43, 'nodes_expanded': 76, 'peak_memory_kb': 400.0,
+            'solve_ms': 10.0, 'solve_rel': 0.1, 'synthesize_ms': 1.0, 'synthesize_rel': 0.01}
+
+
+def test_absolute_time_on_another_machine_is_not_a_regression():
+    current = dict(BASELINE, solve_ms=30.0, synthesize_ms=3.0)
+    assert compare(current, BASELINE, 0.25) == []
+    assert compare_timing(current, BASELINE, 0.25, calibration_ms=300.0) == []
+
+
+def test_deterministic_metrics_gate_without_threshold():
+    assert compare(dict(BASELINE, nodes_expanded=77), BASELINE, 0.25) == ['nodes_expanded 76 -> 77']
+    assert compare(dict(BASELINE, actions=53), BASELINE, 0.25) == ['actions 54 -> 53']
+    assert compare(dict(BASELINE, blocks=40, nodes_expanded=70), BASELINE, 0.25) == []
+
+
+def test_relative_time_regression():
+    slower = compare_timing(dict(BASELINE, solve_rel=0.2), BASELINE, 0.25, calibration_ms=100.0)
+    assert slower == ['solve_rel 0.1 -> 0.2 (+100%)']
+    assert compare_timing(dict(BASELINE, synthesize_rel=0.02), BASELINE, 0.25, calibration_ms=100.0) == []
@@ -0,0 +1,42 @@
+"""Chế độ giải theo số khối: chương trình hợp lệ, không nhiều khối hơn bản tổng hợp, `optimal` chỉ khi duyệt hết."""
+import pytest
+
+from gameSolver import GameWorld, SearchStats, count_blocks, solve_level, solve_level_blocks, synthesize_program
+from levelGenerator import generate_level
+from programSimulator import Simulator
+
+# Level nhỏ để tìm kiếm duyệt hết trong vài phần mười giây.
+LEVELS = [
+    dict(seed=2, width=4, depth=4, num_collectibles=1),
+    dict(seed=4, width=5, depth=5, num_collectibles=1),
+    dict(seed=1, width=6, depth=6, num_collectibles=1),
+]
+
+
+@pytest.mark.parametrize('params', LEVELS, ids=lambda p: f"seed{p['seed']}")
+def test_blocks_program_is_valid_and_not_larger(params):
+    level = generate_level(**params)
+    result = solve_level_blocks(GameWorld(level), procedure_candidates=2, time_budget_ms=None)
+    assert result.program is not None
+    assert Simulator(GameWorld(level)).run(result.program).valid
+    assert result.blocks == count_blocks(result.program)
+    baseline = synthesize_program(solve_level(GameWorld(level)), compression='optimal')
+    assert result.blocks <= count_blocks(baseline)
+
+
+def test_optimal_only_when_all_candidates_are_tried():
+    level = generate_level(**LEVELS[0])
+    assert not solve_level_blocks(GameWorld(level), procedure_candidates=0, time_budget_ms=None).optimal
+    assert solve_level_blocks(GameWorld(level), procedure_candidates=1000, time_budget_ms=None).optimal
+
+
+def test_reuses_given_actions_and_stats():
+    level = generate_level(**LEVELS[1])
+    world = GameWorld(level)
+    stats = SearchStats()
+    actions = solve_level(world, stats=stats)
+    expanded = stats.nodes_expanded
+    result = solve_level_blocks(world, procedure_candidates=2, time_budget_ms=None, stats=stats, actions=actions)
+    assert result.program is not None
+    assert stats.nodes_expanded - expanded == result.states_explored
+    assert {'synthesize', 'count'} <= set(stats.phase_times)
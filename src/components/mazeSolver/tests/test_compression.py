@@ -0,0 +1,72 @@
+"""Nén vòng lặp 'optimal': trải phẳng đúng chuỗi gốc, ít khối nhất (so với DP tham chiếu) và không kém bản greedy."""
+import random
+from functools import lru_cache
+
+import pytest
+
+from gameSolver import (_LoopCompressor, compress_actions_optimal, compress_actions_to_structure, count_blocks,
+                        expand_program)
+
+ALPHABET = ['moveForward', 'turnLeft', 'turnRight', 'collect']
+
+
+def _blocks(structure):
+    return count_blocks({'main': structure, 'procedures': {}})
+
+
+def _reference_cost(actions):
+    """DP trên đoạn bằng so sánh lát cắt: tách đôi, hoặc gộp u^m (m >= 2) thành một vòng lặp quanh u."""
+    @lru_cache(maxsize=None)
+    def cost(seq):
+        if len(seq) == 1:
+            return 1
+        best = min(cost(seq[:k]) + cost(seq[k:]) for k in range(1, len(seq)))
+        for p in range(1, len(seq) // 2 + 1):
+            if len(seq) % p == 0 and seq[:p] * (len(seq) // p) == seq:
+                best = min(best, 1 + cost(seq[:p]))
+        return best
+    return cost(tuple(actions))
+
+
+def _sequences(count, max_len, alphabet_size):
+    rng = random.Random(alphabet_size)
+    for _ in range(count):
+        unit = [rng.choice(ALPHABET[:alphabet_size]) for _ in range(rng.randint(1, 4))]
+        seq = unit * rng.randint(1, 4) + [rng.choice(ALPHABET[:alphabet_size]) for _ in range(rng.randint(0, 4))]
+        yield seq[:max_len]
+
+
+@pytest.mark.parametrize('alphabet_size', [2, 3, 4])
+def test_optimal_is_minimal_and_never_worse_than_greedy(alphabet_size):
+    for actions in _sequences(60, 14, alphabet_size):
+        optimal = compress_actions_optimal(actions)
+        greedy = compress_actions_to_structure(actions)
+        assert expand_program({'main': optimal}) == actions
+        assert expand_program({'main': greedy}) == actions
+        assert _blocks(optimal) - 1 == _reference_cost(actions)
+        assert _blocks(optimal) <= _blocks(greedy)
+
+
+def test_optimal_beats_greedy_on_nested_repeat():
+    actions = (['moveForward'] * 3 + ['turnLeft']) * 4
+    assert _blocks(compress_actions_optimal(actions)) < _blocks(compress_actions_to_structure(actions))
+
+
+def test_max_depth_limits_nesting():
+    actions = (['moveForward'] * 3 + ['turnLeft']) * 4
+    assert compress_actions_optimal(actions, max_depth=0) == [{'type': a} for a in actions]
+    flat = compress_actions_optimal(actions, max_depth=1)
+    assert expand_program({'main': flat}) == actions
+    assert all(block['type'] != 'maze_repeat' for loop in flat if loop['type'] == 'maze_repeat'
+               for block in loop['body'])
+
+
+def test_rolling_hash_matches_slice_equality():
+    rng = random.Random(7)
+    actions = [rng.choice(ALPHABET[:2]) for _ in range(40)]
+    compressor = _LoopCompressor(actions)
+    for i in range(len(actions)):
+        for j in range(i + 1, len(actions) + 1):
+            for k in range(0, len(actions) - (j - i) + 1):
+                same = actions[i:j] == actions[k:k + j - i]
+                assert (compressor._hash(i, j) == compressor._hash(k, k + j - i)) == same
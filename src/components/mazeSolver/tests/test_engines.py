@@ -0,0 +1,96 @@
+"""Mọi engine tối ưu phải cho lời giải hợp lệ cùng độ dài với A* trên các level sinh ngẫu nhiên."""
+import copy
+
+import pytest
+
+from gameSolver import (GameState, GameWorld, SearchStats, get_successors, solve_level, solve_level_anytime,
+                        solve_level_hierarchical, solve_level_iter)
+from incrementalSolver import SolverSession
+from levelGenerator import generate_level
+from parallelSolver import _solve_hda, solve_level_parallel
+
+LEVELS = [
+    dict(seed=1, width=8, depth=8, num_collectibles=2),
+    dict(seed=2, width=10, depth=10, height_variation=2, num_collectibles=3),
+    dict(seed=3, width=10, depth=10, num_collectibles=3, num_switches=2),
+    dict(seed=4, width=12, depth=12, height_variation=1, num_collectibles=4),
+    dict(seed=5, width=12, depth=12, wall_density=0.3, num_collectibles=3),
+    dict(seed=6, width=12, depth=12, height_variation=1, num_collectibles=4, num_portals=1),
+    dict(seed=7, width=12, depth=12, wall_density=0.3, num_collectibles=3, num_portals=2),
+]
+
+
+def _fresh(params):
+    return GameWorld(generate_level(**params))
+
+
+def _last(events):
+    for event in events:
+        pass
+    return event.actions
+
+
+def _reaches_goal(world, actions):
+    state = GameState.initial(world)
+    for action in actions:
+        state = dict(get_successors(world, state)).get(action)
+        if state is None:
+            return False
+    finish = world.cell_index(world.finish_pos['x'], world.finish_pos['y'], world.finish_pos['z'])
+    return state.pose >> 2 == finish and state.collected == world.all_collected_mask
+
+
+ENGINES = {
+    'ida': lambda params: solve_level(_fresh(params), engine='ida'),
+    'ida-bounded': lambda params: solve_level(_fresh(params), engine='ida', max_nodes=64),
+    'no-prune': lambda params: solve_level(_fresh(params), prune=False),
+    'anytime': lambda params: solve_level_anytime(_fresh(params), time_budget_ms=60000).actions,
+    'iter': lambda params: _last(solve_level_iter(_fresh(params), report_every=10)),
+    'hierarchical': lambda params: solve_level_hierarchical(_fresh(params)).actions,
+    'hierarchical-bnb': lambda params: solve_level_hierarchical(_fresh(params), exact_limit=0).actions,
+    'session': lambda params: SolverSession(copy.deepcopy(generate_level(**params))).solve(),
+    'parallel': lambda params: solve_level_parallel(_fresh(params), workers=2),
+    'hda': lambda params: _solve_hda(_fresh(params), 2, None, None, True),
+}
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return {params['seed']: solve_level(_fresh(params)) for params in LEVELS}
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+@pytest.mark.parametrize('params', LEVELS, ids=lambda p: f"seed{p['seed']}")
+def test_engine_matches_astar_length(engine, params, reference):
+    expected = reference[params['seed']]
+    assert expected is not None
+    actions = ENGINES[engine](params)
+    assert actions is not None
+    assert len(actions) == len(expected)
+    assert _reaches_goal(_fresh(params), actions)
+
+
+def test_bounded_ida_forgets_states():
+    stats = SearchStats()
+    actions = solve_level(_fresh(LEVELS[3]), engine='ida', max_nodes=64, stats=stats)
+    assert actions is not None
+    assert stats.nodes_forgotten > 0
+
+
+@pytest.mark.parametrize('params', LEVELS, ids=lambda p: f"seed{p['seed']}")
+def test_anytime_bounds_shrink_to_optimal(params, reference):
+    result = solve_level_anytime(_fresh(params), time_budget_ms=60000, initial_weight=5.0)
+    assert result.optimal and not result.timed_out
+    assert result.bound == 1.0
+    lengths = [solution.length for solution in result.solutions]
+    assert lengths == sorted(lengths, reverse=True)
+    # Mỗi lời giải trung gian nằm trong cận đã công bố so với độ dài tối ưu.
+    assert all(s.length <= s.bound * len(reference[params['seed']]) for s in result.solutions)
+
+
+@pytest.mark.parametrize('exact_limit', [0, 12], ids=['branch-and-bound', 'held-karp'])
+def test_hierarchical_visits_every_collectible(exact_limit):
+    world = _fresh(LEVELS[3])
+    result = solve_level_hierarchical(world, exact_limit=exact_limit)
+    assert result.optimal and not result.timed_out
+    assert sorted(result.order) == sorted(c.get('id') for c in world.collectibles.values())
@@ -0,0 +1,55 @@
+"""Cắt tỉa: công tắc không được luật nào đọc nên không làm phình không gian tìm kiếm, luật quay chỉ bớt nút."""
+import copy
+import json
+import os
+
+import pytest
+
+from gameSolver import GameWorld, SearchStats, solve_level
+
+LEVEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maze-3d-3.json')
+
+
+def _level(with_switch, toggles=None):
+    with open(LEVEL) as f:
+        level = json.load(f)
+    interactibles = level['gameConfig']['interactibles']
+    switch = next(i for i in interactibles if i['type'] == 'switch')
+    if not with_switch:
+        interactibles.remove(switch)
+    elif toggles is not None:
+        switch['toggles'] = toggles
+    return level
+
+
+def _solve(level):
+    stats = SearchStats()
+    actions = solve_level(GameWorld(copy.deepcopy(level)), stats=stats)
+    return actions, stats
+
+
+@pytest.mark.parametrize('toggles', [None, ['portal_A'], ['switch_1']])
+def test_switches_are_never_relevant(toggles):
+    world = GameWorld(_level(True, toggles))
+    assert world.switch_bits
+    assert world.relevant_switch_mask == 0
+
+
+@pytest.mark.parametrize('toggles', [None, ['portal_A']])
+def test_switch_adds_no_search_states(toggles):
+    plain, plain_stats = _solve(_level(False))
+    switched, switched_stats = _solve(_level(True, toggles))
+    assert switched == plain
+    assert 'toggleSwitch' not in switched
+    assert switched_stats.nodes_generated == plain_stats.nodes_generated
+    assert switched_stats.nodes_expanded == plain_stats.nodes_expanded
+
+
+def test_turn_pruning_only_removes_nodes():
+    level = _level(True)
+    pruned, pruned_stats = _solve(level)
+    unpruned_stats = SearchStats()
+    unpruned = solve_level(GameWorld(copy.deepcopy(level)), stats=unpruned_stats, prune=False)
+    assert len(pruned) == len(unpruned)
+    assert pruned_stats.successors_pruned > 0
+    assert pruned_stats.nodes_generated < unpruned_stats.nodes_generated
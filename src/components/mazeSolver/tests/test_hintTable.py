@@ -0,0 +1,36 @@
+"""Bảng gợi ý: giá trị khớp A*, lưu/tải giữ nguyên bảng, từ chối file của level khác."""
+import pytest
+
+from gameSolver import GameState, GameWorld, solve_level
+from hintTable import HintTable, build_bounded_table, build_dense_table
+from levelGenerator import generate_level
+from solutionCache import level_cache_key
+
+BUILDERS = {'dense': build_dense_table, 'bounded': lambda world: build_bounded_table(world, radius=2)}
+
+
+@pytest.mark.parametrize('kind', sorted(BUILDERS))
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_save_load_round_trip(tmp_path, kind, seed):
+    level = generate_level(seed, width=10, depth=10, height_variation=1, num_collectibles=3, num_portals=seed % 2)
+    world = GameWorld(level)
+    table = BUILDERS[kind](world)
+    start = GameState.initial(world)
+    assert table.cost(start) == len(solve_level(GameWorld(level)))
+
+    path = str(tmp_path / 'level.hints')
+    table.save(path, level_cache_key(level))
+    loaded = HintTable.load(path, GameWorld(level), level_cache_key(level))
+    assert loaded.bounded == table.bounded
+    assert loaded.radius == table.radius
+    assert loaded.costs == table.costs
+    assert loaded.keys == table.keys
+    assert loaded.plan(GameState.initial(loaded.world)) == table.plan(start)
+
+
+def test_load_rejects_other_level(tmp_path):
+    level = generate_level(1, width=8, depth=8, num_collectibles=2)
+    path = str(tmp_path / 'level.hints')
+    build_dense_table(GameWorld(level)).save(path, level_cache_key(level))
+    with pytest.raises(ValueError):
+        HintTable.load(path, GameWorld(level), 'another-level')
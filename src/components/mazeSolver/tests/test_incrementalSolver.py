@@ -0,0 +1,42 @@
+"""SolverSession phải luôn cho lời giải cùng độ dài với một lần giải đầy đủ sau mỗi thao tác sửa."""
+import copy
+import random
+
+import pytest
+
+from gameSolver import GameWorld, solve_level
+from incrementalSolver import SolverSession, _random_edit
+from levelGenerator import generate_level
+
+
+def _full_length(session):
+    actions = solve_level(GameWorld(copy.deepcopy(session.level)))
+    return len(actions) if actions is not None else None
+
+
+def _length(actions):
+    return len(actions) if actions is not None else None
+
+
+@pytest.mark.parametrize('seed', [104, 107, 121, 129])
+def test_move_collectible_matches_full_solve(seed):
+    level = generate_level(seed, width=8, depth=8, num_collectibles=3)
+    session = SolverSession(level)
+    session.solve()
+    rng = random.Random(seed)
+    for _ in range(6):
+        world = session.world
+        cells = [c for c in world.standable_cells if c not in world.collectible_bits]
+        x, y, z = world.cell_position(rng.choice(cells))
+        session.move_collectible(rng.choice(level['gameConfig']['collectibles'])['id'], x, y, z)
+        assert _length(session.solve()) == _full_length(session)
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_block_edits_match_full_solve(seed):
+    session = SolverSession(generate_level(seed, width=10, depth=10, num_collectibles=3))
+    session.solve()
+    rng = random.Random(seed)
+    for _ in range(10):
+        _random_edit(session, rng)
+        assert _length(session.solve()) == _full_length(session)
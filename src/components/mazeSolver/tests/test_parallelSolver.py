@@ -0,0 +1,40 @@
+"""`solve_level(workers=N)` chuyển sang HDA* khi A* tuần tự vượt ngưỡng, và vẫn cho lời giải tối ưu."""
+import parallelSolver
+from gameSolver import GameWorld, SearchStats, solve_level
+from levelGenerator import generate_level
+from programSimulator import Simulator
+
+LEVEL = dict(seed=4, width=12, depth=12, height_variation=1, num_collectibles=4, num_portals=1)
+
+
+def _no_hda(*args):
+    raise AssertionError("HDA* không được chạy với level nhỏ hơn ngưỡng")
+
+
+def test_solve_level_workers_runs_hda_past_threshold(monkeypatch):
+    calls = []
+    real_hda = parallelSolver._solve_hda
+
+    def spy(world, workers, stats, start, prune):
+        calls.append(workers)
+        return real_hda(world, workers, stats, start, prune)
+
+    # Máy một CPU vẫn phải đi qua nhánh HDA*: giả lập 2 CPU và hạ ngưỡng để A* tuần tự không kịp xong.
+    monkeypatch.setattr(parallelSolver, 'PARALLEL_MIN_EXPANSIONS', 10)
+    monkeypatch.setattr(parallelSolver, '_available_cpus', lambda: 2)
+    monkeypatch.setattr(parallelSolver, '_solve_hda', spy)
+    level = generate_level(**LEVEL)
+    expected = solve_level(GameWorld(level))
+    stats = SearchStats()
+    actions = solve_level(GameWorld(level), stats=stats, workers=2)
+    assert calls == [2]
+    assert stats.nodes_expanded > 10
+    assert len(actions) == len(expected)
+    assert Simulator(GameWorld(level)).run(actions).valid
+
+
+def test_small_level_stays_serial(monkeypatch):
+    monkeypatch.setattr(parallelSolver, '_available_cpus', lambda: 2)
+    monkeypatch.setattr(parallelSolver, '_solve_hda', _no_hda)
+    level = generate_level(1, width=8, depth=8, num_collectibles=2)
+    assert solve_level(GameWorld(level), workers=2) == solve_level(GameWorld(level))
@@ -0,0 +1,53 @@
+"""Cổng dịch chuyển được biên dịch thành cạnh trong bảng chuyển trạng thái: bước vào cổng là tới ngay cổng đích."""
+import json
+import os
+
+import pytest
+
+from gameSolver import GameState, GameWorld, solve_level
+from programSimulator import Simulator
+
+QUESTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '..', '..', '..', 'public', 'quests')
+
+
+def _quest(name):
+    with open(os.path.join(QUESTS, name)) as f:
+        return json.load(f)
+
+
+def _corridor(length, portal=True):
+    """Hành lang dọc trục x, đích ở cuối; cổng ở ô thứ hai dẫn thẳng tới đích."""
+    blocks = [{'modelKey': 'ground.normal', 'position': {'x': x, 'y': 0, 'z': 0}} for x in range(length)]
+    interactibles = [
+        {'id': 'A', 'type': 'portal', 'position': {'x': 1, 'y': 1, 'z': 0}, 'targetId': 'B'},
+        {'id': 'B', 'type': 'portal', 'position': {'x': length - 1, 'y': 1, 'z': 0}, 'targetId': 'A'},
+    ] if portal else []
+    return {'gameConfig': {'type': 'maze', 'blocks': blocks, 'interactibles': interactibles,
+                           'players': [{'id': 'p', 'start': {'x': 0, 'y': 1, 'z': 0, 'direction': 1}}],
+                           'finish': {'x': length - 1, 'y': 1, 'z': 0}}}
+
+
+@pytest.mark.parametrize('name,direction', [('maze-3d-portal-1-default-direction.json', 0),
+                                            ('maze-3d-portal-2-same-direction.json', 1)])
+def test_teleport_edge_lands_on_target_portal(name, direction):
+    world = GameWorld(_quest(name))
+    start = GameState.initial(world)
+    target = world.cell_index(5, 1, 5)
+    assert world.transitions[start.pose * 2] == target
+    assert world.arrival_direction(target, start.pose & 3) == direction
+    assert solve_level(world) == ['moveForward']
+
+
+def test_portal_shortens_plan():
+    assert len(solve_level(GameWorld(_corridor(8, portal=False)))) == 7
+    level = _corridor(8)
+    actions = solve_level(GameWorld(level))
+    assert actions == ['moveForward']
+    assert Simulator(GameWorld(level)).run(actions).valid
+
+
+def test_landing_on_target_portal_does_not_teleport_back():
+    world = GameWorld(_corridor(8))
+    landing = world.cell_index(7, 1, 0)
+    # Từ ô đích, bước lùi về ô 6 là ô thường (không bị đưa về cổng A).
+    assert world.transitions[((landing << 2) | 3) * 2] == world.cell_index(6, 1, 0)
@@ -0,0 +1,38 @@
+"""`synthesize_program_search` ghi số liệu vào `stats` và hủy được qua `progress_callback`."""
+import pytest
+
+from gameSolver import SearchStats, count_blocks, synthesize_program_search
+
+ACTIONS = ['moveForward', 'moveForward', 'turnLeft', 'moveForward', 'collect', 'turnRight'] * 3 + ['moveForward']
+
+
+class Cancelled(Exception):
+    pass
+
+
+def test_search_records_stats():
+    stats = SearchStats()
+    result = synthesize_program_search(ACTIONS, time_budget_ms=2000, stats=stats)
+    assert result.states_explored > 0
+    assert stats.synthesis_states == result.states_explored
+    assert set(stats.phase_times) >= {'synthesize', 'count'}
+    assert count_blocks(result.program) == result.blocks
+
+
+def test_search_checkpoints_every_interval():
+    calls = []
+    result = synthesize_program_search(ACTIONS, stats=SearchStats(progress_callback=calls.append, progress_interval=1))
+    assert len(calls) >= result.states_explored
+
+
+def test_search_is_cancellable():
+    calls = []
+
+    def cancel(stats):
+        calls.append(stats)
+        if len(calls) > 5:
+            raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        synthesize_program_search(ACTIONS, stats=SearchStats(progress_callback=cancel, progress_interval=1))
+    assert len(calls) == 6
@@ -0,0 +1,71 @@
+"""Simulator: `failed_step` khớp luật của `get_successors`, chế độ NumPy cho đúng kết quả như vòng lặp Python."""
+import pytest
+
+from gameSolver import GameState, GameWorld, get_successors, solve_level, synthesize_program
+from levelGenerator import generate_level
+from programSimulator import Simulator, random_sequences
+
+LEVELS = [
+    dict(seed=3, width=10, depth=10, num_collectibles=3, num_switches=2),
+    dict(seed=6, width=12, depth=12, height_variation=1, num_collectibles=4, num_portals=1),
+]
+SLOTS = ('reached_finish', 'collected', 'failed_step', 'steps', 'valid', 'pose', 'collected_mask', 'switches')
+
+
+def _reference_failed_step(world, actions):
+    state = GameState.initial(world)
+    for step, action in enumerate(actions):
+        state = dict(get_successors(world, state)).get(action)
+        if state is None:
+            return step
+    return None
+
+
+def _sequences(world):
+    plan = solve_level(world)
+    return ([plan, plan[:len(plan) // 2], [], ['collect'], ['spin'], plan + ['collect', 'collect']] +
+            random_sequences(world, 150, 0, seed=1, base=plan) + random_sequences(world, 150, 25, seed=2))
+
+
+@pytest.mark.parametrize('params', LEVELS, ids=lambda p: f"seed{p['seed']}")
+def test_failed_step_matches_get_successors(params):
+    world = GameWorld(generate_level(**params))
+    simulator = Simulator(world)
+    sequences = _sequences(world)
+    for actions, result in zip(sequences, simulator.run_batch(sequences, vectorized=False)):
+        expected = _reference_failed_step(world, actions)
+        assert result.failed_step == expected
+        assert result.steps == (len(actions) if expected is None else expected)
+    assert simulator.run(sequences[0]).valid
+    assert simulator.run([]).failed_step is None and not simulator.run([]).valid
+    assert simulator.run(['spin']).failed_step == 0
+
+
+def test_collect_twice_fails_at_second_collect():
+    world = GameWorld(generate_level(**LEVELS[0]))
+    plan = solve_level(world)
+    first = plan.index('collect')
+    result = Simulator(world).run(plan[:first + 1] + ['collect'])
+    assert result.failed_step == first + 1
+    assert result.collected == 1
+
+
+def test_program_runs_like_its_actions():
+    world = GameWorld(generate_level(**LEVELS[1]))
+    plan = solve_level(world)
+    program = synthesize_program(plan, compression='optimal')
+    simulator = Simulator(world)
+    assert simulator.run(program).valid
+    assert simulator.run(program).pose == simulator.run(plan).pose
+
+
+@pytest.mark.parametrize('params', LEVELS, ids=lambda p: f"seed{p['seed']}")
+def test_numpy_matches_python(params):
+    pytest.importorskip('numpy')
+    world = GameWorld(generate_level(**params))
+    simulator = Simulator(world)
+    sequences = _sequences(world)
+    python = simulator.run_batch(sequences, vectorized=False)
+    vectorized = simulator.run_batch(sequences, vectorized=True)
+    assert [[getattr(r, slot) for slot in SLOTS] for r in vectorized] == \
+        [[getattr(r, slot) for slot in SLOTS] for r in python]
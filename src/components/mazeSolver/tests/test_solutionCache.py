@@ -0,0 +1,73 @@
+"""SolutionCache: lưu/đọc lại lời giải, giới hạn dung lượng bằng bộ đếm, chỉ quét thư mục khi vượt giới hạn."""
+import os
+
+from levelGenerator import generate_level
+from solutionCache import SolutionCache, level_cache_key, solve_with_cache
+
+
+def _disk_bytes(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def _entry(i):
+    return {'actions': ['moveForward'] * (i % 7 + 1), 'program': None, 'blocks': i}
+
+
+def test_put_scans_directory_only_when_over_limit(tmp_path, monkeypatch):
+    cache = SolutionCache(str(tmp_path), max_bytes=2000)
+    scans = []
+    original = cache._scan
+    monkeypatch.setattr(cache, '_scan', lambda: scans.append(1) or original())
+    for i in range(10):
+        cache.put(f"{i:064x}", _entry(i))
+    assert not scans
+    for i in range(10, 200):
+        cache.put(f"{i:064x}", _entry(i))
+    assert 0 < len(scans) < 190
+    assert _disk_bytes(str(tmp_path)) <= 2000
+    assert cache._total_bytes == _disk_bytes(str(tmp_path))
+
+
+def test_counter_tracks_overwrites_and_existing_files(tmp_path):
+    first = SolutionCache(str(tmp_path))
+    first.put('a' * 64, _entry(1))
+    first.put('a' * 64, _entry(6))
+    assert first._total_bytes == _disk_bytes(str(tmp_path))
+    second = SolutionCache(str(tmp_path))
+    assert second._total_bytes == first._total_bytes
+
+
+def test_solve_with_cache_round_trip(tmp_path):
+    level = generate_level(2, width=10, depth=10, num_collectibles=3)
+    first = solve_with_cache(level, SolutionCache(str(tmp_path)))
+    assert not first['cache_hit']
+    # Một đối tượng cache mới (tiến trình khác) đọc lại đúng mục đã ghi trên đĩa.
+    second = solve_with_cache(level, SolutionCache(str(tmp_path)))
+    assert second['cache_hit']
+    assert {k: second[k] for k in ('actions', 'program', 'blocks')} == \
+        {k: first[k] for k in ('actions', 'program', 'blocks')}
+    assert SolutionCache(str(tmp_path)).get(level_cache_key(level))['actions'] == first['actions']
+
+
+def test_memory_hits_refresh_disk_recency(tmp_path, monkeypatch):
+    cache = SolutionCache(str(tmp_path))
+    for key in ('aa1', 'bb2', 'cc3'):
+        cache.put(key, _entry(len(key)))
+        os.utime(cache._path(key), (1000, 1000))
+    monkeypatch.setattr('solutionCache.TOUCH_INTERVAL', 0.0)
+    assert cache.get('aa1') is not None  # Trúng trong bộ nhớ, không đọc file.
+    assert os.path.getmtime(cache._path('aa1')) > 1000
+    cache.max_bytes = _disk_bytes(str(tmp_path)) - 1
+    cache.evict()
+    assert os.path.exists(cache._path('aa1'))
+    assert not os.path.exists(cache._path('bb2'))
+
+
+def test_memory_hits_touch_at_most_once_per_interval(tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    cache.put('aa1', _entry(1))
+    os.utime(cache._path('aa1'), (1000, 1000))
+    cache.get('aa1')
+    # Vừa ghi xong nên chưa tới TOUCH_INTERVAL: không cập nhật mtime.
+    assert os.path.getmtime(cache._path('aa1')) == 1000
@@ -0,0 +1,47 @@
+"""`solve_level_iter`: tạm dừng/tiếp tục giữa các sự kiện không đổi kết quả, `close()` hủy tìm kiếm ngay."""
+from gameSolver import GameWorld, SearchStats, solve_level, solve_level_iter
+from levelGenerator import generate_level
+
+LEVEL = dict(seed=4, width=12, depth=12, height_variation=1, num_collectibles=4)
+
+
+def _world(seed=4):
+    return GameWorld(generate_level(**dict(LEVEL, seed=seed)))
+
+
+def test_events_report_progress_and_final_solution():
+    stats = SearchStats()
+    expected = solve_level(_world(), stats=stats)
+    events = list(solve_level_iter(_world(), report_every=5))
+    assert [e.done for e in events] == [False] * (len(events) - 1) + [True]
+    assert len(events) > 2
+    assert all(e.nodes_expanded == 5 * (i + 1) for i, e in enumerate(events[:-1]))
+    assert events[-1].nodes_expanded == stats.nodes_expanded
+    bounds = [e.best_f for e in events]
+    assert bounds == sorted(bounds) and bounds[-1] == len(expected)
+    assert events[-1].actions == expected
+
+
+def test_interleaved_searches_match_uninterrupted_runs():
+    seeds = (1, 4, 5)
+    searches = {seed: solve_level_iter(_world(seed), report_every=3) for seed in seeds}
+    results = {}
+    # Xoay vòng: mỗi generator bị tạm dừng trong lúc các generator khác chạy.
+    while searches:
+        for seed, search in list(searches.items()):
+            event = next(search)
+            if event.done:
+                results[seed] = event.actions
+                del searches[seed]
+    assert results == {seed: solve_level(_world(seed)) for seed in seeds}
+
+
+def test_close_cancels_search():
+    stats = SearchStats()
+    search = solve_level_iter(_world(), report_every=5, stats=stats)
+    first = next(search)
+    assert not first.done
+    search.close()
+    expanded = stats.nodes_expanded
+    assert next(search, None) is None
+    assert stats.nodes_expanded == expanded == first.nodes_expanded
@@ -0,0 +1,82 @@
+"""SolverServer: quản lý việc đang chạy, CORS cho trình duyệt và đóng kết nối đúng cách."""
+import asyncio
+import json
+
+import pytest
+
+from levelGenerator import generate_level
+from solverServer import Job, SolverServer
+
+
+@pytest.fixture
+def server():
+    server = SolverServer(workers=1)
+    yield server
+    server.close()
+
+
+def test_finish_of_replaced_job_keeps_newer_job(server):
+    loop = asyncio.new_event_loop()
+    try:
+        old_future, new_future = loop.create_future(), loop.create_future()
+        old_job, new_job = Job('k', old_future, None), Job('k', new_future, None)
+        server.jobs['k'] = new_job
+        old_future.cancel()
+        server._finish_job(old_job, old_future)
+        assert server.jobs['k'] is new_job
+        new_future.set_result(('ok', {}, True))
+        server._finish_job(new_job, new_future)
+        assert 'k' not in server.jobs
+        assert server.results['k'] == ('ok', {}, True)
+    finally:
+        loop.close()
+
+
+async def _request(port, raw):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    # Đọc tới EOF (không dựa vào Content-Length): máy chủ phải thật sự đóng kết nối.
+    response = await asyncio.wait_for(reader.read(), timeout=30)
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    return int(lines[0].split(' ')[1]), headers, body
+
+
+def _http(server_factory, *raw_requests):
+    async def run():
+        server = server_factory()
+        try:
+            listener = await server.start('127.0.0.1', 0)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                return [await _request(port, raw) for raw in raw_requests]
+        finally:
+            server.close()
+    return asyncio.run(run())
+
+
+def test_cors_preflight_and_post_read_until_eof():
+    level = json.dumps({'level': generate_level(1, width=6, depth=6, num_collectibles=1)}).encode('utf-8')
+    origin = 'http://localhost:5173'
+    preflight, solved, other = _http(
+        lambda: SolverServer(workers=1, allow_origin=origin),
+        (f"OPTIONS /solve HTTP/1.1\r\nOrigin: {origin}\r\nAccess-Control-Request-Method: POST\r\n"
+         "Access-Control-Request-Headers: content-type\r\n\r\n").encode('latin-1'),
+        (f"POST /solve HTTP/1.1\r\nOrigin: {origin}\r\nContent-Type: application/json\r\n"
+         f"Content-Length: {len(level)}\r\n\r\n").encode('latin-1') + level,
+        b"GET /health HTTP/1.1\r\nOrigin: http://evil.example\r\n\r\n",
+    )
+    status, headers, body = preflight
+    assert status == 204 and body == b''
+    assert headers['Access-Control-Allow-Origin'] == origin
+    assert 'POST' in headers['Access-Control-Allow-Methods']
+    assert headers['Access-Control-Allow-Headers'] == 'content-type'
+    status, headers, body = solved
+    assert status == 200
+    assert headers['Access-Control-Allow-Origin'] == origin
+    assert json.loads(body)['result']['actions']
+    status, headers, _ = other
+    assert status == 200 and 'Access-Control-Allow-Origin' not in headers
@@ -0,0 +1,50 @@
+"""Yêu cầu đã bị hủy phải dừng ở cả các bước tiền xử lý; tham số sai kiểu trả về INVALID_PARAMS."""
+import io
+
+import pytest
+
+from levelGenerator import generate_level
+from solverService import INVALID_PARAMS, REQUEST_CANCELLED, RequestContext, RpcError, SolverService
+
+
+def _cancelled():
+    ctx = RequestContext('r1', None)
+    ctx.cancelled.set()
+    return ctx
+
+
+@pytest.mark.parametrize('method', ['solve', 'hint'])
+def test_cancelled_request_stops_before_building_world_data(method):
+    service = SolverService(output=io.StringIO())
+    level = generate_level(3, width=10, depth=10, num_collectibles=2)
+    with pytest.raises(RpcError) as error:
+        getattr(service, method)({'level': level}, _cancelled())
+    assert error.value.code == REQUEST_CANCELLED
+    assert not service.hint_tables
+    _, world = service.worlds.get({'level': level})
+    assert world._distance_heuristic is None
+
+
+def test_cancelled_synthesize_stops():
+    service = SolverService(output=io.StringIO())
+    with pytest.raises(RpcError) as error:
+        service.synthesize({'actions': ['moveForward', 'turnLeft', 'moveForward'] * 20}, _cancelled())
+    assert error.value.code == REQUEST_CANCELLED
+
+
+@pytest.mark.parametrize('method', ['hint', 'validate', 'synthesize'])
+@pytest.mark.parametrize('actions', ['moveForward', {'0': 'moveForward'}, ['moveForward', 3], [['turnLeft']]])
+def test_malformed_actions_are_invalid_params(method, actions):
+    service = SolverService(output=io.StringIO())
+    level = generate_level(3, width=10, depth=10, num_collectibles=2)
+    with pytest.raises(RpcError) as error:
+        getattr(service, method)({'level': level, 'actions': actions}, RequestContext('r1', None))
+    assert error.value.code == INVALID_PARAMS
+
+
+def test_hint_after_valid_prefix():
+    service = SolverService(output=io.StringIO())
+    level = generate_level(3, width=10, depth=10, num_collectibles=2)
+    plan = service.hint({'level': level}, RequestContext('r1', None))['plan']
+    result = service.hint({'level': level, 'actions': plan[:2]}, RequestContext('r2', None))
+    assert result['plan'] == plan[2:]